@@ -0,0 +1,156 @@
+import subprocess
+import threading
+import time
+
+from media import ffmpeg_executable
+from metrics import metrics
+
+SAMPLE_RATE = 16000
+
+
+def _ffmpeg_decode_command() -> list:
+    """Команда ffmpeg: любой вход из stdin -> 16 кГц моно s16le в stdout."""
+    return [
+        ffmpeg_executable(),
+        "-nostdin",
+        "-loglevel",
+        "error",
+        "-i",
+        "pipe:0",
+        "-f",
+        "s16le",
+        "-ac",
+        "1",
+        "-acodec",
+        "pcm_s16le",
+        "-ar",
+        str(SAMPLE_RATE),
+        "pipe:1",
+    ]
+
+
+class SpeechSegmenter:
+    """Потоковое разбиение аудио на фрагменты речи по паузам.
+
+    ffmpeg декодирует вход порциями, простой энергетический VAD ищет
+    паузы, и наружу отдаются фрагменты не длиннее max_segment_seconds.
+    В памяти одновременно держится не больше одного фрагмента PCM,
+    независимо от длины сообщения.
+    """
+
+    FRAME_SAMPLES = SAMPLE_RATE * 30 // 1000  # 30 мс
+    READ_FRAMES = 32
+
+    def __init__(
+        self,
+        data: bytes,
+        max_segment_seconds: float = 30.0,
+        min_segment_seconds: float = 5.0,
+        min_silence_seconds: float = 0.5,
+        silence_threshold: float = 0.01,
+    ):
+        self.max_frames = int(max_segment_seconds * 1000 / 30)
+        self.min_frames = int(min_segment_seconds * 1000 / 30)
+        self.silence_frames = int(min_silence_seconds * 1000 / 30)
+        self.silence_threshold = silence_threshold
+        self.bytes_read = 0
+
+        self._frames = []
+        self._voiced = False
+        self._silence_run = 0
+        self._tail = b""
+        self._pending = None
+        self._energies = None
+        self._position = 0
+        self._process = subprocess.Popen(
+            _ffmpeg_decode_command(),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+        # stdin пишется из отдельного потока, чтобы не упереться в буфер пайпа
+        self._writer = threading.Thread(target=self._feed, args=(data,), daemon=True)
+        self._writer.start()
+
+    def _feed(self, data: bytes):
+        try:
+            self._process.stdin.write(data)
+        except (BrokenPipeError, ValueError):
+            pass
+        finally:
+            try:
+                self._process.stdin.close()
+            except OSError:
+                pass
+
+    def _pop_segment(self):
+        import numpy as np
+
+        segment = np.concatenate(self._frames) if self._voiced else None
+        self._frames = []
+        self._voiced = False
+        self._silence_run = 0
+        return segment
+
+    def _read_frames(self):
+        """Читает очередную порцию PCM и режет её на кадры, None в конце."""
+        import numpy as np
+
+        frame_bytes = self.FRAME_SAMPLES * 2
+        started = time.perf_counter()
+        chunk = self._process.stdout.read(frame_bytes * self.READ_FRAMES)
+        if not chunk:
+            self._process.wait()
+            return None
+        self.bytes_read += len(chunk)
+        data = self._tail + chunk
+        usable = len(data) - len(data) % frame_bytes
+        self._tail = data[usable:]
+        samples = np.frombuffer(data[:usable], np.int16).astype(np.float32) / 32768.0
+
+        metrics.observe("audio.decode", time.perf_counter() - started)
+        # PCM из ffmpeg и его копия в float32
+        metrics.incr("audio.bytes_copied", len(chunk) + samples.nbytes)
+        return samples.reshape(-1, self.FRAME_SAMPLES)
+
+    def next_segment(self):
+        """Возвращает следующий фрагмент речи (float32) или None в конце."""
+        import numpy as np
+
+        while True:
+            if self._pending is None or self._position >= len(self._pending):
+                self._pending = self._read_frames()
+                self._position = 0
+                if self._pending is None:
+                    return self._pop_segment() if self._frames else None
+                self._energies = np.sqrt(np.mean(self._pending**2, axis=1))
+                continue
+
+            frame = self._pending[self._position]
+            energy = self._energies[self._position]
+            self._position += 1
+
+            self._frames.append(frame)
+            if energy >= self.silence_threshold:
+                self._voiced = True
+                self._silence_run = 0
+            else:
+                self._silence_run += 1
+
+            paused = (
+                len(self._frames) >= self.min_frames
+                and self._silence_run >= self.silence_frames
+            )
+            if paused or len(self._frames) >= self.max_frames:
+                segment = self._pop_segment()
+                if segment is not None:
+                    return segment
+            elif not self._voiced and self._silence_run >= self.silence_frames:
+                # Длинная тишина перед речью не копится в памяти
+                self._frames = []
+                self._silence_run = 0
+
+    def close(self):
+        if self._process.poll() is None:
+            self._process.kill()
+            self._process.wait()
@@ -0,0 +1,322 @@
+import asyncio
+import os
+import sqlite3
+import threading
+
+from config import (
+    CATALOG_SCAN_INTERVAL,
+    NOTES_FOLDER,
+    SEARCH_INDEX_INTERVAL,
+    STATE_FOLDER,
+    logger,
+)
+from metrics import metrics
+from stemmer import stem_text
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS notes (
+    id INTEGER PRIMARY KEY,
+    filename TEXT NOT NULL UNIQUE,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    first_line TEXT NOT NULL,
+    indexed_mtime REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS notes_mtime ON notes (mtime);
+CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts USING fts5(
+    body,
+    tokenize = 'unicode61 remove_diacritics 0'
+);
+"""
+
+# Ключ сортировки постраничного списка и направление: по дате изменения
+# (новые сверху) или по имени. При равных значениях порядок задаёт id
+SORT_KEYS = {
+    "m": ("mtime", "DESC"),
+    "n": ("filename", "ASC"),
+}
+
+
+def _read_first_line(path: str) -> str:
+    """Первая непустая строка заметки, читается не больше 4 КБ."""
+    try:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            head = f.read(4096)
+    except OSError:
+        return ""
+    for line in head.splitlines():
+        if line.strip():
+            return line.strip()[:200]
+    return ""
+
+
+def _read_stemmed(path: str) -> str:
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        return stem_text(f.read())
+
+
+class NoteCatalog:
+    """Индекс заметок в SQLite: имя файла, mtime, размер, заголовок, первая строка.
+
+    Обновляется инкрементально после записей бота и периодическим
+    сканированием папки, которое замечает правки из Obsidian.
+
+    Рядом лежит полнотекстовый индекс FTS5 по основам слов (см. stemmer.py).
+    Заметка переиндексируется, когда её mtime расходится с indexed_mtime.
+    """
+
+    def __init__(self, db_path: str, notes_folder: str):
+        self.db_path = db_path
+        self.notes_folder = notes_folder
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def open(self):
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(notes)")]
+        if columns and "indexed_mtime" not in columns:
+            self._conn.execute(
+                "ALTER TABLE notes ADD COLUMN indexed_mtime REAL NOT NULL DEFAULT 0"
+            )
+        self._conn.executescript(SCHEMA)
+        changed = self.sync()
+        logger.info(f"Каталог заметок обновлён, изменений: {changed}")
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _upsert(self, filename: str, stat: os.stat_result, first_line: str):
+        self._conn.execute(
+            """
+            INSERT INTO notes (filename, mtime, size, title, first_line)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (filename) DO UPDATE SET
+                mtime = excluded.mtime,
+                size = excluded.size,
+                first_line = excluded.first_line
+            """,
+            (
+                filename,
+                stat.st_mtime,
+                stat.st_size,
+                filename[: -len(".md")],
+                first_line,
+            ),
+        )
+
+    def refresh_notes(self, note_paths: list):
+        """Обновляет записи для заметок, которые только что изменил бот."""
+        # Файлы читаются до блокировки, под ней только запись в SQLite
+        changes = []
+        for note_path in note_paths:
+            try:
+                stat = os.stat(note_path)
+            except FileNotFoundError:
+                stat = None
+            first_line = _read_first_line(note_path) if stat else None
+            changes.append((os.path.basename(note_path), stat, first_line))
+        with self._lock:
+            for filename, stat, first_line in changes:
+                if stat is None:
+                    self._delete(filename)
+                else:
+                    self._upsert(filename, stat, first_line)
+            self._conn.commit()
+
+    def _delete(self, filename: str):
+        self._conn.execute(
+            "DELETE FROM notes_fts WHERE rowid IN "
+            "(SELECT id FROM notes WHERE filename = ?)",
+            (filename,),
+        )
+        self._conn.execute("DELETE FROM notes WHERE filename = ?", (filename,))
+
+    def remove_note(self, note_path: str):
+        with self._lock:
+            self._delete(os.path.basename(note_path))
+            self._conn.commit()
+
+    def sync(self) -> int:
+        """Сверяет индекс с папкой заметок, возвращает число изменений."""
+        # Индекс читается до сканирования: заметка, добавленная ботом после
+        # этого, есть на диске и только обновится, но не будет удалена
+        with self._lock:
+            known = {
+                filename: (mtime, size)
+                for filename, mtime, size in self._conn.execute(
+                    "SELECT filename, mtime, size FROM notes"
+                )
+            }
+
+        # Сканирование и чтение файлов идут без блокировки, чтобы
+        # не задерживать запись бота; под ней только запросы к SQLite
+        on_disk = {}
+        with os.scandir(self.notes_folder) as entries:
+            for entry in entries:
+                if entry.name.endswith(".md") and entry.is_file():
+                    on_disk[entry.name] = entry.stat()
+        changed_files = [
+            (
+                filename,
+                stat,
+                _read_first_line(os.path.join(self.notes_folder, filename)),
+            )
+            for filename, stat in on_disk.items()
+            if known.pop(filename, None) != (stat.st_mtime, stat.st_size)
+        ]
+
+        with self._lock:
+            for filename, stat, first_line in changed_files:
+                self._upsert(filename, stat, first_line)
+            for filename in list(known):
+                # Файл мог появиться снова после сканирования
+                if os.path.exists(os.path.join(self.notes_folder, filename)):
+                    del known[filename]
+                else:
+                    self._delete(filename)
+            self._conn.commit()
+        changed = len(changed_files) + len(known)
+        metrics.incr("catalog.changes", changed)
+        return changed
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM notes").fetchone()[0]
+
+    def page(self, sort: str, offset: int, limit: int) -> list:
+        """Страница заметок (id, filename, mtime) по номеру строки.
+
+        OFFSET перебирает все пропущенные строки, поэтому нужен только для
+        перехода на произвольную страницу; соседние берутся через page_after.
+        """
+        column, direction = SORT_KEYS[sort]
+        with self._lock:
+            return self._conn.execute(
+                "SELECT id, filename, mtime FROM notes "
+                f"ORDER BY {column} {direction}, id {direction} LIMIT ? OFFSET ?",
+                (limit, offset),
+            ).fetchall()
+
+    def page_after(
+        self, sort: str, cursor: tuple, limit: int, backward: bool = False
+    ) -> list:
+        """Страница заметок сразу после курсора (значение ключа, id) или перед ним.
+
+        Поиск идёт по индексу от курсора, пропущенные страницы не читаются.
+        """
+        column, direction = SORT_KEYS[sort]
+        if (direction == "DESC") != backward:
+            operator, order = "<", "DESC"
+        else:
+            operator, order = ">", "ASC"
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id, filename, mtime FROM notes WHERE ({column}, id) "
+                f"{operator} (?, ?) ORDER BY {column} {order}, id {order} LIMIT ?",
+                (*cursor, limit),
+            ).fetchall()
+        # Назад строки выбираются в обратном порядке
+        return rows[::-1] if backward else rows
+
+    def get_filename(self, note_id: int) -> str:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT filename FROM notes WHERE id = ?", (note_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def get_id(self, note_path: str) -> int:
+        """ID заметки в каталоге, при необходимости заметка добавляется."""
+        filename = os.path.basename(note_path)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id FROM notes WHERE filename = ?", (filename,)
+            ).fetchone()
+        if row is None:
+            self.refresh_notes([note_path])
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT id FROM notes WHERE filename = ?", (filename,)
+                ).fetchone()
+        return row[0] if row else None
+
+    def index_pending(self, batch_size: int = 50) -> int:
+        """Переиндексирует изменившиеся заметки, возвращает их число."""
+        indexed = 0
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT id, filename, mtime FROM notes "
+                    "WHERE indexed_mtime != mtime LIMIT ?",
+                    (batch_size,),
+                ).fetchall()
+            if not rows:
+                return indexed
+
+            # Файлы читаются без блокировки, в базу пишется одной транзакцией
+            documents = []
+            for note_id, filename, mtime in rows:
+                try:
+                    body = _read_stemmed(os.path.join(self.notes_folder, filename))
+                except OSError:
+                    body = ""
+                documents.append((note_id, mtime, body))
+
+            with self._lock:
+                for note_id, mtime, body in documents:
+                    self._conn.execute(
+                        "DELETE FROM notes_fts WHERE rowid = ?", (note_id,)
+                    )
+                    self._conn.execute(
+                        "INSERT INTO notes_fts (rowid, body) VALUES (?, ?)",
+                        (note_id, body),
+                    )
+                    self._conn.execute(
+                        "UPDATE notes SET indexed_mtime = ? WHERE id = ?",
+                        (mtime, note_id),
+                    )
+                self._conn.commit()
+            indexed += len(documents)
+            metrics.incr("search.indexed", len(documents))
+
+    def search(self, query: str, offset: int, limit: int) -> list:
+        """Ранжированные результаты (id, filename, first_line) по запросу."""
+        terms = stem_text(query).split()
+        if not terms:
+            return []
+        match = " ".join(f'"{term}"' for term in terms)
+        with metrics.timer("search.query"), self._lock:
+            return self._conn.execute(
+                "SELECT notes.id, notes.filename, notes.first_line "
+                "FROM notes_fts JOIN notes ON notes.id = notes_fts.rowid "
+                "WHERE notes_fts MATCH ? ORDER BY bm25(notes_fts) LIMIT ? OFFSET ?",
+                (match, limit, offset),
+            ).fetchall()
+
+    async def run_indexer(self, interval: float = SEARCH_INDEX_INTERVAL):
+        """Фоновая задача: догоняет полнотекстовый индекс в отдельном потоке."""
+        while True:
+            try:
+                with metrics.timer("search.index"):
+                    await asyncio.to_thread(self.index_pending)
+            except Exception as e:
+                logger.error(f"Error indexing notes: {str(e)}")
+            await asyncio.sleep(interval)
+
+    async def run_watcher(self, interval: float = CATALOG_SCAN_INTERVAL):
+        """Фоновая задача: периодически сканирует папку в отдельном потоке."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                with metrics.timer("catalog.scan"):
+                    await asyncio.to_thread(self.sync)
+            except Exception as e:
+                logger.error(f"Error scanning notes folder: {str(e)}")
+
+
+note_catalog = NoteCatalog(os.path.join(STATE_FOLDER, "catalog.sqlite3"), NOTES_FOLDER)
@@ -1,12 +1,20 @@
+import asyncio
 import os
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 from enum import Enum, auto
 from dataclasses import dataclass
-from typing import List
+from typing import List, Tuple
 
 from handlers.utils import create_new_note, is_allowed_user
-from config import logger, NOTES_FOLDER, AUDIO_TEMP_FOLDER, note_manager
+from config import logger, NOTES_FOLDER, NOTES_PAGE_SIZE, NoteManager
+from metrics import metrics
+from note_writer import note_writer
+from sessions import sessions
+from catalog import note_catalog
+from note_viewer import PAGE_BYTES, NotePage, read_page, tail_start
+from media_store import media_store
+from video_jobs import video_transcoder
 
 
 class MessageType(Enum):
@@ -14,11 +22,25 @@ class MessageType(Enum):
     START = auto()
     PRINTNOTE = auto()
     CALLBACK = auto()
+    SEARCH = auto()
+    VIEWNOTE = auto()
 
 
 @dataclass
 class ListNotesData:
-    notes: List[str]
+    notes: List[Tuple[int, str, float]]
+    page: int
+    pages: int
+    total: int
+    sort: str
+
+
+@dataclass
+class SearchData:
+    query: str
+    results: List[Tuple[int, str, str]]
+    page: int
+    has_next: bool
 
 
 @dataclass
@@ -42,24 +64,142 @@ class PrintNoteData:
     note_content: str
 
 
+@dataclass
+class NotePageData:
+    note_id: int
+    filename: str
+    page: NotePage
+
+
 MessageData = (
-    StartData | ListNotesData | PrintNoteData | CallbackDataText | CallbackDataFile
+    StartData
+    | ListNotesData
+    | PrintNoteData
+    | CallbackDataText
+    | CallbackDataFile
+    | SearchData
+    | NotePageData
 )
 
 
+def _page_button(text: str, page: int, sort: str) -> InlineKeyboardButton:
+    return InlineKeyboardButton(text=text, callback_data=f"notes_page:{sort}:{page}")
+
+
+def _cursor_button(
+    text: str, direction: str, page: int, sort: str, note: tuple
+) -> InlineKeyboardButton:
+    """Кнопка соседней страницы с курсором от крайней заметки текущей.
+
+    Для сортировки по дате в кнопке хранится mtime, имя файла в 64 байта
+    callback_data не помещается и берётся из каталога по id.
+    """
+    note_id, _, mtime = note
+    key = repr(mtime) if sort == "m" else ""
+    return InlineKeyboardButton(
+        text=text, callback_data=f"notes_{direction}:{sort}:{page}:{note_id}:{key}"
+    )
+
+
+def _pagination_keyboard(notes: list, page: int, pages: int, sort: str) -> list:
+    """Кнопки навигации: назад/вперёд, переход на соседние страницы и сортировка."""
+    rows = []
+    if pages > 1:
+        navigation = []
+        if page > 0:
+            navigation.append(_cursor_button("◀️", "before", page - 1, sort, notes[0]))
+        first = max(0, min(page - 2, pages - 5))
+        for number in range(first, min(first + 5, pages)):
+            text = f"·{number + 1}·" if number == page else str(number + 1)
+            navigation.append(_page_button(text, number, sort))
+        if page < pages - 1:
+            navigation.append(_cursor_button("▶️", "after", page + 1, sort, notes[-1]))
+        rows.append(navigation)
+        if pages > 5:
+            rows.append(
+                [
+                    _page_button("⏮ Первая", 0, sort),
+                    _page_button("Последняя ⏭", pages - 1, sort),
+                ]
+            )
+    other_sort = "n" if sort == "m" else "m"
+    rows.append(
+        [
+            _page_button(
+                "Сортировать по имени" if other_sort == "n" else "Сортировать по дате",
+                0,
+                other_sort,
+            )
+        ]
+    )
+    return rows
+
+
 def _format_message(type: MessageType, data: MessageData):
     match type, data:
-        case MessageType.LISTNOTES, ListNotesData(notes):
-            response = "Список заметок:\n"
+        case MessageType.LISTNOTES, ListNotesData(notes, page, pages, total, sort):
+            response = f"Список заметок (стр. {page + 1} из {pages}, всего {total}):\n"
             keyboard = []
-            for idx, note in enumerate(notes):
-                # file_path = os.path.join(NOTES_FOLDER, note)
+            for note_id, note, _ in notes:
                 response += f"{note}\n"
                 button = InlineKeyboardButton(
                     text=f"{note[:29]}",  # Текст на кнопке
-                    callback_data=f"select_note_{idx}",  # Данные, которые вернутся
+                    callback_data=f"select_note:{note_id}",  # Стабильный ID заметки
                 )
                 keyboard.append([button])  # Каждая кнопка в отдельном ряду
+            keyboard.extend(_pagination_keyboard(notes, page, pages, sort))
+            return response, keyboard
+        case MessageType.SEARCH, SearchData(query, results, page, has_next):
+            response = f"Результаты поиска «{query}» (стр. {page + 1}):\n"
+            keyboard = []
+            for note_id, note, first_line in results:
+                response += f"{note} — {first_line[:60]}\n"
+                keyboard.append(
+                    [
+                        InlineKeyboardButton(
+                            text=f"{note[:29]}", callback_data=f"select_note:{note_id}"
+                        )
+                    ]
+                )
+            navigation = []
+            if page > 0:
+                navigation.append(
+                    InlineKeyboardButton("◀️", callback_data=f"search_page:{page - 1}")
+                )
+            if has_next:
+                navigation.append(
+                    InlineKeyboardButton("▶️", callback_data=f"search_page:{page + 1}")
+                )
+            if navigation:
+                keyboard.append(navigation)
+            return response, keyboard
+        case MessageType.VIEWNOTE, NotePageData(note_id, filename, page):
+            response = (
+                f"{filename} (байты {page.start}–{page.end} из {page.size}):\n\n"
+                f"{page.text}"
+            )
+            navigation = []
+            if page.prev_start is not None:
+                navigation.append(
+                    InlineKeyboardButton(
+                        "◀️", callback_data=f"view:{note_id}:{page.prev_start}:0"
+                    )
+                )
+            if page.end < page.size:
+                navigation.append(
+                    InlineKeyboardButton(
+                        "▶️",
+                        callback_data=f"view:{note_id}:{page.end}:{int(page.in_fence)}",
+                    )
+                )
+            keyboard = [navigation] if navigation else []
+            keyboard.append(
+                [
+                    InlineKeyboardButton(
+                        "Отправить файлом", callback_data=f"view_file:{note_id}"
+                    )
+                ]
+            )
             return response, keyboard
         case MessageType.START, StartData(user_id):
             return f"Бот запущен! Ваш user_id: {user_id}\nСкопируйте этот ID и добавьте его в ALLOWED_USER_ID.\nОтправляйте текст, фото или голосовые сообщения. Используйте /newnote для создания новой заметки, /printnote для отправки текущей,/listnotes для списка заметок или /deletenote для удаления текущей."
@@ -87,8 +227,9 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text(
             _format_message(MessageType.START, StartData(user_id))
         )
-        if note_manager.get_current_note_file() is None:
-            create_new_note()
+        session = sessions.for_update(update)
+        if is_allowed_user(update) and session.get_current_note_file() is None:
+            create_new_note(session)
     except Exception as e:
         await update.message.reply_text(f"Ошибка: {str(e)}")
         logger.error(f"Error in start: {str(e)}")
@@ -99,19 +240,20 @@ async def new_note(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not is_allowed_user(update):
         return
     try:
-        note_manager.set_current_note_file(create_new_note())
+        session = sessions.for_update(update)
+        create_new_note(session)
         await update.message.reply_text(
-            f"Создана новая заметка: {os.path.basename(note_manager.get_current_note_file())}"
+            f"Создана новая заметка: {os.path.basename(session.get_current_note_file())}"
         )
     except Exception as e:
         await update.message.reply_text(f"Ошибка при создании заметки: {str(e)}")
         logger.error(f"Error in new_note: {str(e)}")
 
 
-def _check_current_note() -> bool:
+def _check_current_note(session: NoteManager) -> bool:
     """Checks for current_note_file"""
-    return note_manager.get_current_note_file() is None or not os.path.exists(
-        note_manager.get_current_note_file()
+    return session.get_current_note_file() is None or not os.path.exists(
+        session.get_current_note_file()
     )
 
 
@@ -120,60 +262,90 @@ async def print_note(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not is_allowed_user(update):
         return
     try:
-        if _check_current_note():
+        session = sessions.for_update(update)
+        if _check_current_note(session):
             await update.message.reply_text(
                 "Нет активной заметки. Создайте новую с помощью /newnote."
             )
             return
-        with open(note_manager.get_current_note_file(), "r", encoding="utf-8") as f:
-            note_content = f.read()
-        if len(note_content) <= 4096:
+        note_path = session.get_current_note_file()
+        await note_writer.flush(note_path)
+        # Размер известен из stat, длинная заметка показывается постранично
+        if os.stat(note_path).st_size <= PAGE_BYTES:
+            with open(note_path, "r", encoding="utf-8") as f:
+                note_content = f.read()
             await update.message.reply_text(
                 _format_message(MessageType.PRINTNOTE, PrintNoteData(note_content))
             )
         else:
-            with open(note_manager.get_current_note_file(), "rb") as f:
-                await update.message.reply_document(
-                    document=f,
-                    filename=os.path.basename(note_manager.get_current_note_file()),
-                    caption="Заметка слишком длинная, отправляю как файл.",
-                )
+            response, keyboard = _note_page(note_path, 0)
+            await update.message.reply_text(
+                response, reply_markup=InlineKeyboardMarkup(keyboard)
+            )
         await update.message.reply_text("Заметка отправлена.")
     except Exception as e:
         await update.message.reply_text(f"Ошибка при отправке заметки: {str(e)}")
         logger.error(f"Error in print_note: {str(e)}")
 
 
+def _note_page(note_path: str, start: int, in_fence: bool = False):
+    """Текст и клавиатура одной страницы заметки, читается только эта страница."""
+    page = read_page(note_path, start, in_fence)
+    return _format_message(
+        MessageType.VIEWNOTE,
+        NotePageData(
+            note_catalog.get_id(note_path), os.path.basename(note_path), page
+        ),
+    )
+
+
+def _note_cursor(sort: str, note_id: str, key: str):
+    """Курсор (значение ключа, id) из кнопки, None если заметки уже нет."""
+    if sort == "m":
+        return float(key), int(note_id)
+    filename = note_catalog.get_filename(int(note_id))
+    return (filename, int(note_id)) if filename else None
+
+
+def _notes_page(sort: str, page: int, cursor: tuple = None, backward: bool = False):
+    """Текст и клавиатура одной страницы списка, None если заметок нет.
+
+    С курсором соседняя страница читается по индексу от крайней заметки,
+    без курсора (переход на произвольную страницу) — через OFFSET.
+    """
+    total = note_catalog.count()
+    if total == 0:
+        return None
+    pages = (total + NOTES_PAGE_SIZE - 1) // NOTES_PAGE_SIZE
+    page = min(max(page, 0), pages - 1)
+    notes = None
+    if cursor is not None:
+        notes = note_catalog.page_after(sort, cursor, NOTES_PAGE_SIZE, backward)
+        # Курсор устарел (заметки удалили или добавили в начало списка):
+        # страница берётся по номеру
+        if not notes or (backward and len(notes) < NOTES_PAGE_SIZE):
+            notes = None
+    if notes is None:
+        notes = note_catalog.page(sort, page * NOTES_PAGE_SIZE, NOTES_PAGE_SIZE)
+    return _format_message(
+        MessageType.LISTNOTES, ListNotesData(notes, page, pages, total, sort)
+    )
+
+
 async def list_notes(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /listnotes command"""
     if not is_allowed_user(update):
         return
     try:
-        notes = [f for f in os.listdir(NOTES_FOLDER) if f.endswith(".md")]
-        if not notes:
+        page = _notes_page(sort="m", page=0)
+        if page is None:
             await update.message.reply_text("Папка с заметками пуста.")
             return
 
-        response, keyboard = _format_message(
-            MessageType.LISTNOTES, ListNotesData(notes)
+        response, keyboard = page
+        await update.message.reply_text(
+            response, reply_markup=InlineKeyboardMarkup(keyboard)
         )
-
-        reply_markup = InlineKeyboardMarkup(keyboard)
-
-        context.user_data["notes_list"] = notes
-        if len(response) <= 4096:
-            await update.message.reply_text(response, reply_markup=reply_markup)
-        else:
-            temp_file = os.path.join(AUDIO_TEMP_FOLDER, "notes_list.txt")
-            with open(temp_file, "w", encoding="utf-8") as f:
-                f.write(response)
-            with open(temp_file, "rb") as f:
-                await update.message.reply_document(
-                    document=f,
-                    filename="notes_list.txt",
-                    caption="Список заметок слишком длинный, отправляю как файл.",
-                )
-            os.remove(temp_file)
     except Exception as e:
         await update.message.reply_text(
             f"Ошибка при получении списка заметок: {str(e)}"
@@ -181,32 +353,162 @@ async def list_notes(update: Update, context: ContextTypes.DEFAULT_TYPE):
         logger.error(f"Error in list_notes: {str(e)}")
 
 
-def _check_index(index: int, notes: List[int]) -> bool:
-    return index < 0 or index >= len(notes)
+def _search_page(query: str, page: int):
+    """Текст и клавиатура страницы результатов поиска, None если пусто."""
+    # Берём на один результат больше, чтобы понять, есть ли следующая страница
+    results = note_catalog.search(
+        query, page * NOTES_PAGE_SIZE, NOTES_PAGE_SIZE + 1
+    )
+    if not results:
+        return None
+    return _format_message(
+        MessageType.SEARCH,
+        SearchData(
+            query, results[:NOTES_PAGE_SIZE], page, len(results) > NOTES_PAGE_SIZE
+        ),
+    )
+
+
+async def search(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle /search command"""
+    if not is_allowed_user(update):
+        return
+    try:
+        query = " ".join(context.args).strip()
+        if not query:
+            await update.message.reply_text("Использование: /search <запрос>")
+            return
+
+        context.user_data["search_query"] = query
+        page = _search_page(query, 0)
+        if page is None:
+            await update.message.reply_text("Ничего не найдено.")
+            return
+
+        response, keyboard = page
+        await update.message.reply_text(
+            response, reply_markup=InlineKeyboardMarkup(keyboard)
+        )
+    except Exception as e:
+        await update.message.reply_text(f"Ошибка при поиске: {str(e)}")
+        logger.error(f"Error in search: {str(e)}")
+
+
+async def tail_note(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle /tail command"""
+    if not is_allowed_user(update):
+        return
+    try:
+        session = sessions.for_update(update)
+        if _check_current_note(session):
+            await update.message.reply_text(
+                "Нет активной заметки. Создайте новую с помощью /newnote."
+            )
+            return
+        try:
+            entries = int(context.args[0]) if context.args else 5
+        except ValueError:
+            await update.message.reply_text("Использование: /tail <число записей>")
+            return
+
+        note_path = session.get_current_note_file()
+        await note_writer.flush(note_path)
+        start = await asyncio.to_thread(tail_start, note_path, max(entries, 1))
+        response, keyboard = _note_page(note_path, start)
+        await update.message.reply_text(
+            response, reply_markup=InlineKeyboardMarkup(keyboard)
+        )
+    except Exception as e:
+        await update.message.reply_text(f"Ошибка при отправке заметки: {str(e)}")
+        logger.error(f"Error in tail_note: {str(e)}")
 
 
 async def callback_query(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()  # Подтверждаем получение callback-а
+    if not is_allowed_user(update):
+        return
 
     try:
-        if query.data.startswith("select_note_"):
-            index = int(query.data.replace("select_note_", ""))
-            notes = context.user_data.get("notes_list", [])
-
-            if _check_index(index, notes):
-                await query.message.reply_text("Неверный индекс заметки.")
+        session = sessions.for_update(update)
+        if query.data.startswith("notes_page:"):
+            _, sort, page = query.data.split(":")
+            notes_page = _notes_page(sort, int(page))
+            if notes_page is None:
+                await query.edit_message_text("Папка с заметками пуста.")
                 return
-
-            selected_note = notes[index]
-            note_manager.set_current_note_file(
-                os.path.join(NOTES_FOLDER, selected_note)
+            response, keyboard = notes_page
+            await query.edit_message_text(
+                response, reply_markup=InlineKeyboardMarkup(keyboard)
+            )
+        elif query.data.startswith(("notes_after:", "notes_before:")):
+            action, sort, page, note_id, key = query.data.split(":")
+            notes_page = _notes_page(
+                sort,
+                int(page),
+                _note_cursor(sort, note_id, key),
+                backward=action == "notes_before",
+            )
+            if notes_page is None:
+                await query.edit_message_text("Папка с заметками пуста.")
+                return
+            response, keyboard = notes_page
+            await query.edit_message_text(
+                response, reply_markup=InlineKeyboardMarkup(keyboard)
+            )
+        elif query.data.startswith("search_page:"):
+            search_query = context.user_data.get("search_query")
+            page = int(query.data.split(":")[1])
+            search_page = _search_page(search_query, page) if search_query else None
+            if search_page is None:
+                await query.edit_message_text("Ничего не найдено.")
+                return
+            response, keyboard = search_page
+            await query.edit_message_text(
+                response, reply_markup=InlineKeyboardMarkup(keyboard)
             )
+        elif query.data.startswith("view:"):
+            _, note_id, start, in_fence = query.data.split(":")
+            selected_note = note_catalog.get_filename(int(note_id))
+            if selected_note is None:
+                await query.edit_message_text("Заметка не найдена.")
+                return
+            note_path = os.path.join(NOTES_FOLDER, selected_note)
+            await note_writer.flush(note_path)
+            response, keyboard = _note_page(note_path, int(start), in_fence == "1")
+            await query.edit_message_text(
+                response, reply_markup=InlineKeyboardMarkup(keyboard)
+            )
+        elif query.data.startswith("view_file:"):
+            selected_note = note_catalog.get_filename(int(query.data.split(":")[1]))
+            if selected_note is None:
+                await query.message.reply_text("Заметка не найдена.")
+                return
+            note_path = os.path.join(NOTES_FOLDER, selected_note)
+            await note_writer.flush(note_path)
+            with open(note_path, "rb") as f:
+                await query.message.reply_document(
+                    document=f,
+                    filename=selected_note,
+                    caption=_format_message(
+                        MessageType.CALLBACK, CallbackDataFile(selected_note)
+                    ),
+                )
+        elif query.data.startswith("select_note:"):
+            note_id = int(query.data.split(":")[1])
+            selected_note = note_catalog.get_filename(note_id)
 
-            with open(note_manager.get_current_note_file(), "r", encoding="utf-8") as f:
-                note_content = f.read()
+            if selected_note is None:
+                await query.message.reply_text("Заметка не найдена.")
+                return
+
+            session.set_current_note_file(os.path.join(NOTES_FOLDER, selected_note))
+            await note_writer.flush(session.get_current_note_file())
 
-            if len(note_content) <= 4096:
+            note_path = session.get_current_note_file()
+            if os.stat(note_path).st_size <= PAGE_BYTES:
+                with open(note_path, "r", encoding="utf-8") as f:
+                    note_content = f.read()
                 await query.message.reply_text(
                     _format_message(
                         MessageType.CALLBACK,
@@ -214,14 +516,10 @@ async def callback_query(update: Update, context: ContextTypes.DEFAULT_TYPE):
                     )
                 )
             else:
-                with open(note_manager.get_current_note_file(), "rb") as f:
-                    await query.message.reply_document(
-                        document=f,
-                        filename=selected_note,
-                        caption=_format_message(
-                            MessageType.CALLBACK, CallbackDataFile(selected_note)
-                        ),
-                    )
+                response, keyboard = _note_page(note_path, 0)
+                await query.message.reply_text(
+                    response, reply_markup=InlineKeyboardMarkup(keyboard)
+                )
             try:
                 chat_id = query.message.chat_id
                 message_id = query.message.message_id
@@ -243,15 +541,80 @@ async def delete_note(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not is_allowed_user(update):
         return
     try:
-        if _check_current_note():
+        session = sessions.for_update(update)
+        if _check_current_note(session):
             await update.message.reply_text("Нет активной заметки для удаления.")
             return
-        os.remove(note_manager.get_current_note_file())
-        note_name = os.path.basename(note_manager.get_current_note_file())
-        note_manager.set_current_note_file(None)
+        note_path = session.get_current_note_file()
+        async with sessions.note_lock(note_path):
+            note_writer.discard(note_path)
+            # Пачки, уже отданные потоку записи, не должны воссоздать файл
+            await note_writer.flush(note_path)
+            os.remove(note_path)
+        note_catalog.remove_note(note_path)
+        note_name = os.path.basename(note_path)
+        sessions.forget_note(note_path)
         await update.message.reply_text(f"Заметка {note_name} удалена.")
 
         await list_notes(update, context)
     except Exception as e:
         await update.message.reply_text(f"Ошибка при удалении заметки: {str(e)}")
         logger.error(f"Error in delete_note: {str(e)}")
+
+
+async def clean_media(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle /cleanmedia command"""
+    if not is_allowed_user(update):
+        return
+    try:
+        # Ссылки из буферов должны попасть в заметки до проверки
+        await note_writer.flush()
+        removed, freed = await asyncio.to_thread(media_store.collect_garbage)
+        await update.message.reply_text(
+            f"Удалено неиспользуемых вложений: {removed} "
+            f"({freed / 1024 / 1024:.1f} МБ)."
+        )
+    except Exception as e:
+        await update.message.reply_text(f"Ошибка при очистке вложений: {str(e)}")
+        logger.error(f"Error in clean_media: {str(e)}")
+
+
+async def video_jobs(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle /jobs command"""
+    if not is_allowed_user(update):
+        return
+    try:
+        if not video_transcoder.enabled:
+            await update.message.reply_text(
+                "Перекодирование видео выключено (VIDEO_TRANSCODE)."
+            )
+            return
+        jobs = video_transcoder.jobs()
+        if not jobs:
+            await update.message.reply_text("Очередь перекодирования пуста.")
+            return
+        lines = []
+        for job in jobs:
+            name = job.file_name or job.unique_id
+            if job.started:
+                lines.append(f"▶ {name}: {job.progress:.0%}")
+            else:
+                lines.append(f"⏳ {name}: в очереди")
+        await update.message.reply_text(
+            "Перекодирование видео:\n\n" + "\n".join(lines)
+        )
+    except Exception as e:
+        await update.message.reply_text(f"Ошибка при получении задач: {str(e)}")
+        logger.error(f"Error in video_jobs: {str(e)}")
+
+
+async def stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle /stats command"""
+    if not is_allowed_user(update):
+        return
+    try:
+        summary = metrics.summary() or "Метрик пока нет."
+        await update.message.reply_text(f"Метрики бота:\n\n{summary}"[:4096])
+    except Exception as e:
+        await update.message.reply_text(f"Ошибка при получении метрик: {str(e)}")
+        logger.error(f"Error in stats: {str(e)}")
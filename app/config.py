@@ -1,6 +1,5 @@
 from dotenv import load_dotenv
 import os
-import whisper
 import logging
 
 # Загружаем токен из .env
@@ -8,21 +7,118 @@ load_dotenv()
 TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN")
 
 # Конфигурация
-ALLOWED_USER_ID = int(os.getenv("ALLOWED_USER_ID"))
+# Один ID или несколько через запятую (ALLOWED_USER_IDS или ALLOWED_USER_ID)
+ALLOWED_USER_IDS = {
+    int(user_id)
+    for user_id in (
+        os.getenv("ALLOWED_USER_IDS") or os.getenv("ALLOWED_USER_ID", "")
+    ).split(",")
+    if user_id.strip()
+}
 OBSIDIAN_VAULT_PATH = os.getenv("OBSIDIAN_VAULT_PATH")
 NOTES_FOLDER = os.getenv("NOTES_FOLDER")
 TEMP_FOLDER = os.getenv("TEMP_FOLDER")
 AUDIO_TEMP_FOLDER = os.getenv("AUDIO_TEMP_FOLDER")
 ATTACH_FOLDER = os.getenv("ATTACH_FOLDER")
+# Служебные файлы бота (журнал, индексы). Папки с точкой Obsidian не показывает
+STATE_FOLDER = os.getenv("STATE_FOLDER") or os.path.join(
+    OBSIDIAN_VAULT_PATH or ".", ".obsidian-bot"
+)
+
+# Загрузка медиа
+DOWNLOAD_CONCURRENCY = int(os.getenv("DOWNLOAD_CONCURRENCY", "4"))
+DOWNLOAD_RETRIES = int(os.getenv("DOWNLOAD_RETRIES", "3"))
+
+# Собственный сервер Bot API (telegram-bot-api). В локальном режиме
+# (--local) файлы берутся прямо из его папки, без загрузки по HTTP
+BOT_API_URL = os.getenv("BOT_API_URL", "").rstrip("/")  # например http://localhost:8081
+BOT_API_LOCAL = os.getenv("BOT_API_LOCAL", "false").lower() == "true"
+# Облачный Bot API отдаёт файлы до 20 МБ, локальный сервер — до 2000 МБ
+MAX_DOWNLOAD_SIZE = (2000 if BOT_API_LOCAL else 20) * 1024 * 1024
+
+# Очередь транскрипции. Одна модель Whisper не потокобезопасна,
+# поэтому по умолчанию работает один воркер.
+TRANSCRIPTION_WORKERS = int(os.getenv("TRANSCRIPTION_WORKERS", "1"))
+TRANSCRIPTION_QUEUE_SIZE = int(os.getenv("TRANSCRIPTION_QUEUE_SIZE", "20"))
+
+# Буферизованная запись заметок: none — без fsync, flush — fsync на каждую запись
+NOTE_FSYNC = os.getenv("NOTE_FSYNC", "none")
+NOTE_FLUSH_INTERVAL = float(os.getenv("NOTE_FLUSH_INTERVAL", "1.0"))
+NOTE_JOURNAL = os.getenv("NOTE_JOURNAL", "true").lower() == "true"
+
+# Конвертация видео и стикеров в GIF: пресет (quality, balanced, small)
+# и число одновременных процессов ffmpeg
+GIF_PRESET = os.getenv("GIF_PRESET", "balanced")
+MEDIA_WORKERS = int(os.getenv("MEDIA_WORKERS", str(os.cpu_count() or 2)))
+# Кэш готовых GIF для анимированных стикеров и фоновый прогрев всего набора
+STICKER_CACHE_MB = int(os.getenv("STICKER_CACHE_MB", "200"))
+STICKER_PREWARM = os.getenv("STICKER_PREWARM", "false").lower() == "true"
+
+# Фоновое перекодирование видео: кодек (h264 или av1), предельный размер
+# результата в МБ, максимальная высота кадра и число одновременных задач
+VIDEO_TRANSCODE = os.getenv("VIDEO_TRANSCODE", "false").lower() == "true"
+VIDEO_CODEC = os.getenv("VIDEO_CODEC", "h264").lower()
+VIDEO_MAX_MB = float(os.getenv("VIDEO_MAX_MB", "8"))
+VIDEO_MAX_HEIGHT = int(os.getenv("VIDEO_MAX_HEIGHT", "720"))
+VIDEO_TRANSCODE_WORKERS = int(os.getenv("VIDEO_TRANSCODE_WORKERS", "1"))
+VIDEO_QUEUE_SIZE = int(os.getenv("VIDEO_QUEUE_SIZE", "20"))
+
+# Обратное геокодирование геопозиций: сервер, совместимый с Nominatim,
+# срок хранения адресов в кэше, размер кэша и таймаут запроса
+GEOCODER_URL = os.getenv("GEOCODER_URL", "https://nominatim.openstreetmap.org")
+GEOCODER_USER_AGENT = os.getenv(
+    "GEOCODER_USER_AGENT", "obsidian_bot/1.0 (petya.08.tomsk@gmail.com)"
+)
+GEOCODER_TTL_DAYS = float(os.getenv("GEOCODER_TTL_DAYS", "90"))
+GEOCODER_CACHE_SIZE = int(os.getenv("GEOCODER_CACHE_SIZE", "10000"))
+GEOCODER_TIMEOUT = float(os.getenv("GEOCODER_TIMEOUT", "5"))
+
+# Трансляция геопозиции: точки ближе LIVE_MIN_DISTANCE метров к предыдущей
+# отбрасываются, трек сохраняется в gpx или geojson после окончания
+LIVE_MIN_DISTANCE = float(os.getenv("LIVE_MIN_DISTANCE", "20"))
+LIVE_TRACK_FORMAT = os.getenv("LIVE_TRACK_FORMAT", "gpx").lower()
+
+# Сколько секунд ждать следующий элемент альбома перед записью
+ALBUM_WINDOW = float(os.getenv("ALBUM_WINDOW", "1.0"))
+
+# Исходящие запросы к Bot API: запросов в секунду на чат, на группу и всего
+SEND_CHAT_RATE = float(os.getenv("SEND_CHAT_RATE", "1.0"))
+SEND_GROUP_RATE = float(os.getenv("SEND_GROUP_RATE", str(20 / 60)))
+SEND_GLOBAL_RATE = float(os.getenv("SEND_GLOBAL_RATE", "30"))
+SEND_RETRIES = int(os.getenv("SEND_RETRIES", "3"))
+# Подтверждения в течение окна (секунды) объединяются в одно сообщение
+CONFIRM_WINDOW = float(os.getenv("CONFIRM_WINDOW", "10"))
+SEND_REACTIONS = os.getenv("SEND_REACTIONS", "true").lower() == "true"
+
+# Параллельная обработка обновлений: всего и с медиа одновременно.
+# Внутри одного чата порядок сохраняется (см. update_processor.py)
+UPDATE_CONCURRENCY = int(os.getenv("UPDATE_CONCURRENCY", "32"))
+HEAVY_UPDATE_LIMIT = int(os.getenv("HEAVY_UPDATE_LIMIT", "4"))
+
+# Режим получения обновлений: polling или webhook
+BOT_MODE = os.getenv("BOT_MODE", "polling").lower()
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")  # публичный адрес, например https://bot.example.com
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+WEBHOOK_DRAIN_SECONDS = float(os.getenv("WEBHOOK_DRAIN_SECONDS", "5"))
+
+# Период сканирования папки заметок на внешние правки, в секундах
+CATALOG_SCAN_INTERVAL = float(os.getenv("CATALOG_SCAN_INTERVAL", "30"))
+NOTES_PAGE_SIZE = int(os.getenv("NOTES_PAGE_SIZE", "10"))
+# Задержка между проходами полнотекстового индексатора, в секундах
+SEARCH_INDEX_INTERVAL = float(os.getenv("SEARCH_INDEX_INTERVAL", "5"))
 
 # Создание папок
 os.makedirs(NOTES_FOLDER, exist_ok=True)
 os.makedirs(TEMP_FOLDER, exist_ok=True)
 os.makedirs(AUDIO_TEMP_FOLDER, exist_ok=True)
 os.makedirs(ATTACH_FOLDER, exist_ok=True)
+os.makedirs(STATE_FOLDER, exist_ok=True)
 
 
-# Глобальная переменная для текущего файла заметки
+# Текущая заметка одной сессии пользователя (см. sessions.py)
 class NoteManager:
     def __init__(self):
         self.current_note_file = None
@@ -33,13 +129,9 @@ class NoteManager:
     def get_current_note_file(self) -> str:
         return self.current_note_file
 
-
-# Создаем экземпляр NoteManager
-note_manager = NoteManager()
-
-# Инициализация Whisper
-WHISPER_MODEL = "tiny"  # tiny, base, medium
-model = whisper.load_model(WHISPER_MODEL)
+# Whisper загружается лениво при первой транскрипции или фоновом прогреве
+WHISPER_MODEL = os.getenv("WHISPER_MODEL", "tiny")  # tiny, base, medium
+WHISPER_WARMUP = os.getenv("WHISPER_WARMUP", "true").lower() == "true"
 
 # Настройка логирования
 logging.basicConfig(
@@ -0,0 +1,166 @@
+import asyncio
+import os
+import shutil
+import time
+
+import httpx
+from telegram import File
+
+from config import DOWNLOAD_CONCURRENCY, DOWNLOAD_RETRIES, logger
+from metrics import metrics
+
+CHUNK_SIZE = 64 * 1024
+
+
+def _local_path(file: File) -> str:
+    """Путь к файлу на диске, если его отдал локальный сервер Bot API."""
+    path = file.file_path
+    if path and os.path.isabs(path) and os.path.isfile(path):
+        return path
+    return None
+
+
+def _link_or_copy(source: str, path: str) -> int:
+    """Жёсткая ссылка на файл сервера, при другой файловой системе — копия."""
+    temp_path = f"{path}.part"
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+    try:
+        os.link(source, temp_path)
+        metrics.incr("downloads.linked")
+    except OSError:
+        shutil.copyfile(source, temp_path)
+        metrics.incr("downloads.copied")
+    os.replace(temp_path, path)
+    return os.path.getsize(path)
+
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _is_retryable(error: Exception) -> bool:
+    if isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+        return status == 429 or status >= 500
+    return isinstance(error, httpx.TransportError)
+
+
+class Downloader:
+    """Общий асинхронный загрузчик файлов Telegram.
+
+    Один пул соединений httpx на весь процесс, ограничение числа
+    одновременных загрузок и повторы с экспоненциальной задержкой.
+    С локальным сервером Bot API файл уже лежит на диске и не
+    скачивается, а связывается жёсткой ссылкой с папкой вложений.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 4,
+        retries: int = 3,
+        backoff: float = 0.5,
+        timeout: float = 60.0,
+    ):
+        self.max_concurrency = max_concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._active = 0
+        self._client = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout, connect=10.0),
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=self.max_concurrency,
+                ),
+                follow_redirects=True,
+            )
+        return self._client
+
+    async def _with_retries(self, download, label: str):
+        for attempt in range(self.retries + 1):
+            try:
+                async with self._semaphore:
+                    self._active += 1
+                    metrics.set_gauge("downloads.active", self._active)
+                    try:
+                        return await download()
+                    finally:
+                        self._active -= 1
+                        metrics.set_gauge("downloads.active", self._active)
+            except httpx.HTTPError as e:
+                if attempt == self.retries or not _is_retryable(e):
+                    metrics.incr("downloads.failed")
+                    raise
+                delay = self.backoff * 2**attempt
+                metrics.incr("downloads.retries")
+                logger.warning(
+                    f"Ошибка загрузки {label}: {str(e)}, повтор через {delay:.1f} с"
+                )
+                await asyncio.sleep(delay)
+
+    async def download_to_drive(self, file: File, path: str) -> int:
+        """Скачивает файл потоково на диск и возвращает число записанных байт."""
+        local_path = _local_path(file)
+        if local_path is not None:
+            size = await asyncio.to_thread(_link_or_copy, local_path, path)
+            metrics.incr("downloads.local_bytes", size)
+            return size
+
+        url = file.file_path
+        temp_path = f"{path}.part"
+
+        async def download() -> int:
+            started = time.perf_counter()
+            size = 0
+            async with self._get_client().stream("GET", url) as response:
+                response.raise_for_status()
+                with open(temp_path, "wb") as f:
+                    async for chunk in response.aiter_bytes(CHUNK_SIZE):
+                        f.write(chunk)
+                        size += len(chunk)
+            os.replace(temp_path, path)
+            metrics.observe("downloads.duration", time.perf_counter() - started)
+            metrics.incr("downloads.bytes", size)
+            return size
+
+        try:
+            return await self._with_retries(download, os.path.basename(url))
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    async def download_to_memory(self, file: File) -> bytes:
+        """Скачивает файл целиком в память."""
+        local_path = _local_path(file)
+        if local_path is not None:
+            return await asyncio.to_thread(_read_file, local_path)
+
+        url = file.file_path
+
+        async def download() -> bytes:
+            started = time.perf_counter()
+            response = await self._get_client().get(url)
+            response.raise_for_status()
+            metrics.observe("downloads.duration", time.perf_counter() - started)
+            metrics.incr("downloads.bytes", len(response.content))
+            return response.content
+
+        return await self._with_retries(download, os.path.basename(url))
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+downloader = Downloader(
+    max_concurrency=DOWNLOAD_CONCURRENCY,
+    retries=DOWNLOAD_RETRIES,
+)
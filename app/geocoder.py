@@ -0,0 +1,179 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+
+import httpx
+
+from config import (
+    GEOCODER_CACHE_SIZE,
+    GEOCODER_TIMEOUT,
+    GEOCODER_TTL_DAYS,
+    GEOCODER_URL,
+    GEOCODER_USER_AGENT,
+    STATE_FOLDER,
+    logger,
+)
+from metrics import metrics
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS addresses (
+    lat INTEGER NOT NULL,
+    lon INTEGER NOT NULL,
+    address TEXT NOT NULL,
+    created REAL NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (lat, lon)
+);
+CREATE INDEX IF NOT EXISTS addresses_last_used ON addresses (last_used);
+"""
+
+# 4 знака после запятой — около 11 м по широте
+COORDINATE_SCALE = 10_000
+# Политика Nominatim: не больше одного запроса в секунду
+MIN_REQUEST_INTERVAL = 1.0
+
+
+def _cache_key(latitude: float, longitude: float) -> tuple:
+    return round(latitude * COORDINATE_SCALE), round(longitude * COORDINATE_SCALE)
+
+
+def format_coordinates(latitude: float, longitude: float) -> str:
+    return f"{latitude:.6f}, {longitude:.6f}"
+
+
+class Geocoder:
+    """Асинхронное обратное геокодирование с постоянным кэшем.
+
+    Адреса хранятся в SQLite по координатам, округлённым примерно до 10 м,
+    поэтому повторные геопозиции (дом, работа) не уходят в сеть. Записи
+    старше ttl обновляются, при превышении max_entries удаляются давно
+    не использованные. Запросы к серверу идут не чаще раза в секунду
+    на весь процесс; при ошибке или таймауте возвращаются координаты.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        base_url: str,
+        ttl: float,
+        max_entries: int,
+        timeout: float,
+    ):
+        self.db_path = db_path
+        self.base_url = base_url.rstrip("/")
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._conn = None
+        self._lock = threading.Lock()
+        self._client = None
+        self._request_lock = asyncio.Lock()
+        self._last_request = 0.0
+
+    def open(self):
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout),
+                headers={"User-Agent": GEOCODER_USER_AGENT},
+            )
+        return self._client
+
+    def _cached(self, key: tuple) -> str:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT address, created FROM addresses WHERE lat = ? AND lon = ?",
+                key,
+            ).fetchone()
+            if row is None or time.time() - row[1] > self.ttl:
+                return None
+            self._conn.execute(
+                "UPDATE addresses SET last_used = ? WHERE lat = ? AND lon = ?",
+                (time.time(), *key),
+            )
+            self._conn.commit()
+        return row[0]
+
+    def _store(self, key: tuple, address: str):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO addresses VALUES (?, ?, ?, ?, ?)",
+                (*key, address, now, now),
+            )
+            # Вытеснение самых давно использованных записей сверх лимита
+            self._conn.execute(
+                """
+                DELETE FROM addresses WHERE rowid IN (
+                    SELECT rowid FROM addresses ORDER BY last_used DESC
+                    LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    async def _request(self, latitude: float, longitude: float) -> str:
+        async with self._request_lock:
+            delay = self._last_request + MIN_REQUEST_INTERVAL - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            try:
+                with metrics.timer("geocoder.request"):
+                    response = await self._get_client().get(
+                        f"{self.base_url}/reverse",
+                        params={"lat": latitude, "lon": longitude, "format": "json"},
+                    )
+            finally:
+                self._last_request = time.monotonic()
+        response.raise_for_status()
+        address = response.json().get("display_name")
+        if not address:
+            # Пустой ответ не кэшируется: сервер мог временно не найти адрес
+            raise ValueError("в ответе нет адреса")
+        return address
+
+    async def reverse(self, latitude: float, longitude: float) -> str:
+        """Адрес по координатам, при недоступности сервера — сами координаты."""
+        key = _cache_key(latitude, longitude)
+        address = self._cached(key)
+        if address is not None:
+            metrics.incr("geocoder.hits")
+            return address
+        metrics.incr("geocoder.misses")
+
+        try:
+            address = await self._request(latitude, longitude)
+        except httpx.TimeoutException:
+            metrics.incr("geocoder.timeouts")
+            logger.error("Таймаут геокодирования, сохраняются координаты")
+            return format_coordinates(latitude, longitude)
+        except Exception as e:
+            metrics.incr("geocoder.failed")
+            logger.error(f"Ошибка при геокодировании: {str(e)}")
+            return format_coordinates(latitude, longitude)
+        self._store(key, address)
+        return address
+
+
+geocoder = Geocoder(
+    os.path.join(STATE_FOLDER, "geocode.sqlite3"),
+    base_url=GEOCODER_URL,
+    ttl=GEOCODER_TTL_DAYS * 86400,
+    max_entries=GEOCODER_CACHE_SIZE,
+    timeout=GEOCODER_TIMEOUT,
+)
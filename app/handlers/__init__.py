@@ -7,6 +7,8 @@ from .sticker import handle_sticker
 from .video_note import handle_video_note
 from .location import handle_location
 from .attachments import handle_document
+from .album import handle_album, album_collector, MEDIA_GROUP
+from .live_location import handle_live_location, live_tracker, LIVE_LOCATION
 
 __all__ = [
     "handle_text",
@@ -18,4 +20,10 @@ __all__ = [
     "handle_video_note",
     "handle_location",
     "handle_document",
+    "handle_album",
+    "album_collector",
+    "MEDIA_GROUP",
+    "handle_live_location",
+    "live_tracker",
+    "LIVE_LOCATION",
 ]
@@ -0,0 +1,135 @@
+import asyncio
+from dataclasses import dataclass, field
+
+from telegram import Message, Update
+from telegram.ext import ContextTypes, filters
+
+from config import ALBUM_WINDOW, logger
+from metrics import metrics
+from sender import confirmations
+from .attachments import save_document
+from .caption import append_caption
+from .photo import save_photo
+from .utils import append_to_note, is_allowed_user, write_note_block
+from .video import save_video, transcode_video
+
+
+class _MediaGroupFilter(filters.MessageFilter):
+    def filter(self, message: Message) -> bool:
+        return message.media_group_id is not None
+
+
+# Сообщения, входящие в альбом
+MEDIA_GROUP = _MediaGroupFilter(name="MediaGroup")
+
+
+@dataclass
+class _PendingAlbum:
+    updates: list = field(default_factory=list)
+    deadline: float = 0.0
+
+
+async def _save_item(message: Message) -> str:
+    if message.photo:
+        return await save_photo(message.photo[-1])
+    if message.video:
+        return await save_video(message.video)
+    return await save_document(message.document)
+
+
+class AlbumCollector:
+    """Собирает сообщения альбома по media_group_id и пишет их одним блоком.
+
+    Telegram присылает элементы альбома отдельными сообщениями. Коллектор
+    ждёт, пока в течение window секунд не придёт новый элемент, затем
+    скачивает все файлы параллельно и добавляет в заметку один заголовок,
+    подписи и галерею ссылок, отвечая одним сообщением.
+    """
+
+    def __init__(self, window: float):
+        self.window = window
+        self._albums = {}
+        self._tasks = set()
+
+    def add(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        key = (update.effective_chat.id, update.message.media_group_id)
+        album = self._albums.get(key)
+        if album is None:
+            album = self._albums[key] = _PendingAlbum()
+            # Место в очереди чата занимается сразу: сообщения после альбома
+            # попадут в заметку после него
+            context.application.update_processor.hold(*key)
+            task = asyncio.create_task(self._flush_when_quiet(key, context))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        album.updates.append(update)
+        album.deadline = asyncio.get_running_loop().time() + self.window
+        metrics.incr("album.items")
+
+    async def _flush_when_quiet(self, key: tuple, context: ContextTypes.DEFAULT_TYPE):
+        album = self._albums[key]
+        loop = asyncio.get_running_loop()
+        while (delay := album.deadline - loop.time()) > 0:
+            await asyncio.sleep(delay)
+        del self._albums[key]
+
+        updates = sorted(album.updates, key=lambda u: u.message.message_id)
+        try:
+            # Запись идёт на месте первого элемента в очереди чата и под
+            # лимитом тяжёлых обновлений, как если бы альбом был одним обновлением
+            await context.application.update_processor.run_held(
+                *key, self._write_album(updates, context), heavy=True
+            )
+        except Exception as e:
+            logger.error(f"Error in handle_album: {str(e)}")
+
+    async def _write_album(self, updates: list, context: ContextTypes.DEFAULT_TYPE):
+        # Файлы качаются параллельно до захвата блокировки заметки
+        with metrics.timer("album.download"):
+            results = await asyncio.gather(
+                *(_save_item(u.message) for u in updates), return_exceptions=True
+            )
+        links = []
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error(f"Error saving album item: {str(result)}")
+            else:
+                links.append(result)
+
+        async def write(update: Update, context: ContextTypes.DEFAULT_TYPE):
+            for item in updates:
+                append_caption(item)
+            for link in links:
+                append_to_note(link)
+            for item in updates:
+                if item.message.video:
+                    transcode_video(item.message.video)
+
+        first = updates[0]
+        await write_note_block(first, context, write)
+        if len(links) == len(updates):
+            text = f"Альбом добавлен в заметку: {len(links)} файлов. #album"
+        else:
+            text = (
+                f"Альбом добавлен в заметку: {len(links)} из {len(updates)} "
+                "файлов, остальные не удалось загрузить. #album"
+            )
+        await confirmations.confirm(first, text)
+
+    async def drain(self):
+        """Сразу записывает все собираемые альбомы, вызывается при остановке."""
+        for album in self._albums.values():
+            album.deadline = 0.0
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+album_collector = AlbumCollector(ALBUM_WINDOW)
+
+
+async def handle_album(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Функция для обработки элементов альбома. Откладывает запись до прихода всего альбома."""
+    if not is_allowed_user(update):
+        return
+
+    album_collector.add(update, context)
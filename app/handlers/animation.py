@@ -1,19 +1,21 @@
 from telegram import Update
 from telegram.ext import ContextTypes
-import requests
 import os
 from .utils import (
     is_allowed_user,
     append_to_note,
     format_content,
     generate_filename,
-    mp4_to_gif,
     ContentType,
     AnimationContentData,
     BigMediaData,
     main_decorator,
 )
-from config import logger, TEMP_FOLDER
+from config import logger, MAX_DOWNLOAD_SIZE, TEMP_FOLDER
+from downloads import downloader
+from sender import confirmations
+from media import mp4_to_gif
+from media_store import media_store
 from .caption import append_caption
 
 
@@ -29,21 +31,23 @@ async def handle_animation(update: Update, context: ContextTypes.DEFAULT_TYPE):
         os.makedirs(TEMP_FOLDER, exist_ok=True)
 
         animation = update.message.animation
-        if animation.file_size < 52428800:  # 50 MB
-            file = await animation.get_file()
-            gif_file_name = generate_filename(ContentType.ANIMATION, update)
-            mp4_file_name = f"temp_{gif_file_name.replace('.gif', '.mp4')}"
-            mp4_file_path = os.path.join(TEMP_FOLDER, mp4_file_name)
+        if animation.file_size < MAX_DOWNLOAD_SIZE:
+            # Уже сконвертированная GIF берётся из хранилища
+            gif_file_name = media_store.lookup(animation.file_unique_id)
+            if gif_file_name is None:
+                file = await animation.get_file()
+                gif_file_name = generate_filename(ContentType.ANIMATION, update)
+                mp4_file_name = f"temp_{gif_file_name.replace('.gif', '.mp4')}"
+                mp4_file_path = os.path.join(TEMP_FOLDER, mp4_file_name)
 
-            # Скачиваем MP4
-            with requests.get(file.file_path, stream=True) as response:
-                response.raise_for_status()
-                with open(mp4_file_path, "wb") as f:
-                    for chunk in response.iter_content(chunk_size=8192):
-                        f.write(chunk)
+                # Скачиваем MP4
+                await downloader.download_to_drive(file, mp4_file_path)
 
-            # Конвертируем в GIF
-            mp4_to_gif(mp4_file_path, gif_file_name)
+                # Конвертируем в GIF
+                gif_file_path = await mp4_to_gif(mp4_file_path, gif_file_name)
+                gif_file_name = await media_store.register(
+                    animation.file_unique_id, gif_file_path
+                )
 
             # Форматируем и добавляем в заметку
             markdown_link = format_content(
@@ -51,7 +55,8 @@ async def handle_animation(update: Update, context: ContextTypes.DEFAULT_TYPE):
             )
             append_caption(update)
             append_to_note(markdown_link)
-            await update.message.reply_text(
+            await confirmations.confirm(
+                update,
                 "GIF и подпись добавлены в заметку. #animation"
             )
         else:
@@ -59,7 +64,8 @@ async def handle_animation(update: Update, context: ContextTypes.DEFAULT_TYPE):
             markdown_link = format_content(ContentType.ANIMATION, BigMediaData(file_id))
             append_caption(update)
             append_to_note(markdown_link)
-            await update.message.reply_text(
+            await confirmations.confirm(
+                update,
                 "GIF и подпись добавлены в заметку. #animation"
             )
 
@@ -1,13 +1,16 @@
-from telegram import Update
+from telegram import Document, Update
 from telegram.ext import (
     ContextTypes,
 )
-import requests
 import os
 from config import (
     ATTACH_FOLDER,
+    MAX_DOWNLOAD_SIZE,
     logger,
 )
+from downloads import downloader
+from sender import confirmations
+from media_store import media_store
 from .utils import (
     is_allowed_user,
     append_to_note,
@@ -19,6 +22,28 @@ from .utils import (
 )
 
 
+async def save_document(document: Document) -> str:
+    """Сохраняет документ в ATTACH_FOLDER и возвращает ссылку для заметки."""
+    # Больше лимита Bot API файл не скачать, в заметку идёт только file_id
+    if document.file_size >= MAX_DOWNLOAD_SIZE:
+        return format_content(ContentType.DOCUMENT, BigMediaData(document.file_id))
+
+    file_name = media_store.lookup(document.file_unique_id)
+    if file_name is None:
+        file = await document.get_file()
+        # Используем оригинальное имя файла или резервное, если file_name отсутствует
+        file_name = (
+            document.file_name
+            if document.file_name
+            else f"document_{document.file_id}.bin"
+        )
+        file_path = os.path.join(ATTACH_FOLDER, file_name)
+
+        await downloader.download_to_drive(file, file_path)
+        file_name = await media_store.register(document.file_unique_id, file_path)
+    return format_content(ContentType.DOCUMENT, DocumentContentData(file_name))
+
+
 @main_decorator
 async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Function to handle document messages. Add document to current note and save to ATTACH_FOLDER with original filename"""
@@ -27,38 +52,14 @@ async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     try:
         document = update.message.document
+        markdown_link = await save_document(document)
 
-        # Проверяем размер файла (20 МБ = 20 * 1024 * 1024 байт)
-        if document.file_size < 20971520:
-            file = await document.get_file()
-            # Используем оригинальное имя файла или резервное, если file_name отсутствует
-            file_name = (
-                document.file_name
-                if document.file_name
-                else f"document_{document.file_id}.bin"
-            )
-            file_path = os.path.join(ATTACH_FOLDER, file_name)
-
-            response = requests.get(file.file_path, stream=True)
-            with open(file_path, "wb") as f:
-                f.write(response.content)
-
-            # Добавляем документ в заметку
-            markdown_link = format_content(
-                ContentType.DOCUMENT, DocumentContentData(file_name)
-            )
-            append_to_note(markdown_link)
-            await update.message.reply_text(
-                f"Документ добавлен в заметку: {file_name}. #document"
-            )
-        else:
-            file_id = document.file_id
-
-            markdown_link = format_content(ContentType.DOCUMENT, BigMediaData(file_id))
-            append_to_note(markdown_link)
-            await update.message.reply_text(
-                f"Документ добавлен в заметку: {document.file_name or 'документ'}. #document"
-            )
+        # Добавляем документ в заметку
+        append_to_note(markdown_link)
+        await confirmations.confirm(
+            update,
+            f"Документ добавлен в заметку: {document.file_name or 'документ'}. #document"
+        )
     except Exception as e:
         await update.message.reply_text(f"Ошибка при добавлении документа: {str(e)}")
         logger.error(f"Error in handle_document: {str(e)}")
@@ -1,20 +1,20 @@
 from telegram import Update
+from markup import to_obsidian_markdown
 from .utils import (
     ContentType,
     format_content,
     TextContentData,
     append_to_note,
-    ensure_proper_code_blocks,
 )
 
 
 def append_caption(update: Update):
-    caption = update.message.caption_markdown_v2
+    caption = to_obsidian_markdown(
+        update.message.caption, update.message.caption_entities
+    )
     if caption:
-        caption = ensure_proper_code_blocks(caption)
-        if caption:
-            formatted_caption = format_content(
-                ContentType.CAPTION, TextContentData(caption)
-            )
-            append_to_note(formatted_caption)
+        formatted_caption = format_content(
+            ContentType.CAPTION, TextContentData(caption)
+        )
+        append_to_note(formatted_caption)
 
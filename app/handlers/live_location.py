@@ -0,0 +1,320 @@
+import asyncio
+import json
+import math
+import os
+import time
+from array import array
+from datetime import datetime, timezone
+
+from telegram import Message, Update
+from telegram.ext import ContextTypes, filters
+
+from config import (
+    ATTACH_FOLDER,
+    LIVE_MIN_DISTANCE,
+    LIVE_TRACK_FORMAT,
+    logger,
+)
+from geocoder import geocoder
+from metrics import metrics
+from sender import confirmations
+from .utils import (
+    ContentType,
+    LiveLocationData,
+    append_to_note,
+    format_content,
+    generate_filename,
+    is_allowed_user,
+    write_note_block,
+)
+
+EARTH_RADIUS = 6371000.0
+# Бессрочная трансляция (live_period = 0x7FFFFFFF) без обновлений
+# считается законченной через час
+INDEFINITE_LIVE_PERIOD = 0x7FFFFFFF
+IDLE_TIMEOUT = 3600
+# Запас после окончания live_period на последнее обновление
+EXPIRY_GRACE = 60
+# Даже без движения точка сохраняется не реже раза в 5 минут
+MAX_POINT_INTERVAL = 300
+
+
+class _LiveLocationFilter(filters.MessageFilter):
+    def filter(self, message: Message) -> bool:
+        return message.location is not None and bool(message.location.live_period)
+
+
+# Начало трансляции геопозиции; её обновления приходят как edited_message
+LIVE_LOCATION = _LiveLocationFilter(name="LiveLocation")
+
+
+def _distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Расстояние по формуле гаверсинусов, в метрах."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = (
+        math.sin(dphi / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS * math.asin(math.sqrt(a))
+
+
+class TrackBuffer:
+    """Точки трека в массивах array: 24 байта на точку вместо объектов."""
+
+    def __init__(self):
+        self.lats = array("d")
+        self.lons = array("d")
+        self.times = array("q")
+
+    def __len__(self) -> int:
+        return len(self.lats)
+
+    def append(self, latitude: float, longitude: float, timestamp: int):
+        self.lats.append(latitude)
+        self.lons.append(longitude)
+        self.times.append(timestamp)
+
+    def replace_last(self, latitude: float, longitude: float, timestamp: int):
+        self.lats[-1] = latitude
+        self.lons[-1] = longitude
+        self.times[-1] = timestamp
+
+    def distance(self, indexes=None) -> float:
+        indexes = range(len(self)) if indexes is None else indexes
+        total = 0.0
+        previous = None
+        for i in indexes:
+            if previous is not None:
+                total += _distance(
+                    self.lats[previous], self.lons[previous], self.lats[i], self.lons[i]
+                )
+            previous = i
+        return total
+
+    def simplify(self, tolerance: float) -> list:
+        """Индексы точек, оставшихся после упрощения Дугласа — Пекера."""
+        count = len(self)
+        if count < 3:
+            return list(range(count))
+        # Равнопромежуточная проекция в метрах: на длине трека её хватает
+        scale_x = math.cos(math.radians(self.lats[0])) * EARTH_RADIUS
+        xs = [math.radians(lon) * scale_x for lon in self.lons]
+        ys = [math.radians(lat) * EARTH_RADIUS for lat in self.lats]
+
+        keep = bytearray(count)
+        keep[0] = keep[-1] = 1
+        stack = [(0, count - 1)]
+        while stack:
+            first, last = stack.pop()
+            dx, dy = xs[last] - xs[first], ys[last] - ys[first]
+            length = math.hypot(dx, dy)
+            farthest, max_offset = None, tolerance
+            for i in range(first + 1, last):
+                if length:
+                    offset = abs(dy * (xs[i] - xs[first]) - dx * (ys[i] - ys[first]))
+                    offset /= length
+                else:
+                    offset = math.hypot(xs[i] - xs[first], ys[i] - ys[first])
+                if offset > max_offset:
+                    farthest, max_offset = i, offset
+            if farthest is not None:
+                keep[farthest] = 1
+                stack.append((first, farthest))
+                stack.append((farthest, last))
+        return [i for i in range(count) if keep[i]]
+
+
+def _iso_time(timestamp: int) -> str:
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _to_gpx(track: TrackBuffer, indexes: list, name: str) -> str:
+    points = "\n".join(
+        f'      <trkpt lat="{track.lats[i]:.6f}" lon="{track.lons[i]:.6f}">'
+        f"<time>{_iso_time(track.times[i])}</time></trkpt>"
+        for i in indexes
+    )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<gpx version="1.1" creator="obsidian-telegram-bot" '
+        'xmlns="http://www.topografix.com/GPX/1/1">\n'
+        f"  <trk>\n    <name>{name}</name>\n    <trkseg>\n"
+        f"{points}\n"
+        "    </trkseg>\n  </trk>\n</gpx>\n"
+    )
+
+
+def _to_geojson(track: TrackBuffer, indexes: list, name: str) -> str:
+    feature = {
+        "type": "Feature",
+        "properties": {
+            "name": name,
+            "times": [_iso_time(track.times[i]) for i in indexes],
+        },
+        "geometry": {
+            "type": "LineString",
+            "coordinates": [
+                [round(track.lons[i], 6), round(track.lats[i], 6)] for i in indexes
+            ],
+        },
+    }
+    return json.dumps({"type": "FeatureCollection", "features": [feature]})
+
+
+def _format_duration(seconds: int) -> str:
+    hours, minutes = divmod(seconds // 60, 60)
+    return f"{hours} ч {minutes} мин" if hours else f"{minutes} мин"
+
+
+class _LiveTrack:
+    def __init__(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        message = update.effective_message
+        # Блок в заметку пишется от имени первого сообщения трансляции
+        self.update = Update(update.update_id, message=message)
+        self.context = context
+        self.started = int(message.date.timestamp())
+        self.live_period = message.location.live_period
+        self.last_update = time.monotonic()
+        self.points = TrackBuffer()
+        self.tail = False
+        self.task = None
+
+    def deadline(self) -> float:
+        if self.live_period >= INDEFINITE_LIVE_PERIOD:
+            return self.last_update + IDLE_TIMEOUT
+        expires = self.started + self.live_period + EXPIRY_GRACE
+        return time.monotonic() + max(0.0, expires - time.time())
+
+    def add(self, latitude: float, longitude: float, timestamp: int):
+        """Добавляет точку, прореживая те, что ближе LIVE_MIN_DISTANCE."""
+        self.last_update = time.monotonic()
+        points = self.points
+        if len(points) == 0:
+            points.append(latitude, longitude, timestamp)
+            return
+        # Точка, не прошедшая порог, хранится до следующей: так конец
+        # трека всегда совпадает с последней геопозицией
+        anchor = -2 if self.tail else -1
+        moved = _distance(points.lats[anchor], points.lons[anchor], latitude, longitude)
+        waited = timestamp - points.times[anchor]
+        if self.tail:
+            points.replace_last(latitude, longitude, timestamp)
+            metrics.incr("live_location.dropped")
+        else:
+            points.append(latitude, longitude, timestamp)
+        self.tail = moved < LIVE_MIN_DISTANCE and waited < MAX_POINT_INTERVAL
+
+
+class LiveLocationTracker:
+    """Собирает трансляции геопозиции и пишет каждую в заметку один раз.
+
+    Обновления трансляции приходят правками сообщения. Точки прореживаются
+    по расстоянию и копятся в памяти; по окончании трансляции трек
+    упрощается алгоритмом Дугласа — Пекера, сохраняется файлом GPX или
+    GeoJSON, а в заметку добавляется одна строка со сводкой и ссылкой.
+    Адрес запрашивается только для начала и конца трека.
+    """
+
+    def __init__(self):
+        self._tracks = {}
+
+    @staticmethod
+    def _key(message: Message) -> tuple:
+        return message.chat_id, message.message_id
+
+    async def handle(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        message = update.effective_message
+        location = message.location
+        key = self._key(message)
+        track = self._tracks.get(key)
+
+        if track is None:
+            if not location.live_period:
+                # Остановка трансляции, начатой до перезапуска бота
+                return
+            track = self._tracks[key] = _LiveTrack(update, context)
+            track.task = asyncio.create_task(self._finish_when_expired(key))
+            metrics.set_gauge("live_location.active", len(self._tracks))
+            if update.message is not None:
+                await confirmations.confirm(
+                    update,
+                    "Трансляция геопозиции: трек будет добавлен в заметку "
+                    "после её окончания. #location",
+                )
+
+        timestamp = message.edit_date or message.date
+        track.add(location.latitude, location.longitude, int(timestamp.timestamp()))
+        if location.live_period:
+            track.live_period = location.live_period
+        else:
+            # Пользователь остановил трансляцию
+            track.task.cancel()
+            await self._finish(key)
+
+    async def _finish_when_expired(self, key: tuple):
+        track = self._tracks[key]
+        while (delay := track.deadline() - time.monotonic()) > 0:
+            await asyncio.sleep(delay)
+        await self._finish(key)
+
+    async def _finish(self, key: tuple):
+        track = self._tracks.pop(key, None)
+        metrics.set_gauge("live_location.active", len(self._tracks))
+        if track is None:
+            return
+        try:
+            await self._write_track(track)
+        except Exception as e:
+            logger.error(f"Error in handle_live_location: {str(e)}")
+
+    async def _write_track(self, track: _LiveTrack):
+        points = track.points
+        indexes = points.simplify(LIVE_MIN_DISTANCE / 2)
+        file_name = generate_filename(ContentType.LIVE_LOCATION)
+        render = _to_geojson if LIVE_TRACK_FORMAT == "geojson" else _to_gpx
+        content = render(points, indexes, os.path.splitext(file_name)[0])
+        with open(os.path.join(ATTACH_FOLDER, file_name), "w", encoding="utf-8") as f:
+            f.write(content)
+
+        start = await geocoder.reverse(points.lats[0], points.lons[0])
+        end = await geocoder.reverse(points.lats[-1], points.lons[-1])
+        summary = (
+            f"{points.distance(indexes) / 1000:.1f} км, "
+            f"{_format_duration(points.times[-1] - points.times[0])}, "
+            f"{start} → {end}"
+        )
+
+        async def write(update: Update, context: ContextTypes.DEFAULT_TYPE):
+            append_to_note(
+                format_content(
+                    ContentType.LIVE_LOCATION, LiveLocationData(summary, file_name)
+                )
+            )
+
+        await write_note_block(track.update, track.context, write)
+        metrics.incr("live_location.tracks")
+        await confirmations.confirm(
+            track.update, "Трек геопозиции добавлен в заметку. #location"
+        )
+
+    async def drain(self):
+        """Сразу записывает все незавершённые трансляции, вызывается при остановке."""
+        for key in list(self._tracks):
+            self._tracks[key].task.cancel()
+            await self._finish(key)
+
+
+live_tracker = LiveLocationTracker()
+
+
+async def handle_live_location(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Функция для обработки трансляции геопозиции и её обновлений."""
+    if not is_allowed_user(update):
+        return
+
+    try:
+        await live_tracker.handle(update, context)
+    except Exception as e:
+        logger.error(f"Error in handle_live_location: {str(e)}")
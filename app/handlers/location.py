@@ -5,6 +5,8 @@ from telegram.ext import (
 from config import (
     logger,
 )
+from geocoder import geocoder
+from sender import confirmations
 from .utils import (
     is_allowed_user,
     append_to_note,
@@ -13,23 +15,6 @@ from .utils import (
     LocationData,
     main_decorator,
 )
-import requests
-
-
-async def _get_address_from_coordinates(latitude: float, longitude: float) -> str:
-    """Преобразует координаты в читаемый адрес с помощью Nominatim API."""
-    try:
-        url = f"https://nominatim.openstreetmap.org/reverse?lat={latitude}&lon={longitude}&format=json"
-        headers = {
-            "User-Agent": "obsidian_bot/1.0 (petya.08.tomsk@gmail.com)"  # Укажите свой User-Agent
-        }
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()  # Проверка на ошибки HTTP
-        data = response.json()
-        return data.get("display_name", "Адрес не найден")
-    except Exception as e:
-        logger.error(f"Ошибка при геокодировании: {str(e)}")
-        return "Не удалось получить адрес"
 
 
 @main_decorator
@@ -43,12 +28,12 @@ async def handle_location(update: Update, context: ContextTypes.DEFAULT_TYPE):
         latitude = location.latitude
         longitude = location.longitude
 
-        adress = await _get_address_from_coordinates(latitude, longitude)
+        adress = await geocoder.reverse(latitude, longitude)
 
         # Форматируем данные локации
         markdown_link = format_content(ContentType.LOCATION, LocationData(adress))
         append_to_note(markdown_link)
-        await update.message.reply_text("Геопозиция добавлена в заметку. #location")
+        await confirmations.confirm(update, "Геопозиция добавлена в заметку. #location")
     except Exception as e:
         await update.message.reply_text(f"Ошибка при добавлении геопозиции: {str(e)}")
         logger.error(f"Error in handle_location: {str(e)}")
@@ -1,6 +1,5 @@
-from telegram import Update
+from telegram import PhotoSize, Update
 from telegram.ext import ContextTypes
-import requests
 import os
 from .utils import (
     is_allowed_user,
@@ -16,6 +15,25 @@ from config import (
     TEMP_FOLDER,
     logger,
 )
+from downloads import downloader
+from sender import confirmations
+from media_store import media_store
+
+
+async def save_photo(photo: PhotoSize) -> str:
+    """Сохраняет фото и возвращает ссылку для заметки."""
+    # Повторно присланное фото берём из хранилища без скачивания
+    file_name = media_store.lookup(photo.file_unique_id)
+    if file_name is None:
+        file = await photo.get_file()
+        file_name = generate_filename(ContentType.PHOTO)
+        file_path = os.path.join(TEMP_FOLDER, file_name)
+
+        size = await downloader.download_to_drive(file, file_path)
+        if not size:
+            raise ValueError("Не удалось загрузить фото.")
+        file_name = await media_store.register(photo.file_unique_id, file_path)
+    return format_content(ContentType.PHOTO, PhotoContentData(file_name))
 
 
 @main_decorator
@@ -26,30 +44,14 @@ async def handle_photo(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     try:
         photo = update.message.photo[-1]  # Берем фото наилучшего качества
-        file = await photo.get_file()
-        file_name = generate_filename(ContentType.PHOTO)
-        file_path = os.path.join(TEMP_FOLDER, file_name)
-        if not file_path:
-            await update.message.reply_text("Ошибка при добавлении фото: не указан путь к файлу")
-            logger.error("Ошибка при добавлении фото: не указан путь к файлу")  
-            return  
-        
-        response = requests.get(file.file_path)
-        if not response.content:
-            await update.message.reply_text("Не удалось загрузить фото.")
-            logger.error("Response content is empty")
-            return
-        
-        with open(file_path, "wb") as f:
-            f.write(response.content)
+        markdown_link = await save_photo(photo)
 
         # Добавляем фото в заметку
-        markdown_link = format_content(ContentType.PHOTO, PhotoContentData(file_name))
         append_caption(update)
 
         append_to_note(markdown_link)
         
-        await update.message.reply_text("Фото добавлено в заметку. #photo")
+        await confirmations.confirm(update, "Фото добавлено в заметку. #photo")
 
     except Exception as e:
         await update.message.reply_text(f"Ошибка при добавлении фото: {str(e)}")
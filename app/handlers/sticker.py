@@ -1,8 +1,12 @@
-from telegram import Update
+from telegram import Sticker, Update
 from telegram.ext import ContextTypes
-import requests
 import os
-from config import TEMP_FOLDER, logger
+from config import STICKER_PREWARM, TEMP_FOLDER, logger
+from downloads import downloader
+from sender import confirmations
+from media import convert_sticker
+from media_store import media_store
+from sticker_cache import sticker_cache
 from .utils import (
     is_allowed_user,
     append_to_note,
@@ -10,12 +14,33 @@ from .utils import (
     format_content,
     ContentType,
     StickerContentData,
-    mp4_to_gif,
-    tgs_to_gif,
     main_decorator,
 )
 
 
+async def _fetch_sticker(
+    sticker: Sticker, update: Update, context: ContextTypes.DEFAULT_TYPE
+) -> str:
+    """Скачивает стикер и при необходимости конвертирует его в GIF, возвращает путь."""
+    file_name = generate_filename(ContentType.STICKER, update)
+    file_path = os.path.join(TEMP_FOLDER, file_name)
+    if not (sticker.is_video or sticker.is_animated):
+        file = await sticker.get_file()
+        await downloader.download_to_drive(file, file_path)
+        return file_path
+
+    if STICKER_PREWARM:
+        sticker_cache.prewarm(context.bot, sticker.set_name)
+
+    # Готовая GIF из кэша конвертаций избавляет от рендера
+    key = sticker_cache.key(sticker)
+    if await sticker_cache.fetch(key, file_path):
+        return file_path
+    file_path = await convert_sticker(sticker, file_name)
+    await sticker_cache.store(key, file_path)
+    return file_path
+
+
 @main_decorator
 async def handle_sticker(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Функция для обработки сообщений со стикерами. Добавляет стикер в текущую заметку."""
@@ -27,32 +52,18 @@ async def handle_sticker(update: Update, context: ContextTypes.DEFAULT_TYPE):
         os.makedirs(TEMP_FOLDER, exist_ok=True)
 
         sticker = update.message.sticker
-        file = await sticker.get_file()
-        file_name = generate_filename(ContentType.STICKER, update)
-        file_path = os.path.join(TEMP_FOLDER, file_name)
-
-        # Загружаем файл стикера с использованием контекстного менеджера
-        with requests.get(file.file_path, stream=True) as response:
-            response.raise_for_status()
-            with open(file_path, "wb") as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
-
-        # Обрабатываем анимированные или видео стикеры
-        if sticker.is_video:
-            gif_file_name = mp4_to_gif(file_path, file_name)
-            file_name = os.path.basename(gif_file_name)  # Обновляем имя файла
-
-        if sticker.is_animated:
-            gif_file_name = await tgs_to_gif(file_path, file_name)
-            file_name = os.path.basename(gif_file_name)  # Обновляем имя файла
+        # Повторный стикер не скачивается и не конвертируется заново
+        file_name = media_store.lookup(sticker.file_unique_id)
+        if file_name is None:
+            file_path = await _fetch_sticker(sticker, update, context)
+            file_name = await media_store.register(sticker.file_unique_id, file_path)
 
         # Добавляем стикер в заметку
         markdown_link = format_content(
             ContentType.STICKER, StickerContentData(file_name)
         )
         append_to_note(markdown_link)
-        await update.message.reply_text("Стикер добавлен в заметку. #sticker")
+        await confirmations.confirm(update, "Стикер добавлен в заметку. #sticker")
     except Exception as e:
         await update.message.reply_text(f"Ошибка при добавлении стикера: {str(e)}")
         logger.error(f"Ошибка в handle_sticker: {str(e)}")
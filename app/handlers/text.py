@@ -1,6 +1,8 @@
 from telegram import Update
 from telegram.ext import ContextTypes
 from config import logger
+from markup import to_obsidian_markdown
+from sender import confirmations
 from .utils import (
     is_allowed_user,
     format_content,
@@ -8,7 +10,6 @@ from .utils import (
     TextContentData,
     append_to_note,
     main_decorator,
-    ensure_proper_code_blocks,
 )
 
 
@@ -19,11 +20,10 @@ async def handle_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     try:
-        text = update.message.text_markdown_v2
-        text = ensure_proper_code_blocks(text)
+        text = to_obsidian_markdown(update.message.text, update.message.entities)
         formatted_text = format_content(ContentType.TEXT, TextContentData(text))
         append_to_note(formatted_text)
-        await update.message.reply_text("Текст добавлен в заметку.")
+        await confirmations.confirm(update, "Текст добавлен в заметку.")
     except Exception as e:
         await update.message.reply_text(f"Ошибка при добавлении текста: {str(e)}")
         logger.error(f"Error in handle_text: {str(e)}")
@@ -1,13 +1,19 @@
-from telegram import Update
+from typing import Union
+
+from telegram import Update, Video, VideoNote
 from telegram.ext import (
     ContextTypes,
 )
-import requests
 import os
 from config import (
+    MAX_DOWNLOAD_SIZE,
     TEMP_FOLDER,
     logger,
 )
+from downloads import downloader
+from sender import confirmations
+from media_store import media_store
+from video_jobs import video_transcoder
 from .utils import (
     is_allowed_user,
     append_to_note,
@@ -16,11 +22,37 @@ from .utils import (
     VideoContentData,
     BigMediaData,
     ContentType,
+    get_current_note,
     main_decorator,
 )
 from .caption import append_caption
 
 
+async def save_video(video: Union[Video, VideoNote]) -> str:
+    """Сохраняет видео или видеосообщение и возвращает ссылку для заметки."""
+    if (video.file_size or 0) >= MAX_DOWNLOAD_SIZE:
+        return format_content(ContentType.VIDEO, BigMediaData(video.file_id))
+
+    file_name = media_store.lookup(video.file_unique_id)
+    if file_name is None:
+        file = await video.get_file()
+        file_name = generate_filename(ContentType.VIDEO)
+        file_path = os.path.join(TEMP_FOLDER, file_name)
+
+        await downloader.download_to_drive(file, file_path)
+        file_name = await media_store.register(video.file_unique_id, file_path)
+    return format_content(ContentType.VIDEO, VideoContentData(file_name))
+
+
+def transcode_video(video: Union[Video, VideoNote], note_path: str = None):
+    """Ставит сохранённое видео в очередь на перекодирование, если оно включено."""
+    if (video.file_size or 0) >= MAX_DOWNLOAD_SIZE:
+        return
+    video_transcoder.submit(
+        video.file_unique_id, note_path or get_current_note(), video.duration
+    )
+
+
 @main_decorator
 async def handle_video(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Function for handle video messege. Add video and capture to current note"""
@@ -28,31 +60,13 @@ async def handle_video(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     try:
-        video = update.message.video
-
-        if video.file_size < 20971520:
-            file = await video.get_file()
-            file_name = generate_filename(ContentType.VIDEO)
-            file_path = os.path.join(TEMP_FOLDER, file_name)
-
-            response = requests.get(file.file_path, stream=True)
-            with open(file_path, "wb") as f:
-                f.write(response.content)
-
-            # Добавляем фото в заметку
-            markdown_link = format_content(
-                ContentType.VIDEO, VideoContentData(file_name)
-            )
-            append_caption(update)
-            append_to_note(markdown_link)
-            await update.message.reply_text("Видео добавлено в заметку. #video")
-        else:
-            file_id = video.file_id
-
-            markdown_link = format_content(ContentType.VIDEO, BigMediaData(file_id))
-            append_caption(update)
-            append_to_note(markdown_link)
-            await update.message.reply_text("Видео добавлено в заметку. #video")
+        markdown_link = await save_video(update.message.video)
+
+        # Добавляем видео в заметку
+        append_caption(update)
+        append_to_note(markdown_link)
+        transcode_video(update.message.video)
+        await confirmations.confirm(update, "Видео добавлено в заметку. #video")
     except Exception as e:
         await update.message.reply_text(f"Ошибка при добавлении Видео: {str(e)}")
         logger.error(f"Error in handle_video: {str(e)}")
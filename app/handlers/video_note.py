@@ -1,22 +1,16 @@
 from telegram import Update
+import httpx
 from telegram.ext import (
     ContextTypes,
 )
-import requests
-import os
-from config import (
-    TEMP_FOLDER,
-    logger,
-)
+from config import logger
+from sender import confirmations
 from .utils import (
     is_allowed_user,
     append_to_note,
-    generate_filename,
-    format_content,
-    VideoContentData,
-    ContentType,
     main_decorator,
 )
+from .video import save_video, transcode_video
 
 
 @main_decorator
@@ -28,32 +22,23 @@ async def handle_video_note(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
         video_note = update.message.video_note
 
-        file = await video_note.get_file()
-        if file is None or file.file_path is None:
-            await update.message.reply_text(
-                "Ошибка: не удалось получить файл видеосообщения."
-            )
-            logger.error("Error in handle_video_note: file or file_path is None")
-            return
-
-        file_name = generate_filename(ContentType.VIDEO)
-        file_path = os.path.join(TEMP_FOLDER, file_name)
-
-        response = requests.get(file.file_path, stream=True)
-        if response.status_code != 200:
+        # Тот же путь, что у видео: хранилище вложений, лимит размера, загрузка
+        try:
+            markdown_link = await save_video(video_note)
+        except httpx.HTTPStatusError as e:
             await update.message.reply_text(
                 "Ошибка: не удалось скачать видеосообщение."
             )
-            logger.error(f"Error in handle_video_note: HTTP {response.status_code}")
+            logger.error(
+                f"Error in handle_video_note: HTTP {e.response.status_code}"
+            )
             return
 
-        with open(file_path, "wb") as f:
-            f.write(response.content)
-
         # Добавляем видеосообщение в заметку
-        markdown_link = format_content(ContentType.VIDEO, VideoContentData(file_name))
         append_to_note(markdown_link)
-        await update.message.reply_text(
+        transcode_video(video_note)
+        await confirmations.confirm(
+            update,
             "Видеосообщение добавлено в заметку. #video_note"
         )
 
@@ -2,49 +2,26 @@ from telegram import Update
 from telegram.ext import (
     ContextTypes,
 )
-from pydub import AudioSegment
-import requests
-import os
-from config import (
-    AUDIO_TEMP_FOLDER,
-    logger,
-    model,
-)
+import asyncio
+from config import logger
+from downloads import downloader
+from transcription import transcription_service, TranscriptionJob
 
 from .utils import (
-    generate_filename,
     ContentType,
-    TranscriptContentData,
-    is_allowed_user,
-    format_content,
+    VoiceContentData,
     append_to_note,
+    format_content,
+    is_allowed_user,
     main_decorator,
+    get_current_note,
 )
 
 
-def _convert_ogg_to_wav(ogg_path: str) -> str:
-    """Converts OGG to WAV and returns the path to the WAV file"""
-    if not ogg_path or not os.path.exists(ogg_path):
-        raise FileNotFoundError("OGG file not found")
-
-    wav_path = ogg_path.replace(".ogg", ".wav")
-    audio = AudioSegment.from_ogg(ogg_path)
-    audio.export(wav_path, format="wav")
-
-    return wav_path
-
-
-async def _download_voice_file(voice) -> str:
-    """Downloads a voice message and returns the path to the OGG file"""
+async def _download_voice(voice) -> bytes:
+    """Downloads a voice message into memory and returns the OGG bytes"""
     file = await voice.get_file()
-    file_name = generate_filename(ContentType.TRANSCRIPT)
-    ogg_path = os.path.join(AUDIO_TEMP_FOLDER, file_name)
-
-    response = requests.get(file.file_path)
-    with open(ogg_path, "wb") as f:
-        f.write(response.content)
-
-    return ogg_path
+    return await downloader.download_to_memory(file)
 
 
 @main_decorator
@@ -54,25 +31,37 @@ async def handle_voice(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     try:
         voice = update.message.voice
-        ogg_path = await _download_voice_file(voice)
-        wav_path = _convert_ogg_to_wav(ogg_path)
-
-        result = model.transcribe(wav_path, language="ru")
-        transcript_text = result["text"]
+        audio = await _download_voice(voice)
 
-        formatted_transcript = format_content(
-            ContentType.TRANSCRIPT, TranscriptContentData(transcript_text)
+        status = await update.message.reply_text(
+            "Голосовое сообщение поставлено в очередь на транскрипцию."
         )
-        append_to_note(formatted_transcript)
-
+        message = update.message
+        queue_depth = transcription_service.submit(
+            TranscriptionJob(
+                audio=audio,
+                note_path=get_current_note(),
+                chat_id=status.chat_id,
+                status_message_id=status.message_id,
+                message_id=message.message_id,
+                message_date=message.date.astimezone().strftime("%d-%m-%Y %H:%M"),
+            )
+        )
+        # Под заголовком сообщения остаётся отметка, по которой
+        # находится транскрипт, дописанный позже
+        append_to_note(
+            format_content(ContentType.VOICE, VoiceContentData(message.message_id))
+        )
+        if queue_depth > 1:
+            await status.edit_text(
+                f"Голосовое сообщение поставлено в очередь на транскрипцию "
+                f"(позиция: {queue_depth})."
+            )
+    except asyncio.QueueFull:
         await update.message.reply_text(
-            "Голосовое сообщение транскрибировано и добавлено в заметку."
+            "Очередь транскрипции переполнена, попробуйте позже."
         )
+        logger.error("Error in handle_voice: transcription queue is full")
     except Exception as e:
         await update.message.reply_text(f"Ошибка при транскрипции: {str(e)}")
         logger.error(f"Error in handle_voice: {str(e)}")
-    finally:
-        if ogg_path and os.path.exists(ogg_path):
-            os.remove(ogg_path)
-        if wav_path and os.path.exists(wav_path):
-            os.remove(wav_path)
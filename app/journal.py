@@ -0,0 +1,148 @@
+import json
+import os
+
+from config import logger
+from metrics import metrics
+
+
+def _fsync_dir(path: str):
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def atomic_write(path: str, content: str):
+    """Перезаписывает файл целиком через временный файл и rename."""
+    directory = os.path.dirname(path) or "."
+    temp_path = os.path.join(directory, f".{os.path.basename(path)}.tmp")
+    with open(temp_path, "w", encoding="utf-8") as f:
+        f.write(content)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+    _fsync_dir(directory)
+
+
+def _apply_append(note_path: str, offset: int, data: bytes):
+    """Идемпотентно применяет дозапись: файл обрезается до offset и дописывается.
+
+    Если на месте offset уже лежат те же данные, запись применена раньше
+    и пропускается: за ней в файле могут идти следующие записи журнала.
+    Если размер файла вне ожидаемого диапазона (файл менялся извне после
+    сбоя), данные просто дописываются в конец, чтобы не затереть чужие правки.
+    """
+    exists = os.path.exists(note_path)
+    size = os.path.getsize(note_path) if exists else 0
+    with open(note_path, "r+b" if exists else "wb") as f:
+        if size >= offset + len(data):
+            f.seek(offset)
+            if f.read(len(data)) == data:
+                return
+            f.seek(0, os.SEEK_END)
+        elif offset <= size:
+            f.seek(offset)
+            f.truncate()
+        else:
+            f.seek(0, os.SEEK_END)
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+class Journal:
+    """Журнал упреждающей записи (WAL) для дозаписей в заметки.
+
+    Каждая дозапись сначала фиксируется в журнале с fsync, затем
+    применяется к заметке и отмечается как выполненная. При запуске
+    невыполненные записи применяются повторно.
+    """
+
+    def __init__(self, path: str, max_size: int = 1024 * 1024):
+        self.path = path
+        self.max_size = max_size
+        self._file = None
+        self._seq = 0
+
+    @property
+    def is_open(self) -> bool:
+        return self._file is not None
+
+    def open(self):
+        replayed = self.replay()
+        if replayed:
+            logger.info(f"Из журнала восстановлено записей: {replayed}")
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def log(self, entries: list) -> list:
+        """Фиксирует пачку записей (путь, смещение, данные) одним fsync."""
+        seqs = []
+        for note_path, offset, data in entries:
+            self._seq += 1
+            seqs.append(self._seq)
+            record = {
+                "seq": self._seq,
+                "op": "append",
+                "path": note_path,
+                "offset": offset,
+                "data": data,
+            }
+            self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        metrics.incr("journal.fsyncs")
+        return seqs
+
+    def commit(self, seqs: list):
+        """Отмечает записи выполненными. Без fsync: повтор идемпотентен."""
+        for seq in seqs:
+            self._file.write(json.dumps({"seq": seq, "op": "commit"}) + "\n")
+        self._file.flush()
+        if self._file.tell() >= self.max_size:
+            self._checkpoint()
+
+    def _checkpoint(self):
+        # Все записи журнала к этому моменту применены
+        self._file.seek(0)
+        self._file.truncate()
+        metrics.incr("journal.checkpoints")
+
+    def replay(self) -> int:
+        if not os.path.exists(self.path):
+            return 0
+        pending = {}
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # Оборванная последняя строка: запись не была зафиксирована
+                    break
+                if record["op"] == "append":
+                    pending[record["seq"]] = record
+                else:
+                    pending.pop(record["seq"], None)
+
+        for seq in sorted(pending):
+            record = pending[seq]
+            try:
+                _apply_append(
+                    record["path"], record["offset"], record["data"].encode("utf-8")
+                )
+            except Exception as e:
+                logger.error(f"Error replaying journal record {seq}: {str(e)}")
+
+        with open(self.path, "w", encoding="utf-8"):
+            pass
+        return len(pending)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -1,3 +1,7 @@
+import time
+
+STARTED_AT = time.perf_counter()
+
 import warnings
 import asyncio
 from telegram import BotCommand
@@ -18,6 +22,12 @@ from handlers import (
     handle_video_note,
     handle_location,
     handle_document,
+    handle_album,
+    album_collector,
+    MEDIA_GROUP,
+    handle_live_location,
+    live_tracker,
+    LIVE_LOCATION,
 )
 from commands import (
     start,
@@ -25,10 +35,36 @@ from commands import (
     print_note,
     list_notes,
     delete_note,
+    search,
+    tail_note,
+    stats,
+    clean_media,
+    video_jobs,
     error_handler,
     callback_query,
 )
-from config import logger, TELEGRAM_TOKEN
+from config import (
+    logger,
+    BOT_API_LOCAL,
+    BOT_API_URL,
+    BOT_MODE,
+    HEAVY_UPDATE_LIMIT,
+    TELEGRAM_TOKEN,
+    UPDATE_CONCURRENCY,
+)
+from downloads import downloader
+from metrics import metrics, monitor_event_loop_lag
+from sender import BotRateLimiter
+from note_writer import note_writer
+from catalog import note_catalog
+from geocoder import geocoder
+from media_store import media_store
+from sticker_cache import sticker_cache
+from transcription import transcription_service
+from update_processor import OrderedUpdateProcessor
+from video_jobs import video_transcoder
+from webhook import run_webhook
+from workers import media_pool
 
 # Подавление предупреждения FP16
 warnings.filterwarnings("ignore", category=UserWarning)
@@ -40,12 +76,77 @@ commands = [
     BotCommand(command="printnote", description="Посмотреть текущую заметку"),
     BotCommand(command="listnotes", description="Показать список заметок"),
     BotCommand(command="deletenote", description="Удалить текущую заметку"),
+    BotCommand(command="search", description="Поиск по тексту заметок"),
+    BotCommand(command="tail", description="Последние записи текущей заметки"),
+    BotCommand(command="stats", description="Показать метрики бота"),
+    BotCommand(command="cleanmedia", description="Удалить вложения без ссылок"),
+    BotCommand(command="jobs", description="Очередь перекодирования видео"),
 ]
 
 
+async def post_init(application: Application):
+    """Запуск фоновых задач после инициализации бота"""
+    note_writer.open_journal()
+    note_catalog.open()
+    media_store.open()
+    sticker_cache.open()
+    geocoder.open()
+    note_writer.add_listener(note_catalog.refresh_notes)
+    application.bot_data["background_tasks"] = [
+        asyncio.create_task(monitor_event_loop_lag()),
+        asyncio.create_task(note_writer.run_periodic_flush()),
+        asyncio.create_task(note_catalog.run_watcher()),
+        asyncio.create_task(note_catalog.run_indexer()),
+    ]
+    await transcription_service.start(application.bot)
+    video_transcoder.start()
+
+    startup_time = time.perf_counter() - STARTED_AT
+    metrics.set_gauge("startup.seconds", round(startup_time, 3))
+    logger.info(f"Бот готов к опросу обновлений за {startup_time:.2f} с")
+
+
+async def post_stop(application: Application):
+    """Запись недособранных альбомов и треков, пока бот ещё может качать файлы"""
+    await album_collector.drain()
+    await live_tracker.drain()
+
+
+async def post_shutdown(application: Application):
+    """Остановка фоновых задач и закрытие соединений"""
+    for task in application.bot_data.pop("background_tasks", []):
+        task.cancel()
+    sticker_cache.close()
+    await transcription_service.stop()
+    await video_transcoder.stop()
+    await note_writer.flush()
+    note_writer.close_journal()
+    note_catalog.close()
+    media_store.close()
+    await geocoder.close()
+    await downloader.close()
+    media_pool.shutdown()
+
+
 def main():
     """Duty cycle"""
-    application = Application.builder().token(TELEGRAM_TOKEN).build()
+    builder = Application.builder().token(TELEGRAM_TOKEN)
+    if BOT_API_URL:
+        # Собственный сервер Bot API вместо api.telegram.org
+        builder = builder.base_url(f"{BOT_API_URL}/bot").base_file_url(
+            f"{BOT_API_URL}/file/bot"
+        )
+    application = (
+        builder.local_mode(BOT_API_LOCAL)
+        .rate_limiter(BotRateLimiter())
+        .concurrent_updates(
+            OrderedUpdateProcessor(UPDATE_CONCURRENCY, HEAVY_UPDATE_LIMIT)
+        )
+        .post_init(post_init)
+        .post_stop(post_stop)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
 
     # Регистрируем обработчики
     application.add_handler(CommandHandler("start", start))
@@ -53,26 +154,49 @@ def main():
     application.add_handler(CommandHandler("printnote", print_note))
     application.add_handler(CommandHandler("listnotes", list_notes))
     application.add_handler(CommandHandler("deletenote", delete_note))
+    application.add_handler(CommandHandler("search", search))
+    application.add_handler(CommandHandler("tail", tail_note))
+    application.add_handler(CommandHandler("stats", stats))
+    application.add_handler(CommandHandler("cleanmedia", clean_media))
+    application.add_handler(CommandHandler("jobs", video_jobs))
     application.add_handler(
         MessageHandler(filters.TEXT & ~filters.COMMAND, handle_text)
     )
+    # Альбомы перехватываются раньше обработчиков отдельных файлов
+    application.add_handler(
+        MessageHandler(
+            MEDIA_GROUP & (filters.PHOTO | filters.VIDEO | filters.Document.ALL),
+            handle_album,
+        )
+    )
     application.add_handler(MessageHandler(filters.PHOTO, handle_photo))
     application.add_handler(MessageHandler(filters.VIDEO, handle_video))
     application.add_handler(MessageHandler(filters.VIDEO_NOTE, handle_video_note))
     application.add_handler(MessageHandler(filters.ANIMATION, handle_animation))
     application.add_handler(MessageHandler(filters.VOICE, handle_voice))
     application.add_handler(MessageHandler(filters.Sticker.ALL, handle_sticker))
+    # Трансляция геопозиции и её обновления, которые приходят правками сообщения
+    application.add_handler(
+        MessageHandler(
+            LIVE_LOCATION | (filters.UpdateType.EDITED_MESSAGE & filters.LOCATION),
+            handle_live_location,
+        )
+    )
     application.add_handler(MessageHandler(filters.LOCATION, handle_location))
     application.add_handler(MessageHandler(filters.Document.ALL, handle_document))
+    application.add_handler(CallbackQueryHandler(callback_query))
     application.add_error_handler(error_handler)
 
+    if BOT_MODE == "webhook":
+        asyncio.run(run_webhook(application, commands))
+        return
+
     # Устанавливаем меню команд асинхронно
     loop = asyncio.get_event_loop()
     loop.run_until_complete(application.bot.set_my_commands(commands))
     logger.info("Меню команд успешно установлено")
 
     print("Бот запущен...")
-    application.add_handler(CallbackQueryHandler(callback_query))
     application.run_polling()
 
 
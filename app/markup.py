@@ -0,0 +1,139 @@
+"""Преобразование разметки Telegram (MessageEntity) в Markdown Obsidian.
+
+Текст и сущности обходятся за один проход: сущности сортируются по
+началу, вложенные собираются на стеке и оборачиваются при закрытии.
+Содержимое code и pre, ссылки и адреса переносятся как есть, без
+экранирования и без замены символов разметки внутри них.
+"""
+
+from typing import Sequence
+
+from telegram import MessageEntity
+
+# Смещения сущностей Telegram считаются в кодовых единицах UTF-16
+_UNIT = 2
+_NEWLINE = "\n".encode("utf-16-le")
+
+_EMPHASIS = {
+    MessageEntity.BOLD: ("**", "**"),
+    MessageEntity.ITALIC: ("*", "*"),
+    MessageEntity.STRIKETHROUGH: ("~~", "~~"),
+    MessageEntity.UNDERLINE: ("<u>", "</u>"),
+    # В Obsidian нет спойлеров, ближайшее — выделение
+    MessageEntity.SPOILER: ("==", "=="),
+}
+
+_BLOCKQUOTES = (MessageEntity.BLOCKQUOTE, MessageEntity.EXPANDABLE_BLOCKQUOTE)
+_VERBATIM = (MessageEntity.CODE, MessageEntity.PRE)
+
+
+def _fence(content: str, char: str = "`", minimum: int = 3) -> str:
+    """Ограничитель длиннее любой серии char внутри content."""
+    longest = run = 0
+    for c in content:
+        run = run + 1 if c == char else 0
+        longest = max(longest, run)
+    return char * max(minimum, longest + 1)
+
+
+def _emphasis(inner: str, opening: str, closing: str) -> str:
+    # Markdown не распознаёт ** x **: пробелы выносятся за маркеры
+    core = inner.strip()
+    if not core:
+        return inner
+    leading = inner[: len(inner) - len(inner.lstrip())]
+    trailing = inner[len(inner.rstrip()) :]
+    return f"{leading}{opening}{core}{closing}{trailing}"
+
+
+def _link(label: str, url: str) -> str:
+    if any(c in url for c in " ()<>"):
+        url = f"<{url}>"
+    return f"[{label}]({url})"
+
+
+def _wrap(entity: MessageEntity, inner: str, source: str) -> str:
+    """Разметка одной сущности; inner уже содержит вложенные сущности."""
+    kind = entity.type
+    if kind in _EMPHASIS:
+        return _emphasis(inner, *_EMPHASIS[kind])
+    if kind == MessageEntity.CODE:
+        fence = _fence(source, minimum=1)
+        if fence == "`":
+            return f"`{source}`"
+        return f"{fence} {source} {fence}"
+    if kind == MessageEntity.PRE:
+        fence = _fence(source)
+        body = source if source.endswith("\n") else source + "\n"
+        return f"{fence}{entity.language or ''}\n{body}{fence}"
+    if kind == MessageEntity.TEXT_LINK:
+        return _link(inner, entity.url)
+    if kind == MessageEntity.MENTION:
+        return _link(source, f"https://t.me/{source.lstrip('@')}")
+    if kind == MessageEntity.TEXT_MENTION and entity.user is not None:
+        return _link(inner, f"tg://user?id={entity.user.id}")
+    if kind in _BLOCKQUOTES:
+        return "\n".join(f"> {line}" for line in inner.split("\n"))
+    # url, email, hashtag, custom_emoji и прочие остаются текстом
+    return inner
+
+
+def to_obsidian_markdown(text: str, entities: Sequence[MessageEntity]) -> str:
+    """Текст сообщения с сущностями в виде Markdown для заметки."""
+    if not text or not entities:
+        return text or ""
+
+    data = text.encode("utf-16-le")
+    size = len(data) // _UNIT
+
+    def chunk(start: int, end: int) -> str:
+        return data[start * _UNIT : end * _UNIT].decode("utf-16-le")
+
+    def is_newline(offset: int) -> bool:
+        # Сравнение байтов: отдельная половина суррогатной пары не декодируется
+        return data[offset * _UNIT : (offset + 1) * _UNIT] == _NEWLINE
+
+    # Внешние сущности раньше вложенных с тем же началом
+    ordered = sorted(entities, key=lambda e: (e.offset, -e.length))
+    # Элемент стека: (сущность, конец, собранные части)
+    stack = [(None, size, [])]
+    position = 0
+
+    def close_top():
+        nonlocal position
+        entity, end, parts = stack.pop()
+        parts.append(chunk(position, end))
+        position = end
+        start = entity.offset
+        inner = "".join(parts)
+        # Код берётся из исходного текста: вложенная разметка в нём не нужна
+        source = chunk(start, end) if entity.type in _VERBATIM else inner
+        rendered = _wrap(entity, inner, source)
+        if entity.type == MessageEntity.PRE or entity.type in _BLOCKQUOTES:
+            # Блоки должны начинаться и заканчиваться на границе строки
+            if start > 0 and not is_newline(start - 1):
+                rendered = "\n" + rendered
+            if end < size and not is_newline(end):
+                rendered += "\n"
+        stack[-1][2].append(rendered)
+
+    for entity in ordered:
+        start = entity.offset
+        if start >= size or entity.length <= 0:
+            continue
+        while stack[-1][1] <= start:
+            close_top()
+        # Сущность не выходит за пределы внешней
+        end = min(start + entity.length, stack[-1][1])
+        if stack[-1][0] is not None and stack[-1][0].type in _VERBATIM:
+            # Внутри кода разметки нет
+            continue
+        stack[-1][2].append(chunk(position, start))
+        position = start
+        stack.append((entity, end, []))
+
+    while len(stack) > 1:
+        close_top()
+    parts = stack[0][2]
+    parts.append(chunk(position, size))
+    return "".join(parts)
@@ -0,0 +1,202 @@
+import os
+import shutil
+from dataclasses import dataclass
+
+from telegram import Sticker
+
+from config import GIF_PRESET, TEMP_FOLDER, logger
+from downloads import downloader
+from media_worker import render_lottie
+from metrics import metrics
+from workers import media_pool
+
+
+@dataclass(frozen=True)
+class GifPreset:
+    fps: int
+    width: int
+    colors: int
+    dither: str
+
+
+# Пресеты качества/размера для конвертации видео в GIF
+GIF_PRESETS = {
+    "quality": GifPreset(fps=20, width=480, colors=256, dither="sierra2_4a"),
+    "balanced": GifPreset(fps=15, width=320, colors=128, dither="bayer:bayer_scale=3"),
+    "small": GifPreset(fps=10, width=240, colors=64, dither="bayer:bayer_scale=5"),
+}
+
+def ffmpeg_executable() -> str:
+    """Системный ffmpeg или бинарник из imageio-ffmpeg."""
+    executable = shutil.which("ffmpeg")
+    if executable:
+        return executable
+    import imageio_ffmpeg
+
+    return imageio_ffmpeg.get_ffmpeg_exe()
+
+
+def build_gif_command(input_path: str, output_path: str, preset: GifPreset) -> list:
+    """Один граф фильтров ffmpeg: прореживание кадров, масштаб и палитра."""
+    filter_graph = (
+        f"fps={preset.fps},"
+        f"scale='min({preset.width},iw)':-1:flags=lanczos,"
+        "split[frames][palette_input];"
+        f"[palette_input]palettegen=max_colors={preset.colors}:stats_mode=diff[palette];"
+        f"[frames][palette]paletteuse=dither={preset.dither}"
+    )
+    return [
+        ffmpeg_executable(),
+        "-v",
+        "error",
+        "-y",
+        "-i",
+        input_path,
+        "-filter_complex",
+        filter_graph,
+        "-loop",
+        "0",
+        output_path,
+    ]
+
+
+# Параметры кодеков для фонового перекодирования видео
+VIDEO_ENCODERS = {
+    "h264": ["-c:v", "libx264", "-preset", "veryfast", "-crf", "26"],
+    "av1": ["-c:v", "libsvtav1", "-preset", "8", "-crf", "35"],
+}
+AUDIO_KBPS = 96
+
+
+def video_bitrate_kbps(max_mb: float, duration: int) -> int:
+    """Битрейт видео, при котором файл длительностью duration уложится в max_mb."""
+    if not duration:
+        return 0
+    total_kbps = max_mb * 8 * 1024 * 0.95 / duration
+    return max(int(total_kbps) - AUDIO_KBPS, 100)
+
+
+def build_transcode_command(
+    input_path: str,
+    output_path: str,
+    codec: str,
+    max_height: int,
+    bitrate_kbps: int,
+) -> list:
+    """Перекодирование с ограничением высоты кадра и битрейта.
+
+    ffmpeg читает исходник с диска потоком и пишет ход работы в stdout
+    (-progress), поэтому файл целиком в память не попадает.
+    """
+    command = [
+        ffmpeg_executable(),
+        "-v",
+        "error",
+        "-nostats",
+        "-progress",
+        "pipe:1",
+        "-y",
+        "-i",
+        input_path,
+        "-vf",
+        f"scale=-2:'trunc(min({max_height},ih)/2)*2'",
+        *VIDEO_ENCODERS[codec],
+    ]
+    if bitrate_kbps:
+        command += ["-maxrate", f"{bitrate_kbps}k", "-bufsize", f"{bitrate_kbps * 2}k"]
+    return command + [
+        "-pix_fmt",
+        "yuv420p",
+        "-c:a",
+        "aac",
+        "-b:a",
+        f"{AUDIO_KBPS}k",
+        "-movflags",
+        "+faststart",
+        output_path,
+    ]
+
+
+def build_poster_command(input_path: str, output_path: str, position: float) -> list:
+    """Один кадр видео в JPEG для превью в заметке."""
+    return [
+        ffmpeg_executable(),
+        "-v",
+        "error",
+        "-y",
+        "-ss",
+        f"{position:.2f}",
+        "-i",
+        input_path,
+        "-frames:v",
+        "1",
+        "-vf",
+        "scale='min(640,iw)':-2",
+        "-q:v",
+        "3",
+        output_path,
+    ]
+
+
+async def mp4_to_gif(
+    input_path: str,
+    filename: str,
+    preset: str = GIF_PRESET,
+    folder: str = TEMP_FOLDER,
+) -> str:
+    """Конвертация MP4/WebM в GIF в папку folder, возвращает путь к GIF."""
+    os.makedirs(folder, exist_ok=True)
+    output_path = os.path.join(folder, filename)
+
+    try:
+        await media_pool.run_process(
+            "gif", build_gif_command(input_path, output_path, GIF_PRESETS[preset])
+        )
+    except Exception as e:
+        logger.error(f"Ошибка конвертации MP4 в GIF: {str(e)}")
+        raise
+    metrics.incr("media.gif_bytes", os.path.getsize(output_path))
+    return output_path
+
+
+async def tgs_to_gif(
+    input_path: str, output_filename: str, folder: str = TEMP_FOLDER
+) -> str:
+    """Конвертация анимированного стикера TGS в GIF через общий пул."""
+    os.makedirs(folder, exist_ok=True)
+    if not output_filename.endswith(".gif"):
+        output_filename += ".gif"
+    output_path = os.path.join(folder, output_filename)
+
+    try:
+        return await media_pool.run("tgs", render_lottie, input_path, output_path)
+    except Exception as e:
+        logger.error(f"Ошибка конвертации TGS в GIF: {str(e)}")
+        raise
+
+
+def sticker_conversion_params(sticker: Sticker):
+    """Параметры, от которых зависит результат конвертации стикера."""
+    if sticker.is_video:
+        return ("gif", GIF_PRESETS[GIF_PRESET])
+    return ("lottie",)
+
+
+async def convert_sticker(
+    sticker: Sticker, filename: str, folder: str = TEMP_FOLDER
+) -> str:
+    """Скачивает анимированный или видеостикер и конвертирует его в GIF."""
+    file = await sticker.get_file()
+    # Исходник качается рядом под своим расширением,
+    # чтобы конвертер не читал и не писал один и тот же файл
+    extension = ".webm" if sticker.is_video else ".tgs"
+    source_path = os.path.join(folder, f"temp_{filename.replace('.gif', extension)}")
+    try:
+        await downloader.download_to_drive(file, source_path)
+        if sticker.is_video:
+            return await mp4_to_gif(source_path, filename, folder=folder)
+        return await tgs_to_gif(source_path, filename, folder=folder)
+    finally:
+        # Удаляем временный исходник, если он существует
+        if os.path.exists(source_path):
+            os.remove(source_path)
@@ -0,0 +1,236 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from urllib.parse import unquote
+
+from config import NOTES_FOLDER, OBSIDIAN_VAULT_PATH, STATE_FOLDER, logger
+from metrics import metrics
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS media (
+    unique_id TEXT PRIMARY KEY,
+    sha256 TEXT NOT NULL,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    last_used REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS media_sha256 ON media (sha256);
+CREATE INDEX IF NOT EXISTS media_path ON media (path);
+"""
+
+# Вложения Obsidian: ![[file.gif|600]], [[file.pdf]], ![[file.png#^block]]
+EMBED_RE = re.compile(r"\[\[([^\]|#^]+)")
+# Ссылки Markdown: ![](file%20name.png), [](<file name.pdf>), [](file.mp4 "title")
+MARKDOWN_LINK_RE = re.compile(r"\]\(\s*(<[^>\n]*>|[^)\s]+)")
+
+# Свежие файлы не удаляются: ссылка на них может быть ещё в буфере заметки
+GC_GRACE_SECONDS = 600
+
+
+def _file_sha256(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def _link_name(target: str) -> str:
+    """Имя файла из адреса ссылки Markdown: без <>, якоря и %-кодирования."""
+    target = target.strip().removeprefix("<").removesuffix(">")
+    target = re.split(r"[#?]", target, maxsplit=1)[0]
+    return os.path.basename(unquote(target).strip())
+
+
+def _text_references(text: str) -> set:
+    names = {
+        os.path.basename(target.strip()) for target in EMBED_RE.findall(text)
+    }
+    names.update(_link_name(target) for target in MARKDOWN_LINK_RE.findall(text))
+    return names
+
+
+def _canvas_references(text: str) -> set:
+    """Файлы карточек холста Obsidian и ссылки из текстовых карточек."""
+    names = _text_references(text)
+    try:
+        canvas = json.loads(text)
+    except ValueError:
+        return names
+    for node in canvas.get("nodes", []) if isinstance(canvas, dict) else []:
+        if isinstance(node, dict) and isinstance(node.get("file"), str):
+            names.add(os.path.basename(node["file"]))
+    return names
+
+
+def _referenced_names(root: str) -> set:
+    """Имена файлов, на которые ссылается хотя бы одна заметка или холст."""
+    names = set()
+    for dirpath, dirnames, filenames in os.walk(root):
+        # Служебные папки (.obsidian, .obsidian-bot, .trash) пропускаются
+        dirnames[:] = [d for d in dirnames if not d.startswith(".")]
+        for filename in filenames:
+            if filename.endswith(".md"):
+                parse = _text_references
+            elif filename.endswith(".canvas"):
+                parse = _canvas_references
+            else:
+                continue
+            try:
+                with open(
+                    os.path.join(dirpath, filename),
+                    "r",
+                    encoding="utf-8",
+                    errors="replace",
+                ) as f:
+                    text = f.read()
+            except OSError:
+                continue
+            names.update(parse(text))
+    return names
+
+
+class MediaStore:
+    """Хранилище вложений с адресацией по содержимому.
+
+    Индекс в SQLite связывает file_unique_id Telegram и sha256 содержимого
+    с уже сохранённым файлом. Повторно присланный стикер, фото или документ
+    не скачивается и не конвертируется заново: в заметку попадает ссылка
+    на существующий файл. Файл с тем же содержимым под другим
+    file_unique_id тоже не дублируется.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._conn = None
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._lookups = 0
+
+    def open(self):
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _record_lookup(self, hit: bool):
+        self._lookups += 1
+        if hit:
+            self._hits += 1
+        metrics.incr("media_store.hits" if hit else "media_store.misses")
+        metrics.set_gauge(
+            "media_store.hit_rate", round(self._hits / self._lookups, 3)
+        )
+
+    def lookup(self, unique_id: str) -> str:
+        """Имя уже сохранённого файла для file_unique_id или None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT path FROM media WHERE unique_id = ?", (unique_id,)
+            ).fetchone()
+            if row and not os.path.exists(row[0]):
+                # Файл удалили вручную, запись больше не действительна
+                self._conn.execute(
+                    "DELETE FROM media WHERE unique_id = ?", (unique_id,)
+                )
+                self._conn.commit()
+                row = None
+            if row:
+                self._conn.execute(
+                    "UPDATE media SET last_used = ?, hits = hits + 1 "
+                    "WHERE unique_id = ?",
+                    (time.time(), unique_id),
+                )
+                self._conn.commit()
+        self._record_lookup(row is not None)
+        return os.path.basename(row[0]) if row else None
+
+    def path_for(self, unique_id: str) -> str:
+        """Путь к файлу для file_unique_id без учёта в статистике или None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT path FROM media WHERE unique_id = ?", (unique_id,)
+            ).fetchone()
+        return row[0] if row and os.path.exists(row[0]) else None
+
+    async def register(self, unique_id: str, path: str) -> str:
+        """Запоминает сохранённый файл и возвращает имя для вставки в заметку.
+
+        Если файл с таким же содержимым уже есть, новый удаляется,
+        а возвращается имя существующего.
+        """
+        digest = await asyncio.to_thread(_file_sha256, path)
+        now = time.time()
+        with self._lock:
+            existing = None
+            for (existing_path,) in self._conn.execute(
+                "SELECT path FROM media WHERE sha256 = ? AND path != ?",
+                (digest, path),
+            ):
+                if os.path.exists(existing_path):
+                    existing = existing_path
+                    break
+            if existing is not None:
+                os.remove(path)
+                metrics.incr("media_store.deduplicated")
+                path = existing
+            # Файл по этому пути мог быть перезаписан другим содержимым
+            self._conn.execute(
+                "DELETE FROM media WHERE path = ? AND sha256 != ?", (path, digest)
+            )
+            self._conn.execute(
+                """
+                INSERT INTO media (unique_id, sha256, path, size, created, last_used)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (unique_id) DO UPDATE SET
+                    sha256 = excluded.sha256,
+                    path = excluded.path,
+                    size = excluded.size,
+                    last_used = excluded.last_used
+                """,
+                (unique_id, digest, path, os.path.getsize(path), now, now),
+            )
+            self._conn.commit()
+        return os.path.basename(path)
+
+    def collect_garbage(self) -> tuple:
+        """Удаляет файлы хранилища, на которые не ссылается ни одна заметка.
+
+        Ссылкой считаются вики-ссылки, ссылки Markdown и карточки холстов.
+
+        Возвращает (число удалённых файлов, освобождённые байты).
+        Трогает только файлы, которые были сохранены через хранилище.
+        """
+        referenced = _referenced_names(OBSIDIAN_VAULT_PATH or NOTES_FOLDER)
+        cutoff = time.time() - GC_GRACE_SECONDS
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT DISTINCT path FROM media WHERE created < ?", (cutoff,)
+            ).fetchall()
+            removed, freed = 0, 0
+            for (path,) in rows:
+                if os.path.basename(path) in referenced:
+                    continue
+                try:
+                    freed += os.path.getsize(path)
+                    os.remove(path)
+                    removed += 1
+                except FileNotFoundError:
+                    pass
+                self._conn.execute("DELETE FROM media WHERE path = ?", (path,))
+            self._conn.commit()
+        metrics.incr("media_store.gc_removed", removed)
+        logger.info(f"Сборка мусора вложений: удалено {removed}, {freed} байт")
+        return removed, freed
+
+
+media_store = MediaStore(os.path.join(STATE_FOLDER, "media.sqlite3"))
@@ -0,0 +1,17 @@
+"""Функции, которые выполняются в процессах media_pool.
+
+Модуль импортируется в каждом процессе пула, поэтому не зависит
+от остального приложения: без config, логирования и клиентов Telegram.
+"""
+
+import os
+
+
+def render_lottie(input_path: str, output_path: str) -> str:
+    """Рендер TGS в GIF."""
+    import pylottie
+
+    pylottie.convertLottie2GIF(input_path, output_path)
+    if not os.path.exists(output_path):
+        raise ValueError(f"Не удалось создать GIF из {input_path}")
+    return output_path
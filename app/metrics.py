@@ -0,0 +1,77 @@
+import asyncio
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+from config import logger
+
+
+@dataclass
+class TimingStats:
+    count: int = 0
+    total: float = 0.0
+    max: float = 0.0
+
+    def add(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    @property
+    def avg(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+
+class Metrics:
+    """Простые счётчики, гейджи и тайминги внутри процесса бота."""
+
+    def __init__(self):
+        self.counters = defaultdict(int)
+        self.gauges = {}
+        self.timings = defaultdict(TimingStats)
+
+    def incr(self, name: str, value: int = 1):
+        self.counters[name] += value
+
+    def set_gauge(self, name: str, value: float):
+        self.gauges[name] = value
+
+    def observe(self, name: str, seconds: float):
+        self.timings[name].add(seconds)
+
+    @contextmanager
+    def timer(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started)
+
+    def summary(self) -> str:
+        lines = []
+        for name, value in sorted(self.counters.items()):
+            lines.append(f"{name}: {value}")
+        for name, value in sorted(self.gauges.items()):
+            lines.append(f"{name}: {value}")
+        for name, stats in sorted(self.timings.items()):
+            lines.append(
+                f"{name}: n={stats.count} avg={stats.avg * 1000:.1f}ms "
+                f"max={stats.max * 1000:.1f}ms"
+            )
+        return "\n".join(lines)
+
+
+metrics = Metrics()
+
+
+async def monitor_event_loop_lag(interval: float = 0.5, warn_after: float = 0.2):
+    """Фоновая задача: измеряет, насколько event loop опаздывает с пробуждением."""
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        lag = loop.time() - started - interval
+        metrics.observe("event_loop.lag", max(lag, 0.0))
+        if lag > warn_after:
+            logger.warning(f"Event loop был заблокирован на {lag:.3f} с")
@@ -0,0 +1,122 @@
+"""Постраничный просмотр заметок без чтения всего файла.
+
+Страница читается через seek и режется по границе строки. Блок кода,
+который помещается на страницу, на части не делится; слишком длинный
+блок закрывается в конце страницы и открывается заново на следующей.
+"""
+
+import os
+import re
+from dataclasses import dataclass
+
+# Страница в байтах: с кириллицей это ~1750 символов, с запасом до лимита 4096
+PAGE_BYTES = 3500
+TAIL_BLOCK_BYTES = 65536
+FENCE = b"```"
+
+# Заголовок записи, который main_decorator ставит перед каждым сообщением
+ENTRY_RE = re.compile(rb"^\[\d{2}-\d{2}-\d{4} \d{2}:\d{2}\]:", re.MULTILINE)
+
+
+@dataclass
+class NotePage:
+    text: str
+    start: int
+    end: int
+    size: int
+    prev_start: int
+    in_fence: bool
+
+
+def _is_fence(line: bytes) -> bool:
+    return line.lstrip().startswith(FENCE)
+
+
+def _utf8_prefix(data: bytes) -> bytes:
+    """Отрезает незавершённый символ UTF-8 в конце куска."""
+    try:
+        data.decode("utf-8")
+    except UnicodeDecodeError as e:
+        if e.reason == "unexpected end of data":
+            return data[: e.start]
+    return data
+
+
+def _avoid_splitting_fence(chunk: bytes, in_fence: bool) -> bytes:
+    """Переносит блок кода на следующую страницу, если он начался на этой."""
+    offset = 0
+    opened_at = None
+    for line in chunk.splitlines(keepends=True):
+        if _is_fence(line):
+            in_fence = not in_fence
+            opened_at = offset if in_fence else None
+        offset += len(line)
+    if in_fence and opened_at:
+        return chunk[:opened_at]
+    return chunk
+
+
+def _previous_start(f, start: int, page_bytes: int) -> int:
+    """Начало предыдущей страницы: строка, с которой она примерно начинается."""
+    begin = max(0, start - page_bytes)
+    if begin == 0:
+        return 0
+    f.seek(begin)
+    newline = f.read(start - begin).find(b"\n")
+    if newline != -1 and begin + newline + 1 < start:
+        return begin + newline + 1
+    return begin
+
+
+def read_page(
+    path: str, start: int, in_fence: bool = False, page_bytes: int = PAGE_BYTES
+) -> NotePage:
+    """Читает одну страницу заметки начиная с байта start."""
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        start = min(max(start, 0), size)
+        f.seek(start)
+        chunk = f.read(page_bytes)
+        # Смещение из callback-данных могло попасть в середину символа
+        while chunk and chunk[0] & 0xC0 == 0x80:
+            chunk = chunk[1:]
+            start += 1
+        if start + len(chunk) < size:
+            cut = chunk.rfind(b"\n")
+            if cut > 0:
+                chunk = chunk[: cut + 1]
+            chunk = _avoid_splitting_fence(chunk, in_fence)
+        chunk = _utf8_prefix(chunk)
+        prev_start = _previous_start(f, start, page_bytes) if start > 0 else None
+
+    end = start + len(chunk)
+    fence_open = in_fence
+    for line in chunk.splitlines():
+        if _is_fence(line):
+            fence_open = not fence_open
+
+    text = chunk.decode("utf-8", errors="replace")
+    if in_fence:
+        text = "```\n" + text
+    if fence_open and end < size:
+        text = text.rstrip("\n") + "\n```"
+    return NotePage(text, start, end, size, prev_start, fence_open)
+
+
+def tail_start(path: str, entries: int) -> int:
+    """Смещение начала последних entries записей, читая файл с конца."""
+    with open(path, "rb") as f:
+        position = os.fstat(f.fileno()).st_size
+        buffer = b""
+        while position > 0:
+            read_from = max(0, position - TAIL_BLOCK_BYTES)
+            f.seek(read_from)
+            buffer = f.read(position - read_from) + buffer
+            position = read_from
+            starts = [m.start() for m in ENTRY_RE.finditer(buffer)]
+            if starts and starts[0] == 0 and position > 0:
+                # Начало буфера может оказаться серединой строки
+                starts = starts[1:]
+            if len(starts) >= entries:
+                return position + starts[-entries]
+    return 0
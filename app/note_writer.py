@@ -0,0 +1,132 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from config import NOTE_FLUSH_INTERVAL, NOTE_FSYNC, NOTE_JOURNAL, STATE_FOLDER, logger
+from journal import Journal
+from metrics import metrics
+
+
+class NoteWriter:
+    """Буферизованная запись в заметки.
+
+    Фрагменты копятся в памяти по каждой заметке и записываются одним
+    вызовом write: в конце обработки сообщения, по таймеру или явно через
+    flush(). Режимы fsync: "none" — полагаться на ОС, "flush" — fsync
+    после каждой записи на диск.
+
+    С включённым журналом каждая пачка сначала фиксируется в WAL, поэтому
+    буферизация не теряет данные при аварийном завершении процесса.
+
+    Журнал, запись на диск и слушатели выполняются в одном потоке записи:
+    цикл событий не ждёт fsync, а пачки ложатся на диск в порядке flush().
+    """
+
+    def __init__(
+        self,
+        fsync_mode: str = "none",
+        flush_interval: float = 1.0,
+        journal: Journal = None,
+    ):
+        self.fsync_mode = fsync_mode
+        self.flush_interval = flush_interval
+        self.journal = journal
+        self._buffers = {}
+        self._listeners = []
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="note-writer"
+        )
+
+    def add_listener(self, callback):
+        """callback(note_paths) вызывается после каждой записи на диск."""
+        self._listeners.append(callback)
+
+    def open_journal(self):
+        """Применяет невыполненные записи журнала и открывает его для записи."""
+        if self.journal is not None:
+            self.journal.open()
+
+    def close_journal(self):
+        # Дожидается пачек, ещё не записанных потоком записи
+        self._executor.shutdown(wait=True)
+        if self.journal is not None:
+            self.journal.close()
+
+    def append(self, note_path: str, content: str):
+        self._buffers.setdefault(note_path, []).append(content)
+        metrics.incr("notes.fragments")
+
+    def pending(self, note_path: str) -> bool:
+        return bool(self._buffers.get(note_path))
+
+    async def flush(self, note_path: str = None):
+        """Записывает буфер указанной заметки или всех заметок.
+
+        Возвращается, когда на диске эта пачка и все записанные до неё,
+        даже если буфер пуст. Отмена вызывающего не отменяет запись.
+        """
+        paths = [note_path] if note_path else list(self._buffers)
+        batch = []
+        for path in paths:
+            parts = self._buffers.pop(path, None)
+            if parts:
+                batch.append((path, "".join(parts)))
+        future = asyncio.get_running_loop().run_in_executor(
+            self._executor, self._write_batch, batch
+        )
+        await asyncio.shield(future)
+
+    def _write_batch(self, batch: list):
+        if not batch:
+            return
+
+        seqs = None
+        if self.journal is not None and self.journal.is_open:
+            seqs = self.journal.log(
+                [
+                    (path, os.path.getsize(path) if os.path.exists(path) else 0, data)
+                    for path, data in batch
+                ]
+            )
+
+        for path, data in batch:
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(data)
+                if self.fsync_mode == "flush":
+                    f.flush()
+                    os.fsync(f.fileno())
+                    metrics.incr("notes.fsyncs")
+            metrics.incr("notes.writes")
+            metrics.incr("notes.bytes", len(data.encode("utf-8")))
+
+        if seqs:
+            self.journal.commit(seqs)
+
+        written = [path for path, _ in batch]
+        for callback in self._listeners:
+            try:
+                callback(written)
+            except Exception as e:
+                logger.error(f"Error in note writer listener: {str(e)}")
+
+    def discard(self, note_path: str):
+        """Отбрасывает незаписанные фрагменты, например перед удалением заметки."""
+        self._buffers.pop(note_path, None)
+
+    async def run_periodic_flush(self):
+        """Фоновая задача: сбрасывает буферы, накопленные вне обработчиков."""
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Error flushing notes: {str(e)}")
+
+
+note_writer = NoteWriter(
+    fsync_mode=NOTE_FSYNC,
+    flush_interval=NOTE_FLUSH_INTERVAL,
+    journal=Journal(os.path.join(STATE_FOLDER, "notes.journal"))
+    if NOTE_JOURNAL
+    else None,
+)
@@ -0,0 +1,216 @@
+"""Содержимое заметок: типы записей, их форматирование и дозапись в заметку.
+
+Модуль не зависит от обработчиков, поэтому его используют и они,
+и фоновые службы (транскрипция, перекодирование видео).
+"""
+
+from datetime import datetime
+from enum import Enum, auto
+from dataclasses import dataclass
+import uuid
+import os
+from typing import Union
+
+from telegram import Update
+
+from config import LIVE_TRACK_FORMAT, NOTES_FOLDER, NoteManager
+from note_writer import note_writer
+from journal import atomic_write
+from sessions import current_session
+from catalog import note_catalog
+
+
+class ContentType(Enum):
+    TEXT = auto()
+    CAPTION = auto()
+    TRANSCRIPT = auto()
+    VOICE = auto()
+    PHOTO = auto()
+    VIDEO = auto()
+    ANIMATION = auto()
+    STICKER = auto()
+    LOCATION = auto()
+    LIVE_LOCATION = auto()
+    DOCUMENT = auto()
+
+
+@dataclass
+class TextContentData:
+    text: str
+
+
+@dataclass
+class PhotoContentData:
+    file_name: str
+
+
+@dataclass
+class StickerContentData:
+    file_name: str
+
+
+@dataclass
+class VideoContentData:
+    file_name: str
+
+
+@dataclass
+class AnimationContentData:
+    file_name: str
+
+
+@dataclass
+class BigMediaData:
+    file_id: int
+
+
+@dataclass
+class TranscriptContentData:
+    transcript_text: str
+    message_id: int = 0
+    message_date: str = ""
+
+
+@dataclass
+class VoiceContentData:
+    message_id: int
+
+
+@dataclass
+class LocationData:
+    location: str
+
+
+@dataclass
+class LiveLocationData:
+    summary: str
+    file_name: str
+
+
+@dataclass
+class DocumentContentData:
+    file_name: str
+
+
+ContentData = Union[
+    TextContentData,
+    PhotoContentData,
+    TranscriptContentData,
+    VoiceContentData,
+    VideoContentData,
+    AnimationContentData,
+    BigMediaData,
+    StickerContentData,
+    LocationData,
+    LiveLocationData,
+    DocumentContentData,
+]
+
+
+def _generate_id() -> str:
+    """Генерация уникального идентификатора для файлов."""
+    return str(uuid.uuid4())[:4]
+
+
+def generate_filename(type: ContentType, update: Update = None) -> str:
+    """Генерация имени файла на основе типа контента."""
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    match type:
+        case ContentType.TEXT:
+            note_id = _generate_id()
+            return f"TG_Note_{timestamp}_{note_id}.md"
+        case ContentType.PHOTO:
+            return f"TG_photo_{timestamp}_{_generate_id()}.jpg"
+        case ContentType.VIDEO:
+            return f"TG_video_{timestamp}_{_generate_id()}.mp4"
+        case ContentType.TRANSCRIPT:
+            return f"TG_voice_{timestamp}_{_generate_id()}.ogg"
+        case ContentType.ANIMATION:
+            return f"TG_animation_{timestamp}_{_generate_id()}.gif"
+        case ContentType.LIVE_LOCATION:
+            return f"TG_track_{timestamp}_{_generate_id()}.{LIVE_TRACK_FORMAT}"
+        case ContentType.STICKER:
+            filename = f"TG_sticker_{timestamp}_{_generate_id()}"
+            if update and hasattr(update.message, "sticker") and update.message.sticker:
+                if (
+                    update.message.sticker.is_animated
+                    or update.message.sticker.is_video
+                ):
+                    return filename + ".gif"
+                return filename + ".webp"
+            return filename + ".webp"
+
+
+def create_new_note(session: NoteManager = None):
+    """Создание новой заметки и выбор её текущей в сессии пользователя."""
+    if session is None:
+        session = current_session.get()
+    os.makedirs(NOTES_FOLDER, exist_ok=True)
+    note_filename = generate_filename(ContentType.TEXT)
+    note_path = os.path.join(NOTES_FOLDER, note_filename)
+    session.set_current_note_file(note_path)
+
+    atomic_write(note_path, "\n")
+    note_catalog.refresh_notes([note_path])
+    return note_path
+
+
+def get_current_note(session: NoteManager = None) -> str:
+    """Путь к текущей заметке, при необходимости создаёт новую."""
+    if session is None:
+        session = current_session.get()
+    if session.get_current_note_file() is None:
+        create_new_note(session)
+    return session.get_current_note_file()
+
+
+def append_to_note(content: str, note_path: str = None):
+    """Добавление контента в текущую или указанную заметку.
+
+    Запись буферизуется в note_writer и попадает на диск одним write
+    в конце обработки сообщения или по таймеру.
+    """
+    if note_path is None:
+        note_path = get_current_note()
+    note_writer.append(note_path, content + "\n")
+
+
+def format_content(type: ContentType, data: ContentData) -> str:
+    """Форматирование контента для добавления в заметку."""
+    match type, data:
+        case (ContentType.TEXT | ContentType.CAPTION, TextContentData(text)):
+            return f"{text}\n"
+        case ContentType.TRANSCRIPT, TranscriptContentData(transcript_text, 0, _):
+            return f"[Voice Transcript]: \n{transcript_text}\n"
+        case ContentType.TRANSCRIPT, TranscriptContentData(
+            transcript_text, message_id, message_date
+        ):
+            # Транскрипт дописывается позже своим блоком со ссылкой на сообщение
+            return (
+                f"\n[Voice Transcript #{message_id}, {message_date}]: "
+                f"\n{transcript_text}\n"
+            )
+        case ContentType.VOICE, VoiceContentData(message_id):
+            return f"[Voice Message #{message_id}]\n"
+        case ContentType.PHOTO, PhotoContentData(file_name):
+            return f"![[{file_name}|600]]\n"
+        case ContentType.VIDEO, VideoContentData(file_name):
+            return f"![[{file_name}]]\n"
+        case (
+            ContentType.VIDEO | ContentType.ANIMATION | ContentType.DOCUMENT,
+            BigMediaData(file_id),
+        ):
+            return f"[Big Media: {file_id}]"
+        case (
+            ContentType.STICKER
+            | ContentType.ANIMATION,
+            AnimationContentData(file_name)
+            | StickerContentData(file_name),
+        ):
+            return f"![[{file_name}|600]]\n"
+        case ContentType.LOCATION, LocationData(location):
+            return f"[Location]: \n{location}\n"
+        case ContentType.LIVE_LOCATION, LiveLocationData(summary, file_name):
+            return f"[Live Location]: {summary} [[{file_name}]]\n"
+        case ContentType.DOCUMENT, DocumentContentData(file_name):
+            return f"![[{file_name}]]\n"
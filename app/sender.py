@@ -0,0 +1,174 @@
+import asyncio
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+
+from telegram import Message, Update
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+from config import (
+    CONFIRM_WINDOW,
+    SEND_CHAT_RATE,
+    SEND_GLOBAL_RATE,
+    SEND_GROUP_RATE,
+    SEND_RETRIES,
+    logger,
+)
+from metrics import metrics
+
+
+class TokenBucket:
+    """Корзина токенов: rate запросов в секунду с запасом на всплеск capacity."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            self._tokens = min(
+                self.capacity, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+# Запросы, у которых своя корзина в чате: реакции не отправляют сообщений
+# и не должны задерживать ответы бота
+SEPARATE_BUCKETS = {"setMessageReaction"}
+
+
+def _retry_seconds(error: RetryAfter) -> float:
+    delay = error.retry_after
+    if isinstance(delay, timedelta):
+        return delay.total_seconds()
+    return float(delay)
+
+
+class BotRateLimiter(BaseRateLimiter):
+    """Ограничитель исходящих запросов к Bot API для всего приложения.
+
+    Запросы, адресованные чату, проходят через общую корзину и корзину
+    этого чата (у групп лимит строже). Реакции идут через отдельную
+    корзину чата и не занимают лимит сообщений. Ответ 429 обрабатывается здесь же:
+    запрос повторяется после retry_after. Каждый вызов считается в метриках,
+    чтобы видеть число запросов на одно входящее обновление.
+    """
+
+    def __init__(self):
+        self._global = TokenBucket(SEND_GLOBAL_RATE, SEND_GLOBAL_RATE)
+        self._chats = {}
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    def _chat_bucket(self, chat_id, endpoint: str = None) -> TokenBucket:
+        key = (chat_id, endpoint if endpoint in SEPARATE_BUCKETS else None)
+        if key not in self._chats:
+            # У групп и каналов отрицательные ID
+            is_group = isinstance(chat_id, int) and chat_id < 0
+            rate = SEND_GROUP_RATE if is_group else SEND_CHAT_RATE
+            self._chats[key] = TokenBucket(rate, max(1.0, rate * 3))
+        return self._chats[key]
+
+    async def process_request(
+        self, callback, args, kwargs, endpoint, data, rate_limit_args
+    ):
+        metrics.incr("api.calls")
+        metrics.incr(f"api.{endpoint}")
+        handled = metrics.counters.get("updates.handled", 0)
+        if handled:
+            metrics.set_gauge(
+                "api.calls_per_update", round(metrics.counters["api.calls"] / handled, 2)
+            )
+
+        chat_id = data.get("chat_id")
+        for attempt in range(SEND_RETRIES + 1):
+            if chat_id is not None:
+                await self._global.acquire()
+                await self._chat_bucket(chat_id, endpoint).acquire()
+            try:
+                return await callback(*args, **kwargs)
+            except RetryAfter as e:
+                if attempt == SEND_RETRIES:
+                    raise
+                delay = _retry_seconds(e)
+                metrics.incr("api.retry_after")
+                logger.warning(f"Flood limit на {endpoint}, повтор через {delay} с")
+                await asyncio.sleep(delay)
+
+
+@dataclass
+class _StatusMessage:
+    message: Message = None
+    count: int = 1
+    last_text: str = ""
+    last_at: float = 0.0
+    edit_task: asyncio.Task = None
+
+
+class Confirmations:
+    """Подтверждения «добавлено в заметку» с объединением.
+
+    Первое подтверждение в чате отправляется ответом. Если следующие
+    приходят в течение window секунд, бот не шлёт новые ответы, а
+    редактирует то же сообщение («Добавлено в заметку: 12»), причём
+    правки тоже собираются в одну.
+    """
+
+    def __init__(self, window: float, edit_delay: float = 1.0):
+        self.window = window
+        self.edit_delay = edit_delay
+        self._status = {}
+
+    async def confirm(self, update: Update, text: str):
+        chat_id = update.effective_chat.id
+        now = time.monotonic()
+        status = self._status.get(chat_id)
+        if status is not None and now - status.last_at < self.window:
+            status.count += 1
+            status.last_text = text
+            status.last_at = now
+            metrics.incr("sender.coalesced")
+            if status.edit_task is None:
+                status.edit_task = asyncio.create_task(
+                    self._edit_later(chat_id, status)
+                )
+            return
+
+        status = self._status[chat_id] = _StatusMessage(last_text=text, last_at=now)
+        try:
+            status.message = await update.message.reply_text(text)
+        except Exception:
+            if self._status.get(chat_id) is status:
+                del self._status[chat_id]
+            raise
+
+    async def _edit_later(self, chat_id: int, status: _StatusMessage):
+        while True:
+            await asyncio.sleep(self.edit_delay)
+            if self._status.get(chat_id) is not status:
+                # Первый ответ так и не отправился
+                return
+            if status.message is not None:
+                break
+        status.edit_task = None
+        try:
+            await status.message.edit_text(
+                f"Добавлено в заметку: {status.count}.\nПоследнее: {status.last_text}"
+            )
+        except Exception as e:
+            logger.error(f"Error editing confirmation: {str(e)}")
+
+
+confirmations = Confirmations(CONFIRM_WINDOW)
@@ -0,0 +1,47 @@
+import asyncio
+from contextvars import ContextVar
+
+from telegram import Update
+
+from config import NoteManager
+
+# Сессия пользователя, чьё сообщение сейчас обрабатывается
+current_session: ContextVar[NoteManager] = ContextVar("current_session")
+
+
+class SessionStore:
+    """Сессии пользователей: у каждой пары (пользователь, чат) своя текущая заметка.
+
+    Дополнительно хранит asyncio.Lock на каждую заметку, чтобы записи
+    параллельных обработчиков в один файл не перемешивались.
+    """
+
+    def __init__(self):
+        self._sessions = {}
+        self._locks = {}
+
+    def get(self, user_id: int, chat_id: int) -> NoteManager:
+        key = (user_id, chat_id)
+        if key not in self._sessions:
+            self._sessions[key] = NoteManager()
+        return self._sessions[key]
+
+    def for_update(self, update: Update) -> NoteManager:
+        return self.get(update.effective_user.id, update.effective_chat.id)
+
+    def note_lock(self, note_path: str) -> asyncio.Lock:
+        if note_path not in self._locks:
+            self._locks[note_path] = asyncio.Lock()
+        return self._locks[note_path]
+
+    def forget_note(self, note_path: str):
+        """Сбрасывает удалённую заметку во всех сессиях."""
+        for session in self._sessions.values():
+            if session.get_current_note_file() == note_path:
+                session.set_current_note_file(None)
+        lock = self._locks.get(note_path)
+        if lock is not None and not lock.locked():
+            del self._locks[note_path]
+
+
+sessions = SessionStore()
@@ -0,0 +1,132 @@
+"""Стеммер Snowball для русского языка.
+
+Нужен полнотекстовому поиску: в индекс и в запрос попадают основы слов,
+поэтому «заметки», «заметкам» и «заметку» находят друг друга.
+"""
+
+import re
+from functools import lru_cache
+
+VOWELS = "аеиоуыэюя"
+
+PERFECTIVE_GERUND = ("в вши вшись".split(), "ив ивши ившись ыв ывши ывшись".split())
+ADJECTIVE = (
+    "ее ие ые ое ими ыми ей ий ый ой ем им ым ом его ого ему ому их ых ую юю ая яя "
+    "ою ею"
+).split()
+PARTICIPLE = ("ем нн вш ющ щ".split(), "ивш ывш ующ".split())
+REFLEXIVE = "ся сь".split()
+VERB = (
+    "ла на ете йте ли й л ем н ло но ет ют ны ть ешь нно".split(),
+    (
+        "ила ыла ена ейте уйте ите или ыли ей уй ил ыл им ым ен ило ыло ено ят ует "
+        "уют ит ыт ены ить ыть ишь ую ю"
+    ).split(),
+)
+NOUN = (
+    "а ев ов ие ье е иями ями ами еи ии и ией ей ой ий й иям ям ием ем ам ом о у ах "
+    "иях ях ы ь ию ью ю ия ья я"
+).split()
+SUPERLATIVE = "ейше ейш".split()
+DERIVATIONAL = "ость ост".split()
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _regions(word: str):
+    """Возвращает начала областей RV и R2."""
+    rv = len(word)
+    for i, char in enumerate(word):
+        if char in VOWELS:
+            rv = i + 1
+            break
+
+    def next_region(start: int) -> int:
+        for i in range(start + 1, len(word)):
+            if word[i] not in VOWELS and word[i - 1] in VOWELS:
+                return i + 1
+        return len(word)
+
+    r1 = next_region(0)
+    return rv, next_region(r1)
+
+
+def _strip(word: str, rv: int, endings: list) -> str:
+    """Удаляет самое длинное окончание из списка, лежащее в RV."""
+    for ending in sorted(endings, key=len, reverse=True):
+        if word.endswith(ending) and len(word) - len(ending) >= rv:
+            return word[: -len(ending)]
+    return None
+
+
+def _strip_grouped(word: str, rv: int, groups: tuple) -> str:
+    """Как _strip, но окончания первой группы должны следовать за «а» или «я»."""
+    candidates = [(ending, True) for ending in groups[0]]
+    candidates += [(ending, False) for ending in groups[1]]
+    for ending, needs_a in sorted(candidates, key=lambda c: len(c[0]), reverse=True):
+        start = len(word) - len(ending)
+        if not word.endswith(ending) or start < rv:
+            continue
+        if needs_a and (start - 1 < rv or word[start - 1] not in "ая"):
+            continue
+        return word[:start]
+    return None
+
+
+def _strip_adjectival(word: str, rv: int) -> str:
+    stripped = _strip(word, rv, ADJECTIVE)
+    if stripped is None:
+        return None
+    participle = _strip_grouped(stripped, rv, PARTICIPLE)
+    return participle if participle is not None else stripped
+
+
+@lru_cache(maxsize=50000)
+def stem(word: str) -> str:
+    word = word.lower().replace("ё", "е")
+    rv, r2 = _regions(word)
+
+    # Шаг 1
+    stripped = _strip_grouped(word, rv, PERFECTIVE_GERUND)
+    if stripped is not None:
+        word = stripped
+    else:
+        stripped = _strip(word, rv, REFLEXIVE)
+        if stripped is not None:
+            word = stripped
+        for step in (
+            lambda w: _strip_adjectival(w, rv),
+            lambda w: _strip_grouped(w, rv, VERB),
+            lambda w: _strip(w, rv, NOUN),
+        ):
+            stripped = step(word)
+            if stripped is not None:
+                word = stripped
+                break
+
+    # Шаг 2
+    if word.endswith("и") and len(word) - 1 >= rv:
+        word = word[:-1]
+
+    # Шаг 3
+    stripped = _strip(word, r2, DERIVATIONAL)
+    if stripped is not None:
+        word = stripped
+
+    # Шаг 4
+    if word.endswith("нн") and len(word) - 2 >= rv:
+        word = word[:-1]
+    else:
+        stripped = _strip(word, rv, SUPERLATIVE)
+        if stripped is not None:
+            word = stripped
+            if word.endswith("нн") and len(word) - 2 >= rv:
+                word = word[:-1]
+        elif word.endswith("ь") and len(word) - 1 >= rv:
+            word = word[:-1]
+    return word
+
+
+def stem_text(text: str) -> str:
+    """Разбивает текст на слова и возвращает их основы через пробел."""
+    return " ".join(stem(token) for token in TOKEN_RE.findall(text.lower()))
@@ -0,0 +1,156 @@
+import asyncio
+import hashlib
+import os
+import shutil
+from collections import OrderedDict
+
+from telegram import Bot, Sticker
+
+from config import STICKER_CACHE_MB, STATE_FOLDER, logger
+from media import convert_sticker, sticker_conversion_params
+from metrics import metrics
+
+
+def _link_or_copy(source: str, destination: str):
+    """Жёсткая ссылка, если папки на одном диске, иначе копия."""
+    temp_path = destination + ".part"
+    try:
+        os.link(source, temp_path)
+    except OSError:
+        shutil.copyfile(source, temp_path)
+    os.replace(temp_path, destination)
+
+
+class StickerCache:
+    """Постоянный LRU-кэш готовых GIF для анимированных и видеостикеров.
+
+    Ключ — file_unique_id плюс хэш параметров конвертации, поэтому смена
+    GIF_PRESET не отдаёт старые результаты. Порядок LRU хранится в mtime
+    файлов и переживает перезапуск; при превышении лимита удаляются
+    давно не использованные файлы.
+    """
+
+    def __init__(self, folder: str, max_bytes: int):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._warmed_sets = set()
+        self._tasks = set()
+        self._work_folder = os.path.join(folder, "tmp")
+
+    def open(self):
+        os.makedirs(self.folder, exist_ok=True)
+        # Незавершённые конвертации прогрева после сбоя
+        shutil.rmtree(self._work_folder, ignore_errors=True)
+        files = []
+        with os.scandir(self.folder) as entries:
+            for entry in entries:
+                if not entry.is_file():
+                    continue
+                if not entry.name.endswith(".gif"):
+                    # Недоделанные файлы и исходники после сбоя
+                    os.remove(entry.path)
+                    continue
+                stat = entry.stat()
+                files.append((stat.st_mtime, entry.name, stat.st_size))
+        for _, name, size in sorted(files):
+            self._entries[name] = size
+            self._size += size
+        self._update_gauges()
+        logger.info(f"Кэш стикеров: {len(self._entries)} файлов, {self._size} байт")
+
+    def close(self):
+        for task in list(self._tasks):
+            task.cancel()
+
+    def _update_gauges(self):
+        metrics.set_gauge("sticker_cache.files", len(self._entries))
+        metrics.set_gauge("sticker_cache.bytes", self._size)
+
+    @staticmethod
+    def key(sticker: Sticker) -> str:
+        params = repr(sticker_conversion_params(sticker)).encode()
+        digest = hashlib.sha1(params).hexdigest()[:10]
+        return f"{sticker.file_unique_id}_{digest}.gif"
+
+    def contains(self, key: str) -> bool:
+        return key in self._entries
+
+    async def fetch(self, key: str, destination: str) -> bool:
+        """Кладёт закэшированный GIF в destination, False при промахе."""
+        path = os.path.join(self.folder, key)
+        if key not in self._entries or not os.path.exists(path):
+            self._forget(key)
+            metrics.incr("sticker_cache.misses")
+            return False
+        await asyncio.to_thread(_link_or_copy, path, destination)
+        self._entries.move_to_end(key)
+        os.utime(path)
+        metrics.incr("sticker_cache.hits")
+        return True
+
+    async def store(self, key: str, source: str):
+        """Добавляет готовый GIF в кэш и вытесняет старые записи."""
+        path = os.path.join(self.folder, key)
+        await asyncio.to_thread(_link_or_copy, source, path)
+        self._forget(key)
+        self._entries[key] = os.path.getsize(path)
+        self._size += self._entries[key]
+        self._evict()
+
+    def _forget(self, key: str):
+        size = self._entries.pop(key, None)
+        if size is not None:
+            self._size -= size
+
+    def _evict(self):
+        while self._size > self.max_bytes and len(self._entries) > 1:
+            key, size = self._entries.popitem(last=False)
+            self._size -= size
+            try:
+                os.remove(os.path.join(self.folder, key))
+            except FileNotFoundError:
+                pass
+            metrics.incr("sticker_cache.evicted")
+        self._update_gauges()
+
+    def prewarm(self, bot: Bot, set_name: str):
+        """Запускает фоновую конвертацию всего набора при первой встрече с ним."""
+        if not set_name or set_name in self._warmed_sets:
+            return
+        self._warmed_sets.add(set_name)
+        task = asyncio.create_task(self._prewarm_set(bot, set_name))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _prewarm_set(self, bot: Bot, set_name: str):
+        try:
+            sticker_set = await bot.get_sticker_set(set_name)
+        except Exception as e:
+            logger.error(f"Error fetching sticker set {set_name}: {str(e)}")
+            return
+        converted = 0
+        # По одному стикеру за раз, чтобы не занимать весь пул обработки медиа
+        for sticker in sticker_set.stickers:
+            if not (sticker.is_animated or sticker.is_video):
+                continue
+            key = self.key(sticker)
+            if self.contains(key):
+                continue
+            try:
+                path = await convert_sticker(sticker, key, folder=self._work_folder)
+                await self.store(key, path)
+                os.remove(path)
+                converted += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error prewarming sticker from {set_name}: {str(e)}")
+        metrics.incr("sticker_cache.prewarmed", converted)
+        logger.info(f"Набор стикеров {set_name} прогрет: {converted} новых GIF")
+
+
+sticker_cache = StickerCache(
+    os.path.join(STATE_FOLDER, "sticker-cache"), STICKER_CACHE_MB * 1024 * 1024
+)
@@ -0,0 +1,296 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+
+from telegram import Bot
+
+from config import (
+    AUDIO_TEMP_FOLDER,
+    TRANSCRIPTION_QUEUE_SIZE,
+    TRANSCRIPTION_WORKERS,
+    WHISPER_MODEL,
+    WHISPER_WARMUP,
+    logger,
+)
+from audio import SpeechSegmenter
+from notes import (
+    ContentType,
+    TranscriptContentData,
+    append_to_note,
+    format_content,
+    generate_filename,
+)
+from metrics import metrics
+from note_writer import note_writer
+from sessions import sessions
+
+PENDING_JOBS_FILE = os.path.join(AUDIO_TEMP_FOLDER, "pending_transcriptions.json")
+STATUS_UPDATE_INTERVAL = 3.0
+
+_model = None
+_model_lock = threading.Lock()
+
+
+def get_whisper_model():
+    """Возвращает модель Whisper, загружая её при первом обращении."""
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                import whisper
+
+                started = time.perf_counter()
+                _model = whisper.load_model(WHISPER_MODEL)
+                metrics.observe("whisper.load", time.perf_counter() - started)
+                logger.info(f"Модель Whisper {WHISPER_MODEL} загружена")
+    return _model
+
+
+@dataclass
+class TranscriptionJob:
+    audio: bytes = field(repr=False)
+    note_path: str
+    chat_id: int
+    status_message_id: int
+    # Исходное сообщение: транскрипт пишется отдельным блоком со ссылкой на него
+    message_id: int = 0
+    message_date: str = ""
+    queued_at: float = field(default_factory=time.time)
+    # Сколько фрагментов уже записано в заметку: после перезапуска они пропускаются
+    segments_done: int = 0
+    text_written: bool = False
+    # Размер заметки после последнего фрагмента транскрипта
+    note_size: int = 0
+
+
+def _note_size(note_path: str) -> int:
+    try:
+        return os.path.getsize(note_path)
+    except OSError:
+        return -1
+
+
+def _transcribe_segment(segment, prompt: str) -> str:
+    """Синхронная транскрипция фрагмента, выполняется в пуле потоков."""
+    result = get_whisper_model().transcribe(
+        segment, language="ru", initial_prompt=prompt or None
+    )
+    return result["text"].strip()
+
+
+class TranscriptionService:
+    """Очередь транскрипций Whisper, обрабатываемая вне event loop.
+
+    Модель выполняется в отдельном пуле потоков, поэтому бот продолжает
+    принимать сообщения. Незавершённые задачи сохраняются на диск при
+    остановке и возвращаются в очередь при следующем запуске.
+    """
+
+    def __init__(self, workers: int = 1, max_queue: int = 20):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._queue = None
+        self._executor = None
+        self._decoder = None
+        self._tasks = []
+        self._in_flight = {}
+        self._bot = None
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    async def start(self, bot: Bot):
+        self._bot = bot
+        pending = self._load_pending()
+        self._queue = asyncio.Queue(maxsize=max(self.max_queue, len(pending)))
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="whisper"
+        )
+        self._decoder = ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="audio-decode"
+        )
+        for job in pending:
+            self._queue.put_nowait(job)
+        self._tasks = [
+            asyncio.create_task(self._worker(i)) for i in range(self.workers)
+        ]
+        if WHISPER_WARMUP:
+            self._tasks.append(asyncio.create_task(self._warmup()))
+        metrics.set_gauge("transcription.queue", self.queue_depth)
+
+    async def _warmup(self):
+        """Загружает модель в том же пуле: первая задача дождётся прогрева."""
+        try:
+            await asyncio.get_running_loop().run_in_executor(
+                self._executor, get_whisper_model
+            )
+        except Exception as e:
+            logger.error(f"Error loading Whisper model: {str(e)}")
+
+    def submit(self, job: TranscriptionJob) -> int:
+        """Ставит задачу в очередь. Бросает asyncio.QueueFull при переполнении."""
+        self._queue.put_nowait(job)
+        metrics.incr("transcription.submitted")
+        metrics.set_gauge("transcription.queue", self.queue_depth)
+        return self.queue_depth
+
+    async def _transcribe_job(self, job: TranscriptionJob):
+        """Распознаёт сообщение по фрагментам и дописывает текст по мере готовности."""
+        loop = asyncio.get_running_loop()
+        segmenter = SpeechSegmenter(job.audio)
+        previous_text = ""
+        segment_index = 0
+        last_status = time.monotonic()
+        try:
+            next_segment = loop.run_in_executor(self._decoder, segmenter.next_segment)
+            while True:
+                segment = await next_segment
+                if segment is None:
+                    break
+                # Следующий фрагмент декодируется, пока распознаётся текущий
+                next_segment = loop.run_in_executor(
+                    self._decoder, segmenter.next_segment
+                )
+                segment_index += 1
+                if segment_index <= job.segments_done:
+                    continue
+
+                text = await loop.run_in_executor(
+                    self._executor, _transcribe_segment, segment, previous_text
+                )
+                previous_text = text
+                if text:
+                    async with sessions.note_lock(job.note_path):
+                        await self._append_text(job, text)
+                job.segments_done = segment_index
+                metrics.incr("transcription.segments")
+
+                if time.monotonic() - last_status >= STATUS_UPDATE_INTERVAL:
+                    last_status = time.monotonic()
+                    await self._update_status(
+                        job, f"Транскрибирование… готово фрагментов: {segment_index}"
+                    )
+        finally:
+            segmenter.close()
+
+    @staticmethod
+    async def _append_text(job: TranscriptionJob, text: str):
+        # Если после прошлого фрагмента в заметку писали другие сообщения,
+        # заголовок со ссылкой на голосовое повторяется
+        if job.text_written and _note_size(job.note_path) == job.note_size:
+            append_to_note(text, job.note_path)
+        else:
+            append_to_note(
+                format_content(
+                    ContentType.TRANSCRIPT,
+                    TranscriptContentData(text, job.message_id, job.message_date),
+                ),
+                job.note_path,
+            )
+            job.text_written = True
+        await note_writer.flush(job.note_path)
+        job.note_size = _note_size(job.note_path)
+
+    async def _worker(self, worker_id: int):
+        while True:
+            job = await self._queue.get()
+            metrics.set_gauge("transcription.queue", self.queue_depth)
+            self._in_flight[worker_id] = job
+            try:
+                with metrics.timer("transcription.duration"):
+                    await self._transcribe_job(job)
+                metrics.observe("transcription.latency", time.time() - job.queued_at)
+                metrics.incr("transcription.completed")
+                await self._update_status(
+                    job, "Голосовое сообщение транскрибировано и добавлено в заметку."
+                )
+            except asyncio.CancelledError:
+                # Задача остаётся в _in_flight и будет сохранена в stop()
+                raise
+            except Exception as e:
+                metrics.incr("transcription.failed")
+                logger.error(f"Error in transcription worker: {str(e)}")
+                await self._update_status(job, f"Ошибка при транскрипции: {str(e)}")
+            self._in_flight.pop(worker_id, None)
+            self._queue.task_done()
+
+    async def _update_status(self, job: TranscriptionJob, text: str):
+        try:
+            await self._bot.edit_message_text(
+                text, chat_id=job.chat_id, message_id=job.status_message_id
+            )
+        except Exception as e:
+            logger.error(f"Error updating transcription status: {str(e)}")
+
+    async def stop(self):
+        """Останавливает воркеры и сохраняет незавершённые задачи на диск."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+        pending = list(self._in_flight.values())
+        while self._queue is not None and not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        self._save_pending(pending)
+
+        for executor in (self._executor, self._decoder):
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
+        self._decoder = None
+
+    @staticmethod
+    def _save_pending(jobs: list):
+        """Аудио незавершённых задач попадает на диск только при остановке."""
+        if not jobs:
+            if os.path.exists(PENDING_JOBS_FILE):
+                os.remove(PENDING_JOBS_FILE)
+            return
+        manifest = []
+        for job in jobs:
+            ogg_path = os.path.join(
+                AUDIO_TEMP_FOLDER, generate_filename(ContentType.TRANSCRIPT)
+            )
+            with open(ogg_path, "wb") as f:
+                f.write(job.audio)
+            item = asdict(job)
+            item.pop("audio")
+            item["ogg_path"] = ogg_path
+            manifest.append(item)
+        with open(PENDING_JOBS_FILE, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        logger.info(f"Сохранено незавершённых транскрипций: {len(jobs)}")
+
+    @staticmethod
+    def _load_pending() -> list:
+        if not os.path.exists(PENDING_JOBS_FILE):
+            return []
+        jobs = []
+        try:
+            with open(PENDING_JOBS_FILE, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            for item in manifest:
+                ogg_path = item.pop("ogg_path")
+                if not os.path.exists(ogg_path):
+                    continue
+                with open(ogg_path, "rb") as f:
+                    jobs.append(TranscriptionJob(audio=f.read(), **item))
+                os.remove(ogg_path)
+        except Exception as e:
+            logger.error(f"Error loading pending transcriptions: {str(e)}")
+        finally:
+            os.remove(PENDING_JOBS_FILE)
+        logger.info(f"Восстановлено незавершённых транскрипций: {len(jobs)}")
+        return jobs
+
+
+transcription_service = TranscriptionService(
+    workers=TRANSCRIPTION_WORKERS,
+    max_queue=TRANSCRIPTION_QUEUE_SIZE,
+)
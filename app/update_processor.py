@@ -0,0 +1,154 @@
+import asyncio
+import contextlib
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+from metrics import metrics
+
+# Вложения, ради которых обработчик качает или конвертирует файл
+HEAVY_ATTACHMENTS = (
+    "animation",
+    "audio",
+    "document",
+    "photo",
+    "sticker",
+    "video",
+    "video_note",
+    "voice",
+)
+
+
+def _order_key(update: object):
+    """Ключ упорядочивания: сессия пользователя в чате, а с ней и её заметка."""
+    if not isinstance(update, Update):
+        return None
+    if update.effective_chat is not None:
+        return update.effective_chat.id
+    if update.effective_user is not None:
+        return update.effective_user.id
+    return None
+
+
+def _media_group(update: object):
+    message = update.effective_message if isinstance(update, Update) else None
+    return message.media_group_id if message is not None else None
+
+
+def _is_heavy(update: object) -> bool:
+    message = update.effective_message if isinstance(update, Update) else None
+    if message is None:
+        return False
+    return any(getattr(message, name) for name in HEAVY_ATTACHMENTS)
+
+
+class OrderedUpdateProcessor(BaseUpdateProcessor):
+    """Параллельная обработка обновлений с сохранением порядка внутри чата.
+
+    Обновления разных чатов выполняются одновременно, обновления одного
+    чата — строго по очереди прихода, поэтому записи в заметку не
+    переставляются. Записи разных чатов в одну заметку сериализует
+    блокировка заметки в main_decorator. Обновления с медиа дополнительно
+    ограничены max_heavy_updates, чтобы тяжёлые загрузки и конвертации
+    не заняли все слоты и не задерживали текст.
+
+    Семафор BaseUpdateProcessor ограничивает все принятые обновления,
+    включая ждущие своей очереди (max_pending_updates). Число одновременно
+    работающих обработчиков ограничивает отдельный семафор, который
+    берётся только после очереди чата и лимита медиа, поэтому ждущие
+    обновления одного чата не задерживают остальные чаты.
+    """
+
+    def __init__(
+        self,
+        max_concurrent_updates: int,
+        max_heavy_updates: int,
+        max_pending_updates: int = 1024,
+    ):
+        super().__init__(max(max_pending_updates, max_concurrent_updates))
+        self.max_running_updates = max_concurrent_updates
+        self.max_heavy_updates = max_heavy_updates
+        self._running = asyncio.Semaphore(max_concurrent_updates)
+        self._heavy = asyncio.Semaphore(max_heavy_updates)
+        self._tails = {}
+        self._held = {}
+        self._in_flight = 0
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def do_process_update(self, update: object, coroutine):
+        key = _order_key(update)
+        group = _media_group(update)
+        if group is not None and (key, group) in self._held:
+            # Элемент альбома, место которого в очереди уже занято
+            try:
+                async with self._running:
+                    await self._run(coroutine)
+            finally:
+                coroutine.close()
+            return
+        await self.run_ordered(key, coroutine, _is_heavy(update))
+
+    async def _run(self, coroutine):
+        self._in_flight += 1
+        metrics.set_gauge("updates.in_flight", self._in_flight)
+        try:
+            await coroutine
+        finally:
+            self._in_flight -= 1
+            metrics.set_gauge("updates.in_flight", self._in_flight)
+
+    def _enqueue(self, key) -> tuple:
+        previous = self._tails.get(key) if key is not None else None
+        done = asyncio.get_running_loop().create_future()
+        if key is not None:
+            self._tails[key] = done
+        return previous, done
+
+    async def run_ordered(self, key, coroutine, heavy: bool = False):
+        """Выполняет coroutine после всех ранее начатых задач с тем же ключом."""
+        previous, done = self._enqueue(key)
+        await self._run_after(key, previous, done, coroutine, heavy)
+
+    def hold(self, key, group):
+        """Занимает место в очереди key для отложенной записи группы group.
+
+        Альбом занимает место при первом элементе: сообщения, пришедшие
+        после него, ждут записи альбома. Остальные элементы той же группы
+        проходят без очереди, пока место не освободит run_held.
+        """
+        self._held[(key, group)] = self._enqueue(key)
+
+    async def run_held(self, key, group, coroutine, heavy: bool = False):
+        """Выполняет coroutine на месте, занятом hold, и освобождает его."""
+        previous, done = self._held.pop((key, group))
+        await self._run_after(key, previous, done, coroutine, heavy)
+
+    async def _run_after(self, key, previous, done, coroutine, heavy: bool):
+        if previous is not None:
+            metrics.incr("updates.ordered_waits")
+            try:
+                # shield: отмена ожидающего не должна отменять предшественника
+                await asyncio.shield(previous)
+            except asyncio.CancelledError:
+                coroutine.close()
+                # Следующие задачи чата по-прежнему ждут предшественника
+                previous.add_done_callback(lambda _: self._release(key, done))
+                raise
+        try:
+            limit = self._heavy if heavy else contextlib.nullcontext()
+            async with limit, self._running:
+                await self._run(coroutine)
+        finally:
+            coroutine.close()
+            self._release(key, done)
+
+    def _release(self, key, done: asyncio.Future):
+        if not done.done():
+            done.set_result(None)
+        if self._tails.get(key) is done:
+            del self._tails[key]
@@ -0,0 +1,220 @@
+import asyncio
+import os
+import time
+from dataclasses import dataclass, field
+
+from config import (
+    VIDEO_CODEC,
+    VIDEO_MAX_HEIGHT,
+    VIDEO_MAX_MB,
+    VIDEO_QUEUE_SIZE,
+    VIDEO_TRANSCODE,
+    VIDEO_TRANSCODE_WORKERS,
+    logger,
+)
+from notes import (
+    ContentType,
+    PhotoContentData,
+    VideoContentData,
+    format_content,
+)
+from journal import atomic_write
+from media import (
+    build_poster_command,
+    build_transcode_command,
+    video_bitrate_kbps,
+)
+from media_store import media_store
+from metrics import metrics
+from note_writer import note_writer
+from sessions import sessions
+from workers import media_pool
+
+
+@dataclass
+class TranscodeJob:
+    unique_id: str
+    note_path: str
+    duration: int
+    queued_at: float = field(default_factory=time.time)
+    file_name: str = ""
+    progress: float = 0.0
+    started: bool = False
+
+
+def _embed(file_name: str) -> str:
+    return format_content(ContentType.VIDEO, VideoContentData(file_name)).rstrip("\n")
+
+
+class VideoTranscoder:
+    """Фоновое перекодирование видео в компактный H.264/AV1 и кадр-превью.
+
+    Видео сразу попадает в заметку в исходном виде, а задача встаёт
+    в очередь. ffmpeg работает через общий media_pool и читает файл
+    с диска, так что бот не держит видео в памяти. Когда задача готова,
+    ссылка в заметке заменяется на превью и перекодированный файл,
+    исходник остаётся в хранилище вложений до /cleanmedia.
+    """
+
+    suffix = f"_{VIDEO_CODEC}"
+
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._queue = None
+        self._tasks = []
+        self._running = {}
+
+    @property
+    def enabled(self) -> bool:
+        return VIDEO_TRANSCODE and self._queue is not None
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    def start(self):
+        if not VIDEO_TRANSCODE:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._tasks = [
+            asyncio.create_task(self._worker(i)) for i in range(self.workers)
+        ]
+        metrics.set_gauge("video.queue", self.queue_depth)
+
+    def submit(self, unique_id: str, note_path: str, duration: int = 0) -> bool:
+        """Ставит видео из хранилища вложений в очередь на перекодирование."""
+        if not self.enabled:
+            return False
+        try:
+            self._queue.put_nowait(TranscodeJob(unique_id, note_path, duration))
+        except asyncio.QueueFull:
+            # Видео уже в заметке в исходном виде, задачу можно пропустить
+            metrics.incr("video.skipped")
+            logger.error("Очередь перекодирования видео переполнена")
+            return False
+        metrics.incr("video.submitted")
+        metrics.set_gauge("video.queue", self.queue_depth)
+        return True
+
+    def jobs(self) -> list:
+        """Выполняемые задачи и затем ожидающие, в порядке очереди."""
+        waiting = list(self._queue._queue) if self._queue else []
+        return list(self._running.values()) + waiting
+
+    async def _worker(self, worker_id: int):
+        while True:
+            job = await self._queue.get()
+            metrics.set_gauge("video.queue", self.queue_depth)
+            self._running[worker_id] = job
+            try:
+                with metrics.timer("video.duration"):
+                    await self._transcode(job)
+                metrics.observe("video.latency", time.time() - job.queued_at)
+                metrics.incr("video.completed")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                metrics.incr("video.failed")
+                logger.error(f"Error in video transcoder: {str(e)}")
+            finally:
+                self._running.pop(worker_id, None)
+                self._queue.task_done()
+
+    async def _transcode(self, job: TranscodeJob):
+        source_path = media_store.path_for(job.unique_id)
+        if source_path is None:
+            return
+        job.file_name = os.path.basename(source_path)
+        stem, _ = os.path.splitext(source_path)
+        if stem.endswith(self.suffix):
+            # Повторно присланное видео уже перекодировано
+            return
+
+        job.started = True
+        output_path = f"{stem}{self.suffix}.mp4"
+        poster_path = f"{stem}_poster.jpg"
+        try:
+            await media_pool.run_process(
+                "poster",
+                build_poster_command(
+                    source_path, poster_path, min(1.0, job.duration / 2)
+                ),
+            )
+            await media_pool.run_process(
+                "transcode",
+                build_transcode_command(
+                    source_path,
+                    output_path,
+                    VIDEO_CODEC,
+                    VIDEO_MAX_HEIGHT,
+                    video_bitrate_kbps(VIDEO_MAX_MB, job.duration),
+                ),
+                on_output=lambda line: self._on_progress(job, line),
+            )
+        except BaseException:
+            for path in (output_path, poster_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            raise
+
+        source_size = os.path.getsize(source_path)
+        output_size = os.path.getsize(output_path)
+        if output_size >= source_size:
+            # Исходник и так компактный: в заметку добавляется только превью
+            os.remove(output_path)
+            output_path = source_path
+        else:
+            metrics.incr("video.saved_bytes", source_size - output_size)
+            # Исходник остаётся под отдельным ключом, чтобы его удалил /cleanmedia
+            await media_store.register(f"{job.unique_id}:source", source_path)
+            await media_store.register(job.unique_id, output_path)
+        poster_name = await media_store.register(
+            f"{job.unique_id}:poster", poster_path
+        )
+
+        replacement = (
+            format_content(ContentType.PHOTO, PhotoContentData(poster_name))
+            + _embed(os.path.basename(output_path))
+        )
+        async with sessions.note_lock(job.note_path):
+            # Ссылка могла ещё лежать в буфере заметки
+            await note_writer.flush(job.note_path)
+            await asyncio.to_thread(
+                self._rewrite_embed, job.note_path, job.file_name, replacement
+            )
+
+    @staticmethod
+    def _rewrite_embed(note_path: str, file_name: str, replacement: str):
+        """Заменяет ссылку на исходное видео в заметке."""
+        if not os.path.exists(note_path):
+            return
+        with open(note_path, "r", encoding="utf-8") as f:
+            text = f.read()
+        embed = _embed(file_name)
+        if embed not in text:
+            return
+        atomic_write(note_path, text.replace(embed, replacement))
+
+    @staticmethod
+    def _on_progress(job: TranscodeJob, line: str):
+        key, _, value = line.partition("=")
+        if key == "out_time_us" and job.duration and value.isdigit():
+            job.progress = min(int(value) / (job.duration * 1_000_000), 1.0)
+        elif key == "progress" and value == "end":
+            job.progress = 1.0
+
+    async def stop(self):
+        """Останавливает воркеры: ffmpeg завершается, исходники остаются в заметках."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        dropped = len(self._running) + self.queue_depth
+        if dropped:
+            logger.info(f"Не перекодировано видео при остановке: {dropped}")
+        self._running = {}
+        self._queue = None
+
+
+video_transcoder = VideoTranscoder(VIDEO_TRANSCODE_WORKERS, VIDEO_QUEUE_SIZE)
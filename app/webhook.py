@@ -0,0 +1,199 @@
+import asyncio
+import json
+import signal
+import time
+from http import HTTPStatus
+
+from telegram import Update
+from telegram.ext import Application
+
+from config import (
+    WEBHOOK_DRAIN_SECONDS,
+    WEBHOOK_LISTEN,
+    WEBHOOK_PATH,
+    WEBHOOK_PORT,
+    WEBHOOK_SECRET,
+    WEBHOOK_URL,
+    logger,
+)
+from metrics import metrics
+
+MAX_BODY_SIZE = 10 * 1024 * 1024
+MAX_HEADERS = 100
+READ_TIMEOUT = 30
+
+
+class WebhookServer:
+    """Встроенный HTTP-сервер для режима вебхука.
+
+    POST на WEBHOOK_PATH принимает обновления Telegram и кладёт их
+    в update_queue приложения, GET /health отвечает балансировщику.
+    При остановке сервер сначала отдаёт 503 на /health и ещё
+    WEBHOOK_DRAIN_SECONDS принимает обновления, затем закрывается.
+    """
+
+    def __init__(self, application: Application, host: str, port: int, path: str):
+        self.application = application
+        self.host = host
+        self.port = port
+        self.path = path
+        self.draining = False
+        self._server = None
+        self._writers = set()
+
+    async def start(self):
+        self._server = await asyncio.start_server(
+            self._handle_connection, self.host, self.port
+        )
+        logger.info(f"Вебхук слушает {self.host}:{self.port}{self.path}")
+
+    async def stop(self):
+        if self._server is None:
+            return
+        self._server.close()
+        # Открытые keep-alive соединения закрываются принудительно
+        for writer in list(self._writers):
+            writer.close()
+        await self._server.wait_closed()
+        self._server = None
+
+    async def _handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ):
+        self._writers.add(writer)
+        try:
+            while True:
+                request = await asyncio.wait_for(
+                    self._read_request(reader), READ_TIMEOUT
+                )
+                if request is None:
+                    break
+                method, target, headers, body = request
+                status, payload = await self._route(method, target, headers, body)
+                keep_alive = headers.get("connection", "").lower() != "close"
+                self._write_response(writer, status, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except ValueError as e:
+            self._write_response(writer, HTTPStatus.BAD_REQUEST, {"error": str(e)}, False)
+        except Exception as e:
+            logger.error(f"Error in webhook connection: {str(e)}")
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+    @staticmethod
+    async def _read_request(reader: asyncio.StreamReader):
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        try:
+            method, target, _ = request_line.decode("latin-1").split(" ", 2)
+        except ValueError:
+            raise ValueError("Некорректная строка запроса")
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            if len(headers) >= MAX_HEADERS:
+                raise ValueError("Слишком много заголовков")
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        length = int(headers.get("content-length", "0"))
+        if length > MAX_BODY_SIZE:
+            raise ValueError("Слишком большое тело запроса")
+        body = await reader.readexactly(length) if length else b""
+        return method, target.split("?", 1)[0], headers, body
+
+    async def _route(self, method: str, target: str, headers: dict, body: bytes):
+        if target == "/health" and method == "GET":
+            if self.draining:
+                return HTTPStatus.SERVICE_UNAVAILABLE, {"status": "draining"}
+            return HTTPStatus.OK, {
+                "status": "ok",
+                "pending_updates": self.application.update_queue.qsize(),
+            }
+
+        if target != self.path:
+            return HTTPStatus.NOT_FOUND, {"error": "not found"}
+        if method != "POST":
+            return HTTPStatus.METHOD_NOT_ALLOWED, {"error": "method not allowed"}
+        if (
+            WEBHOOK_SECRET
+            and headers.get("x-telegram-bot-api-secret-token") != WEBHOOK_SECRET
+        ):
+            metrics.incr("webhook.forbidden")
+            return HTTPStatus.FORBIDDEN, {"error": "forbidden"}
+
+        started = time.perf_counter()
+        try:
+            update = Update.de_json(json.loads(body), self.application.bot)
+        except (ValueError, TypeError) as e:
+            logger.error(f"Error parsing webhook update: {str(e)}")
+            return HTTPStatus.BAD_REQUEST, {"error": "invalid update"}
+        await self.application.update_queue.put(update)
+        metrics.incr("webhook.updates")
+        metrics.observe("webhook.request", time.perf_counter() - started)
+        return HTTPStatus.OK, {}
+
+    @staticmethod
+    def _write_response(
+        writer: asyncio.StreamWriter, status: HTTPStatus, payload: dict, keep_alive: bool
+    ):
+        body = json.dumps(payload).encode()
+        head = (
+            f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+            "\r\n"
+        )
+        writer.write(head.encode("latin-1") + body)
+
+
+async def run_webhook(application: Application, commands: list):
+    """Жизненный цикл бота в режиме вебхука с плавной остановкой по SIGTERM."""
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+
+    server = WebhookServer(application, WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_PATH)
+    await application.initialize()
+    try:
+        if application.post_init:
+            await application.post_init(application)
+        await application.bot.set_my_commands(commands)
+        await application.bot.set_webhook(
+            url=WEBHOOK_URL.rstrip("/") + WEBHOOK_PATH,
+            secret_token=WEBHOOK_SECRET or None,
+            allowed_updates=Update.ALL_TYPES,
+        )
+        await application.start()
+        await server.start()
+        print("Бот запущен в режиме вебхука...")
+
+        await stop_event.wait()
+
+        # Балансировщик видит 503 и перестаёт слать запросы, уже принятые
+        # обновления продолжают обрабатываться
+        logger.info("Остановка: вывод из балансировки")
+        server.draining = True
+        await asyncio.sleep(WEBHOOK_DRAIN_SECONDS)
+    finally:
+        await server.stop()
+        if application.running:
+            # Application.stop дожидается обработки обновлений из очереди,
+            # post_stop дописывает альбомы и треки до закрытия соединений
+            await application.stop()
+            if application.post_stop:
+                await application.post_stop(application)
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)
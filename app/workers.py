@@ -0,0 +1,138 @@
+import asyncio
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from config import MEDIA_WORKERS, logger
+from metrics import metrics
+
+
+class MediaPool:
+    """Общий ограниченный пул для тяжёлой обработки медиа.
+
+    Python-функции (рендер Lottie) выполняются в пуле процессов, внешние
+    программы (ffmpeg) запускаются как подпроцессы. Одновременно работает
+    не больше max_workers задач любого вида, остальные ждут своей очереди,
+    не блокируя цикл событий. Отмена ожидающего обработчика снимает задачу
+    из очереди или завершает её подпроцесс; уже запущенная в пуле функция
+    занимает слот, пока не завершится.
+    """
+
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self._slots = asyncio.Semaphore(max_workers)
+        self._executor = None
+        self._waiting = 0
+        self._active = 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        # Процессы создаются при первой задаче, а не при импорте. fork после
+        # запуска потоков (запись заметок, HTTP) небезопасен. forkserver
+        # один раз запускает чистый однопоточный процесс, импортирует в нём
+        # главный модуль, и процессы пула быстро ответвляются от него
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("forkserver"),
+            )
+        return self._executor
+
+    def _update_gauges(self):
+        metrics.set_gauge("media.queue_depth", self._waiting)
+        metrics.set_gauge("media.active", self._active)
+
+    async def _acquire(self):
+        self._waiting += 1
+        self._update_gauges()
+        try:
+            await self._slots.acquire()
+        finally:
+            self._waiting -= 1
+        self._active += 1
+        self._update_gauges()
+
+    def _release(self, label: str, started: float):
+        self._active -= 1
+        self._slots.release()
+        self._update_gauges()
+        metrics.observe(f"media.{label}", time.perf_counter() - started)
+
+    async def run(self, label: str, func, *args):
+        """Выполняет func(*args) в пуле процессов и возвращает результат."""
+        await self._acquire()
+        started = time.perf_counter()
+        try:
+            future = self._get_executor().submit(func, *args)
+        except BaseException:
+            self._release(label, started)
+            raise
+
+        loop = asyncio.get_running_loop()
+
+        def on_done(_):
+            # Запущенную задачу отмена не останавливает, поэтому слот
+            # освобождается только по её завершении
+            try:
+                loop.call_soon_threadsafe(self._release, label, started)
+            except RuntimeError:
+                # Цикл событий уже закрыт при остановке бота
+                pass
+
+        future.add_done_callback(on_done)
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+
+    async def run_process(self, label: str, args: list, on_output=None):
+        """Запускает внешнюю программу, при ошибке поднимает RuntimeError.
+
+        Если передан on_output, он вызывается для каждой строки stdout
+        (например, для вывода ffmpeg -progress).
+        """
+        await self._acquire()
+        started = time.perf_counter()
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *args,
+                stdout=(
+                    asyncio.subprocess.PIPE
+                    if on_output
+                    else asyncio.subprocess.DEVNULL
+                ),
+                stderr=asyncio.subprocess.PIPE,
+            )
+            try:
+                if on_output is None:
+                    _, stderr = await process.communicate()
+                else:
+                    # stderr читается параллельно, чтобы подпроцесс не встал
+                    # на заполненном канале
+                    stderr_task = asyncio.ensure_future(process.stderr.read())
+                    try:
+                        async for line in process.stdout:
+                            on_output(line.decode(errors="ignore").strip())
+                        stderr = await stderr_task
+                    finally:
+                        stderr_task.cancel()
+                    await process.wait()
+            except asyncio.CancelledError:
+                process.kill()
+                await process.wait()
+                raise
+        finally:
+            self._release(label, started)
+        if process.returncode != 0:
+            raise RuntimeError(
+                stderr.decode(errors="ignore").strip() or f"{args[0]} failed"
+            )
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            logger.info("Пул обработки медиа остановлен")
+
+
+media_pool = MediaPool(MEDIA_WORKERS)
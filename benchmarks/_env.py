@@ -0,0 +1,77 @@
+"""Окружение для замеров: временное хранилище и путь к модулям бота.
+
+Импортируется первым в каждом скрипте, до модулей бота: config.py
+читает окружение и создаёт папки при импорте (как tests/conftest.py).
+"""
+
+import logging
+import os
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+VAULT = tempfile.mkdtemp(prefix="obsidian-bot-bench-")
+for name, folder in {
+    "OBSIDIAN_VAULT_PATH": "",
+    "NOTES_FOLDER": "notes",
+    "TEMP_FOLDER": "temp",
+    "AUDIO_TEMP_FOLDER": "audio",
+    "ATTACH_FOLDER": "attachments",
+}.items():
+    os.environ.setdefault(name, os.path.join(VAULT, folder))
+os.environ.setdefault("TELEGRAM_TOKEN", "123:bench")
+os.environ.setdefault("WHISPER_WARMUP", "false")
+os.environ.setdefault("SEND_REACTIONS", "false")
+logging.getLogger().addHandler(logging.NullHandler())
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+
+def percentile(values: list, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def report(title: str, rows: dict):
+    print(title)
+    for name, value in rows.items():
+        if isinstance(value, float):
+            value = f"{value:.4f}"
+        print(f"  {name:<32} {value}")
+
+
+@contextmanager
+def stopwatch(results: dict, name: str):
+    started = time.perf_counter()
+    yield
+    results[name] = time.perf_counter() - started
+
+
+@contextmanager
+def serve_directory(path: str):
+    """Раздаёт папку по HTTP из отдельного потока, отдаёт базовый адрес.
+
+    Сервер живёт вне event loop замера, поэтому отвечает и тогда,
+    когда loop заблокирован синхронной загрузкой.
+    """
+    import functools
+    import threading
+    from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(SimpleHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(
+        ("127.0.0.1", 0), functools.partial(Handler, directory=path)
+    )
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,98 @@
+"""Задержки event loop при параллельных загрузках файлов.
+
+Сравнивает общий загрузчик downloads.Downloader (httpx, потоковая запись
+на диск) с прежним путём обработчиков: requests.get(...).content внутри
+async-функции. Пока идут загрузки, фоновая задача каждые 5 мс засыпает
+и меряет, насколько позже она проснулась — это время, которое ждал бы
+любой другой апдейт.
+
+    python benchmarks/downloads.py --files 8 --size-mb 20
+"""
+
+import _env  # noqa: F401  (должен импортироваться первым)
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+import requests
+from telegram import File
+
+from downloads import Downloader
+
+TICK = 0.005
+
+
+async def _measure_lag(samples: list):
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(TICK)
+        samples.append(time.perf_counter() - started - TICK)
+
+
+async def _old_download(url: str, path: str):
+    # Прежний код обработчиков: синхронный запрос прямо в корутине
+    response = requests.get(url)
+    with open(path, "wb") as f:
+        f.write(response.content)
+
+
+async def _run(name: str, download, urls: list, target: str) -> dict:
+    samples = []
+    ticker = asyncio.create_task(_measure_lag(samples))
+    await asyncio.sleep(TICK * 2)
+    started = time.perf_counter()
+    await asyncio.gather(
+        *(
+            download(url, os.path.join(target, f"{name}-{n}.bin"))
+            for n, url in enumerate(urls)
+        )
+    )
+    elapsed = time.perf_counter() - started
+    # Последний замер — тот, что ждал конца заблокированного loop
+    await asyncio.sleep(TICK * 2)
+    ticker.cancel()
+    return {
+        "wall time, s": elapsed,
+        "loop lag p50, s": _env.percentile(samples, 0.5),
+        "loop lag p99, s": _env.percentile(samples, 0.99),
+        "loop lag max, s": max(samples),
+    }
+
+
+async def main(args):
+    source = tempfile.mkdtemp(prefix="bench-files-", dir=_env.VAULT)
+    target = tempfile.mkdtemp(prefix="bench-downloads-", dir=_env.VAULT)
+    chunk = os.urandom(1024 * 1024)
+    for n in range(args.files):
+        with open(os.path.join(source, f"{n}.bin"), "wb") as f:
+            for _ in range(args.size_mb):
+                f.write(chunk)
+
+    downloader = Downloader(max_concurrency=args.concurrency)
+
+    async def new_download(url: str, path: str):
+        await downloader.download_to_drive(File("id", "unique", file_path=url), path)
+
+    with _env.serve_directory(source) as base_url:
+        urls = [f"{base_url}/{n}.bin" for n in range(args.files)]
+        title = f"{args.files} файлов по {args.size_mb} МБ"
+        _env.report(
+            f"requests.get в корутине, {title}",
+            await _run("old", _old_download, urls, target),
+        )
+        _env.report(
+            f"Downloader, {title}, параллельно {args.concurrency}",
+            await _run("new", new_download, urls, target),
+        )
+    await downloader.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=8)
+    parser.add_argument("--size-mb", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=4)
+    asyncio.run(main(parser.parse_args()))
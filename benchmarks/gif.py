@@ -0,0 +1,140 @@
+"""Конвертация видео в GIF: время, пиковая память и размер, старый путь против нового.
+
+Образцы анимаций генерируются ffmpeg (testsrc2 и mandelbrot, 30 fps,
+по умолчанию 5 с). Каждая конвертация запускается в отдельном процессе,
+чтобы пиковый RSS не смешивался между прогонами: отдельно печатается
+память Python-процесса и дочерних процессов (ffmpeg, процессы пула).
+
+Старый путь — прежний mp4_to_gif из handlers/utils.py (moviepy, покадровый
+resize через PIL, write_gif с fps=80); без moviepy строка пропускается.
+Новый путь — media.mp4_to_gif с пресетами GIF_PRESETS.
+
+    python benchmarks/gif.py
+"""
+
+import _env  # noqa: F401  (должен импортироваться первым)
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from media import GIF_PRESETS, ffmpeg_executable
+
+SAMPLES = {
+    "testsrc2": "testsrc2=size=640x360:rate=30",
+    "mandelbrot": "mandelbrot=size=640x360:rate=30",
+}
+
+
+def _old_mp4_to_gif(input_path: str, output_path: str, fps: int = 80, scale=0.5):
+    # Прежняя реализация из handlers/utils.py без изменений
+    import numpy as np
+    from moviepy.editor import VideoFileClip
+    from PIL import Image
+
+    with VideoFileClip(input_path) as clip:
+        new_width = int(clip.w * scale)
+        new_height = int(clip.h * scale)
+
+        def resize_frame(frame):
+            pil_image = Image.fromarray(frame)
+            resized_image = pil_image.resize(
+                (new_width, new_height), Image.Resampling.LANCZOS
+            )
+            return np.array(resized_image)
+
+        resized_clip = clip.fl_image(resize_frame)
+        resized_clip.write_gif(output_path, fps=fps)
+
+
+def _convert(method: str, input_path: str, output_path: str):
+    """Одна конвертация в этом процессе, результат — JSON в stdout."""
+    started = time.perf_counter()
+    if method == "old":
+        _old_mp4_to_gif(input_path, output_path)
+    else:
+        from media import mp4_to_gif
+        from workers import media_pool
+
+        folder, filename = os.path.split(output_path)
+        asyncio.run(mp4_to_gif(input_path, filename, method, folder))
+        media_pool.shutdown()
+    elapsed = time.perf_counter() - started
+    # ru_maxrss в Linux — в килобайтах; у дочерних это максимум
+    # по ffmpeg и процессам пула
+    self_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    print(
+        json.dumps(
+            {
+                "wall time, s": elapsed,
+                "peak RSS python, MB": self_rss / 1024,
+                "peak RSS children, MB": children_rss / 1024,
+                "output size, KB": os.path.getsize(output_path) / 1024,
+            }
+        )
+    )
+
+
+def _run(method: str, input_path: str, folder: str) -> dict:
+    output_path = os.path.join(folder, f"{method}-{os.path.basename(input_path)}.gif")
+    result = subprocess.run(
+        [sys.executable, __file__, "--convert", method, input_path, output_path],
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        return {"error": result.stderr.strip().splitlines()[-1]}
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main(args):
+    folder = tempfile.mkdtemp(prefix="bench-gif-", dir=_env.VAULT)
+    try:
+        import moviepy  # noqa: F401
+
+        methods = ["old"]
+    except ImportError:
+        print("moviepy не установлен, старый путь пропущен")
+        methods = []
+    methods += list(GIF_PRESETS)
+
+    for name, source in SAMPLES.items():
+        input_path = os.path.join(folder, f"{name}.mp4")
+        subprocess.run(
+            [
+                ffmpeg_executable(),
+                "-v",
+                "error",
+                "-f",
+                "lavfi",
+                "-i",
+                source,
+                "-t",
+                str(args.seconds),
+                "-pix_fmt",
+                "yuv420p",
+                input_path,
+            ],
+            check=True,
+        )
+        for method in methods:
+            title = "прежний mp4_to_gif" if method == "old" else f"пресет {method}"
+            _env.report(
+                f"{name}, {args.seconds} с: {title}", _run(method, input_path, folder)
+            )
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--convert":
+        _convert(*sys.argv[2:5])
+    else:
+        parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+        parser.add_argument("--seconds", type=int, default=5)
+        main(parser.parse_args())
@@ -0,0 +1,123 @@
+"""Время преобразования разметки: прежний путь против markup.to_obsidian_markdown.
+
+Прежний handle_text брал message.text_markdown_v2 и прогонял его через
+пять re.sub в ensure_proper_code_blocks; новый путь обходит текст
+и сущности за один проход. Замер идёт на корпусе из tests/data и на
+случае "huge forwarded message", увеличенном в 1, 4 и 16 раз — время
+нового пути должно расти линейно. Медленный путь на больших размерах
+запускается меньше раз: замер одного размера ограничен пятью секундами.
+
+    python benchmarks/markup.py --runs 200
+"""
+
+import _env  # noqa: F401  (должен импортироваться первым)
+
+import argparse
+import json
+import os
+import re
+import time
+from datetime import datetime, timezone
+
+from telegram import Chat, Message, MessageEntity, User
+
+from markup import to_obsidian_markdown
+
+CORPUS = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    "..",
+    "tests",
+    "data",
+    "markup_corpus.json",
+)
+
+
+def ensure_proper_code_blocks(text: str) -> str:
+    # Прежняя реализация из handlers/utils.py без изменений
+    text = re.sub(r"\*(?!\s)([^\*]+)(?<!\s)\*", r"**\1**", text)
+    text = re.sub(r"_(?!\s)([^_]+)(?<!\s)_", r"*\1*", text)
+    text = re.sub(r"~([^~]+)~", r"~~\1~~", text)
+    text = re.sub(r"\\([.*>_`~()+-])", r"\1", text)
+    text = re.sub(
+        r"```([a-z]*)\n(.*?)(?<!\n)```", r"```\1\n\2\n```", text, flags=re.DOTALL
+    )
+    return text
+
+
+def _message(case: dict, scale: int = 1) -> Message:
+    """Сообщение из случая корпуса; repeat и scale повторяют фрагмент."""
+    repeat = case.get("repeat", 1) * scale
+    units = len(case["text"].encode("utf-16-le")) // 2
+    entities = []
+    for n in range(repeat):
+        for item in case["entities"]:
+            extra = {
+                key: value
+                for key, value in item.items()
+                if key not in ("type", "offset", "length", "user")
+            }
+            if "user" in item:
+                extra["user"] = User(item["user"], "Имя", False)
+            entities.append(
+                MessageEntity(
+                    item["type"], item["offset"] + units * n, item["length"], **extra
+                )
+            )
+    return Message(
+        1,
+        datetime.now(timezone.utc),
+        Chat(1, Chat.PRIVATE),
+        text=case["text"] * repeat,
+        entities=entities,
+    )
+
+
+def _best(func, runs: int, budget: float = 5.0) -> float:
+    """Лучшее время из runs запусков; медленный путь останавливается по budget."""
+    best = float("inf")
+    deadline = time.perf_counter() + budget
+    for run in range(runs):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+        if run >= 2 and time.perf_counter() > deadline:
+            break
+    return best
+
+
+def main(args):
+    with open(CORPUS, encoding="utf-8") as f:
+        cases = json.load(f)
+
+    def old(message):
+        return lambda: ensure_proper_code_blocks(message.text_markdown_v2)
+
+    def new(message):
+        return lambda: to_obsidian_markdown(message.text, message.entities)
+
+    small = [_message(case) for case in cases if "repeat" not in case]
+    _env.report(
+        f"корпус, {len(small)} сообщений, лучшее из {args.runs}",
+        {
+            "old total, s": _best(lambda: [old(m)() for m in small], args.runs),
+            "new total, s": _best(lambda: [new(m)() for m in small], args.runs),
+        },
+    )
+
+    huge = next(case for case in cases if case["name"] == "huge forwarded message")
+    for scale in (1, 4, 16):
+        message = _message(huge, scale)
+        _env.report(
+            f"huge forwarded message x{scale}: {len(message.text)} символов, "
+            f"{len(message.entities)} сущностей",
+            {
+                "old, s": _best(old(message), args.runs),
+                "new, s": _best(new(message), args.runs),
+            },
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=200)
+    main(parser.parse_args())
@@ -0,0 +1,135 @@
+"""Системные вызовы и пропускная способность на пачке пересланных сообщений.
+
+Каждое пересланное сообщение — блок из четырёх фрагментов: заголовок
+с датой, разделитель, текст, разделитель. Прежний append_to_note
+открывал файл и писал на каждый фрагмент; NoteWriter собирает блок
+в буфере и пишет его одним write в потоке записи; замер идёт без
+журнала и с журналом, который в боте включён по умолчанию.
+
+open считается через audit hook, write — по syscw из /proc/self/io
+(только Linux), fsync — обёрткой над os.fsync.
+
+    python benchmarks/note_writer.py --messages 2000
+"""
+
+import _env  # noqa: F401  (должен импортироваться первым)
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from telegram import Chat, Message, MessageOriginHiddenUser, Update, User
+
+from config import NOTES_FOLDER
+from handlers.utils import append_to_note, write_note_block
+from note_writer import note_writer
+from sessions import sessions
+
+counters = {"open": 0, "fsync": 0}
+
+
+def _audit(event: str, args):
+    if event == "open":
+        counters["open"] += 1
+
+
+def _counting_fsync(fd, _fsync=os.fsync):
+    counters["fsync"] += 1
+    _fsync(fd)
+
+
+def _write_syscalls() -> int:
+    with open("/proc/self/io") as f:
+        for line in f:
+            if line.startswith("syscw:"):
+                return int(line.split()[1])
+    return 0
+
+
+def _forwarded(update_id: int) -> Update:
+    message = Message(
+        update_id,
+        datetime.now(timezone.utc),
+        Chat(1, Chat.PRIVATE),
+        from_user=User(1, "bench", False),
+        forward_origin=MessageOriginHiddenUser(datetime.now(timezone.utc), "автор"),
+        text=f"пересланное сообщение {update_id} " * 8,
+    )
+    return Update(update_id, message=message)
+
+
+async def _old_path(note: str, updates: list):
+    def old_append(content: str):
+        # Прежний append_to_note: открыть, дописать, закрыть
+        with open(note, "a", encoding="utf-8") as f:
+            f.write(content + "\n")
+
+    for update in updates:
+        date = datetime.now().strftime("%d-%m-%Y %H:%M")
+        old_append(f"\n[{date}]:")
+        old_append("---\n")
+        old_append(update.message.text)
+        old_append("---\n")
+
+
+async def _new_path(note: str, updates: list):
+    async def write(update, context):
+        append_to_note(update.message.text)
+
+    context = SimpleNamespace(bot=None)
+    for update in updates:
+        await write_note_block(update, context, write)
+
+
+async def _measure(name: str, run, updates: list, fsync_mode: str) -> dict:
+    note = os.path.join(NOTES_FOLDER, f"burst-{name}.md")
+    sessions.get(1, 1).set_current_note_file(note)
+    note_writer.fsync_mode = fsync_mode
+    # Поток записи поднимается до замера
+    await note_writer.flush()
+
+    counters.update(open=0, fsync=0)
+    writes = _write_syscalls()
+    started = time.perf_counter()
+    await run(note, updates)
+    elapsed = time.perf_counter() - started
+    opens = counters["open"]
+    writes = _write_syscalls() - writes
+    return {
+        "messages/s": len(updates) / elapsed,
+        "open per message": opens / len(updates),
+        "write syscalls per message": writes / len(updates),
+        "fsync per message": counters["fsync"] / len(updates),
+    }
+
+
+async def main(args):
+    sys.addaudithook(_audit)
+    os.fsync = _counting_fsync
+    updates = [_forwarded(n) for n in range(args.messages)]
+    title = f"{args.messages} пересланных сообщений"
+    _env.report(
+        f"прежний append_to_note, {title}",
+        await _measure("old", _old_path, updates, "none"),
+    )
+    _env.report(
+        f"NoteWriter, NOTE_JOURNAL=false, NOTE_FSYNC=none, {title}",
+        await _measure("new-nojournal", _new_path, updates, "none"),
+    )
+    note_writer.open_journal()
+    for fsync_mode in ("none", "flush"):
+        _env.report(
+            f"NoteWriter, NOTE_JOURNAL=true, NOTE_FSYNC={fsync_mode}, {title}",
+            await _measure(f"new-{fsync_mode}", _new_path, updates, fsync_mode),
+        )
+    note_writer.close_journal()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=2000)
+    asyncio.run(main(parser.parse_args()))
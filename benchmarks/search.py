@@ -0,0 +1,99 @@
+"""Задержка /search на хранилище из 50 000 заметок.
+
+Заметки генерируются из небольшого словаря русских слов в разных формах,
+поэтому каждое слово встречается в тысячах заметок — худший случай для
+ранжирования. В каждой заметке есть и редкая метка (около 25 заметок на
+метку), как имена и названия в настоящем хранилище. Каталог строится
+с нуля (время сканирования и индексации печатается отдельно), затем
+запросы идут через NoteCatalog.search — тот же вызов, что в /search.
+
+    python benchmarks/search.py --notes 50000 --queries 500
+"""
+
+import _env  # noqa: F401  (должен импортироваться первым)
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from catalog import NoteCatalog
+
+WORDS = (
+    "заметка заметки заметкой встреча встречи встречами проект проекта проектов "
+    "задача задачи задачами отпуск отпуска путешествие путешествия книга книги "
+    "книгами рецепт рецепты рецептов идея идеи идеями покупка покупки покупками "
+    "работа работы работать работал ремонт ремонта дача дачи дачный машина машины "
+    "машиной сервер сервера серверов бот бота ботом телеграм телеграма музыка "
+    "музыки фильм фильмы фильмов город города городами море моря морем горы гор "
+    "тренировка тренировки тренировками бег бегать бегал врач врача здоровье "
+    "здоровья семья семьи семьёй друг друга друзья друзей праздник праздника"
+).split()
+
+
+def _generate(folder: str, notes: int, words_per_note: int):
+    rng = random.Random(1)
+    for n in range(notes):
+        body = " ".join(rng.choices(WORDS, k=words_per_note))
+        tag = f"метка{n % (notes // 25 or 1)}"
+        with open(os.path.join(folder, f"note-{n:06}.md"), "w", encoding="utf-8") as f:
+            f.write(f"Заметка {n}\n{body} {tag}\n")
+
+
+def main(args):
+    root = tempfile.mkdtemp(prefix="bench-search-", dir=_env.VAULT)
+    folder = os.path.join(root, "notes")
+    os.mkdir(folder)
+    results = {}
+    with _env.stopwatch(results, "generate vault, s"):
+        _generate(folder, args.notes, args.words)
+
+    catalog = NoteCatalog(os.path.join(root, "catalog.sqlite3"), folder)
+    with _env.stopwatch(results, "initial scan, s"):
+        catalog.open()
+    with _env.stopwatch(results, "full-text index, s"):
+        catalog.index_pending(batch_size=500)
+
+    rng = random.Random(2)
+    queries = [
+        " ".join(rng.choices(WORDS, k=rng.choice((1, 1, 2, 3))))
+        for _ in range(args.queries)
+    ]
+    latencies = []
+    for query in queries:
+        started = time.perf_counter()
+        catalog.search(query, 0, 11)
+        latencies.append(time.perf_counter() - started)
+    rare = []
+    for _ in range(args.queries):
+        query = f"метка{rng.randrange(args.notes // 25 or 1)} {rng.choice(WORDS)}"
+        started = time.perf_counter()
+        catalog.search(query, 0, 11)
+        rare.append(time.perf_counter() - started)
+    # Глубокие страницы: ранжирование по всему совпадению плюс OFFSET
+    deep = []
+    for query in queries[:50]:
+        started = time.perf_counter()
+        catalog.search(query, 200, 11)
+        deep.append(time.perf_counter() - started)
+    catalog.close()
+
+    results.update(
+        {
+            "common words p50, s": _env.percentile(latencies, 0.5),
+            "common words p99, s": _env.percentile(latencies, 0.99),
+            "common words page 20 p50, s": _env.percentile(deep, 0.5),
+            "rare tag p50, s": _env.percentile(rare, 0.5),
+            "rare tag p99, s": _env.percentile(rare, 0.99),
+        }
+    )
+    _env.report(f"/search, {args.notes} заметок, {args.queries} запросов", results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--notes", type=int, default=50000)
+    parser.add_argument("--words", type=int, default=80)
+    parser.add_argument("--queries", type=int, default=500)
+    main(parser.parse_args())
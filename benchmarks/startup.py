@@ -0,0 +1,125 @@
+"""Время от запуска python app/main.py до первого getUpdates.
+
+Бот запускается отдельным процессом с BOT_API_URL, указывающим на
+заглушку Bot API в этом процессе. Заглушка отвечает на все методы и
+запоминает момент первого getUpdates — с него бот начинает принимать
+сообщения. Отдельно меряется импорт модулей бота без запуска.
+
+    python benchmarks/startup.py --runs 5
+"""
+
+import _env  # noqa: F401  (должен импортироваться первым)
+
+import argparse
+import json
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")
+BOT_USER = {
+    "id": 1,
+    "is_bot": True,
+    "first_name": "bench",
+    "username": "bench_bot",
+    "can_join_groups": True,
+    "can_read_all_group_messages": False,
+    "supports_inline_queries": False,
+}
+
+
+class BotApiStub(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    first_poll = None
+    polled = threading.Event()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        method = self.path.rsplit("/", 1)[-1]
+        if method == "getUpdates":
+            if not self.polled.is_set():
+                BotApiStub.first_poll = time.perf_counter()
+                self.polled.set()
+            time.sleep(0.2)  # Длинный опрос без обновлений
+            result = []
+        elif method == "getMe":
+            result = BOT_USER
+        else:
+            result = True
+        body = json.dumps({"ok": True, "result": result}).encode()
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except ConnectionError:
+            pass  # Бот остановлен посреди длинного опроса
+
+    def log_message(self, *args):
+        pass
+
+
+def _first_poll(bot_api_url: str) -> float:
+    BotApiStub.first_poll = None
+    BotApiStub.polled.clear()
+    env = dict(os.environ, BOT_API_URL=bot_api_url, BOT_MODE="polling")
+    started = time.perf_counter()
+    bot = subprocess.Popen(
+        [sys.executable, os.path.join(APP, "main.py")],
+        cwd=_env.VAULT,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        if not BotApiStub.polled.wait(120):
+            raise RuntimeError("бот не дошёл до getUpdates")
+        return BotApiStub.first_poll - started
+    finally:
+        bot.send_signal(signal.SIGINT)
+        try:
+            bot.wait(30)
+        except subprocess.TimeoutExpired:
+            bot.kill()
+
+
+def _import_time() -> float:
+    started = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "-c", "import main"],
+        cwd=_env.VAULT,
+        env=dict(os.environ, PYTHONPATH=APP),
+        check=True,
+    )
+    return time.perf_counter() - started
+
+
+def main(args):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), BotApiStub)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    bot_api_url = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        polls = [_first_poll(bot_api_url) for _ in range(args.runs)]
+        imports = [_import_time() for _ in range(args.runs)]
+    finally:
+        server.shutdown()
+    _env.report(
+        f"запуск бота, {args.runs} прогонов",
+        {
+            "import main, median, s": statistics.median(imports),
+            "first getUpdates, median, s": statistics.median(polls),
+            "first getUpdates, max, s": max(polls),
+        },
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    main(parser.parse_args())
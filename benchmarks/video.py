@@ -0,0 +1,158 @@
+"""Пиковая память бота при загрузке и перекодировании видео на 20 МБ.
+
+Видео генерируется ffmpeg и раздаётся по HTTP из отдельного потока.
+Каждый путь запускается в отдельном процессе:
+
+- old: прежний handle_video — requests.get(...).content, файл целиком
+  в памяти, затем запись на диск;
+- new: Downloader.download_to_drive пишет файл на диск потоком, затем
+  VideoTranscoder делает превью и перекодированную копию через media_pool.
+
+Прирост RSS считается от пика после импортов, отдельно печатается пик
+дочерних процессов (ffmpeg, процессы пула).
+
+    python benchmarks/video.py --size-mb 20
+"""
+
+import _env  # noqa: F401  (должен импортироваться первым)
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("VIDEO_TRANSCODE", "true")
+
+from media import ffmpeg_executable  # noqa: E402
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss в Linux — в килобайтах
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _old_path(url: str, folder: str, results: dict):
+    import requests
+
+    path = os.path.join(folder, "old.mp4")
+    with _env.stopwatch(results, "download, s"):
+        # Прежний код обработчика: весь ответ в памяти
+        response = requests.get(url)
+        with open(path, "wb") as f:
+            f.write(response.content)
+
+
+async def _new_path(url: str, folder: str, duration: int, results: dict):
+    from telegram import File
+
+    from downloads import downloader
+    from media_store import media_store
+    from video_jobs import TranscodeJob, _embed, video_transcoder
+    from workers import media_pool
+
+    media_store.open()
+    path = os.path.join(folder, "new.mp4")
+    with _env.stopwatch(results, "download, s"):
+        await downloader.download_to_drive(File("id", "unique", file_path=url), path)
+    results["peak RSS after download, MB"] = _peak_rss_mb()
+
+    name = await media_store.register("unique", path)
+    note_path = os.path.join(folder, "note.md")
+    with open(note_path, "w", encoding="utf-8") as f:
+        f.write(_embed(name) + "\n")
+    job = TranscodeJob("unique", note_path, duration)
+    with _env.stopwatch(results, "poster + transcode, s"):
+        await video_transcoder._transcode(job)
+    results["output size, MB"] = (
+        os.path.getsize(media_store.path_for("unique")) / 1024 / 1024
+    )
+    await downloader.close()
+    media_pool.shutdown()
+    media_store.close()
+
+
+def _measure(method: str, url: str, folder: str, duration: str):
+    """Один путь в этом процессе, результат — JSON в stdout."""
+    results = {"peak RSS after imports, MB": _peak_rss_mb()}
+    if method == "old":
+        _old_path(url, folder, results)
+    else:
+        asyncio.run(_new_path(url, folder, int(duration), results))
+    results["peak RSS, MB"] = _peak_rss_mb()
+    results["peak RSS growth, MB"] = (
+        results["peak RSS, MB"] - results["peak RSS after imports, MB"]
+    )
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    results["peak RSS children, MB"] = children
+    print(json.dumps(results))
+
+
+def main(args):
+    folder = tempfile.mkdtemp(prefix="bench-video-", dir=_env.VAULT)
+    source = os.path.join(folder, "source.mp4")
+    # Шум не даёт x264 сжать картинку сильнее заданного битрейта,
+    # поэтому файл выходит около size_mb
+    subprocess.run(
+        [
+            ffmpeg_executable(),
+            "-v",
+            "error",
+            "-f",
+            "lavfi",
+            "-i",
+            "testsrc2=size=1280x720:rate=30,noise=alls=20:allf=t",
+            "-t",
+            str(args.seconds),
+            "-c:v",
+            "libx264",
+            "-b:v",
+            f"{args.size_mb * 8 * 1024 // args.seconds}k",
+            "-pix_fmt",
+            "yuv420p",
+            source,
+        ],
+        check=True,
+    )
+    size_mb = os.path.getsize(source) / 1024 / 1024
+
+    with _env.serve_directory(folder) as base_url:
+        for method in ("old", "new"):
+            result = subprocess.run(
+                [
+                    sys.executable,
+                    __file__,
+                    "--measure",
+                    method,
+                    f"{base_url}/source.mp4",
+                    tempfile.mkdtemp(dir=folder),
+                    str(args.seconds),
+                ],
+                capture_output=True,
+                text=True,
+            )
+            if result.returncode != 0:
+                print(result.stderr)
+                continue
+            if method == "old":
+                title = "прежний handle_video"
+            else:
+                title = "загрузчик + перекодирование"
+            _env.report(
+                f"{title}, видео {size_mb:.1f} МБ",
+                json.loads(result.stdout.strip().splitlines()[-1]),
+            )
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--measure":
+        _measure(*sys.argv[2:6])
+    else:
+        parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+        parser.add_argument("--size-mb", type=int, default=20)
+        parser.add_argument("--seconds", type=int, default=10)
+        main(parser.parse_args())
@@ -0,0 +1,130 @@
+"""Задержка и пропускная способность вебхука от HTTP-запроса до записи в заметку.
+
+Клиенты держат keep-alive соединения и шлют синтетические обновления,
+сервер кладёт их в очередь, OrderedUpdateProcessor прогоняет каждое через
+write_note_block. Задержка — от отправки запроса до конца обработчика.
+
+    python benchmarks/webhook.py --updates 5000 --connections 16 --chats 50
+"""
+
+import _env  # noqa: F401  (должен импортироваться первым)
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from types import SimpleNamespace
+
+from config import NOTES_FOLDER
+from handlers.utils import append_to_note, write_note_block
+from sessions import sessions
+from update_processor import OrderedUpdateProcessor
+from webhook import WebhookServer
+
+PATH = "/telegram"
+
+
+def _body(update_id: int, chat_id: int) -> bytes:
+    return json.dumps(
+        {
+            "update_id": update_id,
+            "message": {
+                "message_id": update_id,
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "from": {"id": chat_id, "is_bot": False, "first_name": "bench"},
+                "text": f"сообщение {update_id}",
+            },
+        }
+    ).encode()
+
+
+async def _client(port: int, updates: list, sent: dict):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    for update_id, chat_id in updates:
+        body = _body(update_id, chat_id)
+        sent[update_id] = time.perf_counter()
+        writer.write(
+            f"POST {PATH} HTTP/1.1\r\nHost: bench\r\n"
+            f"Content-Length: {len(body)}\r\n\r\n".encode()
+            + body
+        )
+        await writer.drain()
+        while (line := await reader.readline()) != b"\r\n":
+            if line.lower().startswith(b"content-length:"):
+                length = int(line.split(b":")[1])
+        await reader.readexactly(length)
+    writer.close()
+
+
+async def main(args):
+    for chat_id in range(args.chats):
+        note = os.path.join(NOTES_FOLDER, f"bench-{chat_id}.md")
+        sessions.get(chat_id, chat_id).set_current_note_file(note)
+
+    done = {}
+    context = SimpleNamespace(bot=None)
+
+    async def handle(update):
+        async def write(update, context):
+            append_to_note(update.message.text)
+
+        await write_note_block(update, context, write)
+        done[update.update_id] = time.perf_counter()
+
+    application = SimpleNamespace(update_queue=asyncio.Queue(), bot=None)
+    processor = OrderedUpdateProcessor(args.concurrency, 4)
+    server = WebhookServer(application, "127.0.0.1", 0, PATH)
+    await server.start()
+    port = server._server.sockets[0].getsockname()[1]
+
+    tasks = set()
+
+    async def consume():
+        # Как Application: забирает обновления из очереди и не ждёт обработки
+        while True:
+            update = await application.update_queue.get()
+            task = asyncio.create_task(
+                processor.process_update(update, handle(update))
+            )
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+    consumer = asyncio.create_task(consume())
+    updates = [(i, i % args.chats) for i in range(1, args.updates + 1)]
+    sent = {}
+    started = time.perf_counter()
+    await asyncio.gather(
+        *(
+            _client(port, updates[n :: args.connections], sent)
+            for n in range(args.connections)
+        )
+    )
+    while len(done) < len(updates):
+        await asyncio.sleep(0.01)
+    elapsed = time.perf_counter() - started
+    consumer.cancel()
+    await server.stop()
+
+    latencies = [done[i] - sent[i] for i, _ in updates]
+    _env.report(
+        f"webhook: {args.updates} обновлений, {args.connections} соединений, "
+        f"{args.chats} чатов",
+        {
+            "throughput, updates/s": len(updates) / elapsed,
+            "latency p50, s": _env.percentile(latencies, 0.5),
+            "latency p95, s": _env.percentile(latencies, 0.95),
+            "latency p99, s": _env.percentile(latencies, 0.99),
+            "latency max, s": max(latencies),
+        },
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--updates", type=int, default=5000)
+    parser.add_argument("--connections", type=int, default=16)
+    parser.add_argument("--chats", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=32)
+    asyncio.run(main(parser.parse_args()))
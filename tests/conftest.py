@@ -0,0 +1,23 @@
+import logging
+import os
+import sys
+import tempfile
+
+# config.py читает окружение и создаёт папки при импорте, поэтому
+# хранилище для тестов настраивается до импорта модулей бота
+_vault = tempfile.mkdtemp(prefix="obsidian-bot-tests-")
+for name, folder in {
+    "OBSIDIAN_VAULT_PATH": "",
+    "NOTES_FOLDER": "notes",
+    "TEMP_FOLDER": "temp",
+    "AUDIO_TEMP_FOLDER": "audio",
+    "ATTACH_FOLDER": "attachments",
+}.items():
+    os.environ.setdefault(name, os.path.join(_vault, folder))
+os.environ.setdefault("TELEGRAM_TOKEN", "123:test")
+os.environ.setdefault("WHISPER_WARMUP", "false")
+# С уже настроенным корневым логгером config.py не создаёт bot.log
+logging.getLogger().addHandler(logging.NullHandler())
+
+_tests = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(_tests, "..", "app"))
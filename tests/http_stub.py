@@ -0,0 +1,45 @@
+import asyncio
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+
+class StubServer:
+    """Локальный HTTP-сервер вместо внешних сервисов в тестах.
+
+    respond(path, query) возвращает (статус, тело ответа); query —
+    словарь параметров запроса. Каждый запрос записывается в requests.
+    """
+
+    def __init__(self, respond):
+        self.respond = respond
+        self.requests = []
+        self._server = None
+
+    async def __aenter__(self):
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        return self
+
+    async def __aexit__(self, *exc):
+        self._server.close()
+        await self._server.wait_closed()
+
+    def url(self, path: str = "") -> str:
+        host, port = self._server.sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}{path}"
+
+    async def _handle(self, reader, writer):
+        request_line = await reader.readline()
+        while (await reader.readline()) not in (b"\r\n", b""):
+            pass
+        target = urlsplit(request_line.split()[1].decode())
+        self.requests.append(target.path)
+        query = {key: values[0] for key, values in parse_qs(target.query).items()}
+        status, body = self.respond(target.path, query)
+        status = HTTPStatus(status)
+        writer.write(
+            f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode()
+            + body
+        )
+        await writer.drain()
+        writer.close()
@@ -0,0 +1,9 @@
+import time
+
+# Функции для процессов пула лежат отдельно от тестов: процесс пула
+# импортирует этот модуль без config.py, который создаёт bot.log
+
+
+def sleep(seconds: float) -> float:
+    time.sleep(seconds)
+    return seconds
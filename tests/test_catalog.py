@@ -0,0 +1,100 @@
+import contextlib
+import os
+
+from catalog import NoteCatalog
+
+
+def _catalog(tmp_path):
+    notes = tmp_path / "notes"
+    notes.mkdir()
+    catalog = NoteCatalog(str(tmp_path / "catalog.sqlite3"), str(notes))
+    catalog.open()
+    return catalog, notes
+
+
+def test_sync_tracks_added_changed_and_removed_notes(tmp_path):
+    catalog, notes = _catalog(tmp_path)
+    (notes / "a.md").write_text("\nПервая строка\nвторая\n", encoding="utf-8")
+    (notes / "b.md").write_text("b\n", encoding="utf-8")
+    (notes / "skip.txt").write_text("не заметка\n", encoding="utf-8")
+
+    assert catalog.sync() == 2
+    assert catalog.sync() == 0
+    assert catalog.count() == 2
+
+    (notes / "b.md").write_text("b изменена\n", encoding="utf-8")
+    (notes / "a.md").unlink()
+    assert catalog.sync() == 2
+    assert [filename for _, filename, _ in catalog.page("n", 0, 10)] == ["b.md"]
+    catalog.close()
+
+
+def test_refresh_notes_reads_first_line_and_drops_deleted(tmp_path):
+    catalog, notes = _catalog(tmp_path)
+    note = notes / "a.md"
+    note.write_text("Заголовок\n", encoding="utf-8")
+
+    catalog.refresh_notes([str(note)])
+    note_id = catalog.get_id(str(note))
+    assert catalog.get_filename(note_id) == "a.md"
+    first_line = catalog._conn.execute(
+        "SELECT first_line FROM notes WHERE id = ?", (note_id,)
+    ).fetchone()[0]
+    assert first_line == "Заголовок"
+
+    note.unlink()
+    catalog.refresh_notes([str(note)])
+    assert catalog.count() == 0
+    catalog.close()
+
+
+def test_sync_keeps_note_registered_during_scan(tmp_path, monkeypatch):
+    catalog, notes = _catalog(tmp_path)
+    note = notes / "new.md"
+    scandir = os.scandir
+
+    def scandir_then_create(path):
+        with scandir(path) as iterator:
+            entries = list(iterator)
+        # Бот создаёт заметку и получает её ID, пока идёт сканирование
+        note.write_text("новая\n", encoding="utf-8")
+        ids.append(catalog.get_id(str(note)))
+        return contextlib.nullcontext(entries)
+
+    ids = []
+    monkeypatch.setattr(os, "scandir", scandir_then_create)
+    catalog.sync()
+    monkeypatch.undo()
+
+    # Запись не удалена, ID из callback-данных остаётся действительным
+    assert catalog.get_filename(ids[0]) == "new.md"
+    catalog.sync()
+    assert catalog.get_filename(ids[0]) == "new.md"
+    catalog.close()
+
+
+def test_page_after_walks_pages_like_offset(tmp_path):
+    catalog, notes = _catalog(tmp_path)
+    for number in range(7):
+        note = notes / f"{number}.md"
+        note.write_text("x\n", encoding="utf-8")
+        # Одинаковые mtime у пар заметок: порядок между ними задаёт id
+        os.utime(note, (1000 + number // 2, 1000 + number // 2))
+    catalog.sync()
+
+    for sort in ("m", "n"):
+        expected = catalog.page(sort, 0, 10)
+        pages = [catalog.page(sort, 0, 3)]
+        while True:
+            last_id, filename, mtime = pages[-1][-1]
+            key = mtime if sort == "m" else filename
+            next_page = catalog.page_after(sort, (key, last_id), 3)
+            if not next_page:
+                break
+            pages.append(next_page)
+        assert [row for page in pages for row in page] == expected
+
+        first_id, filename, mtime = pages[-1][0]
+        key = mtime if sort == "m" else filename
+        assert catalog.page_after(sort, (key, first_id), 3, backward=True) == pages[-2]
+    catalog.close()
@@ -0,0 +1,98 @@
+import asyncio
+import os
+
+import httpx
+import pytest
+from telegram import File
+
+from downloads import Downloader
+from http_stub import StubServer
+
+BODY = os.urandom(200_000)
+
+
+def _file_server():
+    failures = {"/flaky": 2}
+
+    def respond(path: str, query: dict) -> tuple:
+        if failures.get(path):
+            failures[path] -= 1
+            return 500, b""
+        if path in ("/file", "/flaky"):
+            return 200, BODY
+        return 404, b""
+
+    return StubServer(respond)
+
+
+def _file(path: str) -> File:
+    return File("file-id", "unique-id", file_path=path)
+
+
+def test_download_to_drive_streams_file(tmp_path):
+    async def scenario():
+        downloader = Downloader(backoff=0)
+        async with _file_server() as server:
+            target = str(tmp_path / "file.bin")
+            size = await downloader.download_to_drive(
+                _file(server.url("/file")), target
+            )
+            content = await downloader.download_to_memory(_file(server.url("/file")))
+        await downloader.close()
+        return target, size, content
+
+    target, size, content = asyncio.run(scenario())
+    assert size == len(BODY)
+    assert content == BODY
+    with open(target, "rb") as f:
+        assert f.read() == BODY
+    assert not os.path.exists(target + ".part")
+
+
+def test_server_errors_are_retried(tmp_path):
+    async def scenario():
+        downloader = Downloader(retries=3, backoff=0)
+        async with _file_server() as server:
+            target = str(tmp_path / "file.bin")
+            await downloader.download_to_drive(_file(server.url("/flaky")), target)
+        await downloader.close()
+        return server.requests
+
+    assert asyncio.run(scenario()) == ["/flaky"] * 3
+
+
+def test_client_errors_are_not_retried(tmp_path):
+    async def scenario():
+        downloader = Downloader(retries=3, backoff=0)
+        async with _file_server() as server:
+            target = str(tmp_path / "file.bin")
+            try:
+                with pytest.raises(httpx.HTTPStatusError):
+                    await downloader.download_to_drive(
+                        _file(server.url("/missing")), target
+                    )
+            finally:
+                await downloader.close()
+        return server.requests, target
+
+    requests, target = asyncio.run(scenario())
+    assert requests == ["/missing"]
+    assert not os.path.exists(target) and not os.path.exists(target + ".part")
+
+
+def test_local_mode_links_file_without_http(tmp_path):
+    source = tmp_path / "server" / "photo.jpg"
+    source.parent.mkdir()
+    source.write_bytes(BODY)
+    target = str(tmp_path / "photo.jpg")
+
+    async def scenario():
+        downloader = Downloader()
+        size = await downloader.download_to_drive(_file(str(source)), target)
+        content = await downloader.download_to_memory(_file(str(source)))
+        return size, content
+
+    size, content = asyncio.run(scenario())
+    assert size == len(BODY) and content == BODY
+    # Жёсткая ссылка: файл сервера и вложение — один inode
+    assert os.stat(target).st_ino == os.stat(source).st_ino
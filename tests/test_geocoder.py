@@ -0,0 +1,93 @@
+import asyncio
+import json
+
+import geocoder as geocoder_module
+from geocoder import Geocoder, format_coordinates
+from http_stub import StubServer
+
+
+def _nominatim():
+    def respond(path: str, query: dict) -> tuple:
+        latitude = float(query["lat"])
+        if latitude >= 80:
+            return 500, b""
+        if latitude >= 60:
+            # Ответ без адреса, например над морем
+            return 200, json.dumps({"error": "Unable to geocode"}).encode()
+        return 200, json.dumps({"display_name": f"Адрес {query['lat']}"}).encode()
+
+    return StubServer(respond)
+
+
+def _run(tmp_path, monkeypatch, scenario, ttl: float = 3600, max_entries: int = 100):
+    monkeypatch.setattr(geocoder_module, "MIN_REQUEST_INTERVAL", 0)
+
+    async def run():
+        async with _nominatim() as server:
+            geocoder = Geocoder(
+                str(tmp_path / "geocode.sqlite3"),
+                base_url=server.url(),
+                ttl=ttl,
+                max_entries=max_entries,
+                timeout=5,
+            )
+            geocoder.open()
+            try:
+                result = await scenario(geocoder)
+            finally:
+                await geocoder.close()
+        return result, server.requests
+
+    return asyncio.run(run())
+
+
+def test_repeated_location_is_served_from_cache(tmp_path, monkeypatch):
+    async def scenario(geocoder):
+        first = await geocoder.reverse(55.75, 37.61)
+        # Координаты в пределах ~10 м попадают в ту же запись
+        second = await geocoder.reverse(55.750001, 37.610001)
+        return first, second
+
+    (first, second), requests = _run(tmp_path, monkeypatch, scenario)
+    assert first == second == "Адрес 55.75"
+    assert requests == ["/reverse"]
+
+
+def test_expired_entry_is_requested_again(tmp_path, monkeypatch):
+    async def scenario(geocoder):
+        await geocoder.reverse(55.75, 37.61)
+        await asyncio.sleep(0.1)
+        return await geocoder.reverse(55.75, 37.61)
+
+    address, requests = _run(tmp_path, monkeypatch, scenario, ttl=0.05)
+    assert address == "Адрес 55.75"
+    assert len(requests) == 2
+
+
+def test_missing_address_is_not_cached(tmp_path, monkeypatch):
+    async def scenario(geocoder):
+        return [await geocoder.reverse(65.0, 20.0) for _ in range(2)]
+
+    addresses, requests = _run(tmp_path, monkeypatch, scenario)
+    assert addresses == [format_coordinates(65.0, 20.0)] * 2
+    assert len(requests) == 2
+
+
+def test_server_error_falls_back_to_coordinates(tmp_path, monkeypatch):
+    async def scenario(geocoder):
+        return await geocoder.reverse(85.0, 10.0)
+
+    address, _ = _run(tmp_path, monkeypatch, scenario)
+    assert address == format_coordinates(85.0, 10.0)
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, monkeypatch):
+    async def scenario(geocoder):
+        for latitude in (10.0, 11.0, 12.0):
+            await geocoder.reverse(latitude, 0.0)
+        # 10.0 вытеснена, 12.0 осталась в кэше
+        await geocoder.reverse(12.0, 0.0)
+        await geocoder.reverse(10.0, 0.0)
+
+    _, requests = _run(tmp_path, monkeypatch, scenario, max_entries=2)
+    assert len(requests) == 4
@@ -0,0 +1,98 @@
+import json
+import os
+
+from journal import Journal
+
+
+def _write_journal(path: str, records: list):
+    with open(path, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def _append(seq: int, note_path: str, offset: int, data: str) -> dict:
+    return {
+        "seq": seq,
+        "op": "append",
+        "path": note_path,
+        "offset": offset,
+        "data": data,
+    }
+
+
+def test_replay_applies_missing_append(tmp_path):
+    note = tmp_path / "note.md"
+    note.write_text("start\n", encoding="utf-8")
+    journal_path = str(tmp_path / "notes.journal")
+    _write_journal(journal_path, [_append(1, str(note), 6, "строка\n")])
+
+    assert Journal(journal_path).replay() == 1
+    assert note.read_text(encoding="utf-8") == "start\nстрока\n"
+    assert os.path.getsize(journal_path) == 0
+
+
+def test_replay_truncates_partial_append(tmp_path):
+    note = tmp_path / "note.md"
+    note.write_bytes(b"start\nA1\nB")
+    journal_path = str(tmp_path / "notes.journal")
+    _write_journal(journal_path, [_append(1, str(note), 6, "A1\nB1\n")])
+
+    Journal(journal_path).replay()
+    assert note.read_bytes() == b"start\nA1\nB1\n"
+
+
+def test_replay_skips_records_already_applied(tmp_path):
+    # Несколько незафиксированных записей одной заметки уже на диске
+    note = tmp_path / "note.md"
+    note.write_text("start\nA1\nB1\nB2\n", encoding="utf-8")
+    journal_path = str(tmp_path / "notes.journal")
+    _write_journal(
+        journal_path,
+        [
+            _append(1, str(note), 6, "A1\n"),
+            _append(2, str(note), 9, "B1\n"),
+            _append(3, str(note), 12, "B2\n"),
+        ],
+    )
+
+    assert Journal(journal_path).replay() == 3
+    assert note.read_text(encoding="utf-8") == "start\nA1\nB1\nB2\n"
+
+
+def test_replay_finishes_after_partial_last_record(tmp_path):
+    note = tmp_path / "note.md"
+    note.write_bytes(b"start\nA1\nB")
+    journal_path = str(tmp_path / "notes.journal")
+    _write_journal(
+        journal_path,
+        [
+            _append(1, str(note), 6, "A1\n"),
+            _append(2, str(note), 9, "B1\n"),
+            {"seq": 1, "op": "commit"},
+        ],
+    )
+
+    assert Journal(journal_path).replay() == 1
+    assert note.read_bytes() == b"start\nA1\nB1\n"
+
+
+def test_replay_appends_when_note_changed_externally(tmp_path):
+    note = tmp_path / "note.md"
+    note.write_text("start\nправка из Obsidian\n", encoding="utf-8")
+    journal_path = str(tmp_path / "notes.journal")
+    _write_journal(journal_path, [_append(1, str(note), 6, "A1\n")])
+
+    Journal(journal_path).replay()
+    assert note.read_text(encoding="utf-8") == "start\nправка из Obsidian\nA1\n"
+
+
+def test_replay_ignores_torn_last_line(tmp_path):
+    note = tmp_path / "note.md"
+    note.write_text("start\n", encoding="utf-8")
+    journal_path = str(tmp_path / "notes.journal")
+    _write_journal(journal_path, [_append(1, str(note), 6, "A1\n")])
+    with open(journal_path, "a", encoding="utf-8") as f:
+        f.write('{"seq": 2, "op": "app')
+
+    assert Journal(journal_path).replay() == 1
+    assert note.read_text(encoding="utf-8") == "start\nA1\n"
@@ -0,0 +1,109 @@
+import asyncio
+import re
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from telegram import Chat, Document, Message, Update, User
+
+from handlers.utils import append_to_note, write_note_block
+from sessions import sessions
+from update_processor import OrderedUpdateProcessor
+
+USERS = 24
+MESSAGES = 8
+# Последние пользователи пишут в одну общую заметку из своих чатов
+SHARED_USERS = 2
+DOWNLOAD_SECONDS = 0.02
+
+
+class FakeBot:
+    def __init__(self):
+        self.reactions = 0
+
+    async def set_message_reaction(self, **kwargs):
+        self.reactions += 1
+
+
+def _update(update_id: int, user_id: int, index: int) -> Update:
+    extra = {}
+    if index % 3 == 0:
+        # Каждое третье сообщение — файл: идёт под лимитом тяжёлых обновлений
+        extra["document"] = Document(f"file-{update_id}", f"unique-{update_id}")
+    message = Message(
+        update_id,
+        datetime.now(timezone.utc),
+        Chat(user_id, Chat.PRIVATE),
+        from_user=User(user_id, f"user{user_id}", False),
+        text=f"{user_id}:{index}",
+        **extra,
+    )
+    return Update(update_id, message=message)
+
+
+async def _handle(update: Update, context):
+    user_id, index = update.message.text.split(":")
+
+    async def write(update: Update, context):
+        append_to_note(f"user{user_id} msg{index} begin")
+        # Загрузка файла или другая работа посреди записи блока
+        await asyncio.sleep(DOWNLOAD_SECONDS)
+        append_to_note(f"user{user_id} msg{index} end")
+
+    await write_note_block(update, context, write)
+
+
+def test_concurrent_users_keep_notes_consistent(tmp_path):
+    shared_note = str(tmp_path / "shared.md")
+    notes = {}
+    for user_id in range(USERS):
+        shared = user_id >= USERS - SHARED_USERS
+        note_path = shared_note if shared else str(tmp_path / f"user{user_id}.md")
+        sessions.get(user_id, user_id).set_current_note_file(note_path)
+        notes[user_id] = note_path
+
+    bot = FakeBot()
+    context = SimpleNamespace(bot=bot)
+
+    async def scenario():
+        processor = OrderedUpdateProcessor(32, 4)
+        updates = [
+            _update(index * USERS + user_id, user_id, index)
+            for index in range(MESSAGES)
+            for user_id in range(USERS)
+        ]
+        started = time.perf_counter()
+        await asyncio.gather(
+            *(
+                processor.process_update(update, _handle(update, context))
+                for update in updates
+            )
+        )
+        elapsed = time.perf_counter() - started
+        # Фоновые реакции успевают отправиться
+        await asyncio.sleep(0.05)
+        return elapsed
+
+    elapsed = asyncio.run(scenario())
+
+    total = USERS * MESSAGES
+    serial = total * DOWNLOAD_SECONDS
+    # Разные чаты обрабатываются параллельно: в разы быстрее, чем по очереди
+    assert elapsed < serial / 4, f"{total / elapsed:.0f} сообщений/с"
+    assert bot.reactions == total
+
+    blocks = {}
+    for note_path in set(notes.values()):
+        with open(note_path, encoding="utf-8") as f:
+            lines = [line for line in f.read().splitlines() if line]
+        # Блок — заголовок с датой, затем begin и end одного сообщения подряд
+        assert len(lines) % 3 == 0
+        for header, begin, end in zip(lines[::3], lines[1::3], lines[2::3]):
+            assert re.fullmatch(r"\[\d{2}-\d{2}-\d{4} \d{2}:\d{2}\]:", header)
+            user, index, _ = begin.split()
+            assert end == f"{user} {index} end"
+            blocks.setdefault(user, []).append(int(index.removeprefix("msg")))
+
+    # Ни одно сообщение не потеряно, порядок внутри чата сохранён
+    assert len(blocks) == USERS
+    assert all(indexes == list(range(MESSAGES)) for indexes in blocks.values())
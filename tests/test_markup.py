@@ -0,0 +1,79 @@
+import json
+import os
+
+import pytest
+from telegram import MessageEntity, User
+
+from markup import to_obsidian_markdown
+
+CORPUS = os.path.join(os.path.dirname(__file__), "data", "markup_corpus.json")
+
+
+def _entities(raw: list) -> list:
+    entities = []
+    for item in raw:
+        extra = {
+            key: value
+            for key, value in item.items()
+            if key not in ("type", "offset", "length", "user")
+        }
+        if "user" in item:
+            extra["user"] = User(item["user"], "Имя", False)
+        entities.append(
+            MessageEntity(item["type"], item["offset"], item["length"], **extra)
+        )
+    return entities
+
+
+def _expand(case: dict) -> tuple:
+    """Текст, сущности и ожидаемый результат; repeat повторяет фрагмент подряд."""
+    repeat = case.get("repeat", 1)
+    # Смещения следующего повтора сдвигаются на длину фрагмента в UTF-16
+    units = len(case["text"].encode("utf-16-le")) // 2
+    raw = [
+        dict(item, offset=item["offset"] + units * n)
+        for n in range(repeat)
+        for item in case["entities"]
+    ]
+    return case["text"] * repeat, _entities(raw), case["expected"] * repeat
+
+
+with open(CORPUS, encoding="utf-8") as f:
+    _CASES = json.load(f)
+
+
+@pytest.mark.parametrize("case", _CASES, ids=[case["name"] for case in _CASES])
+def test_golden_corpus(case):
+    text, entities, expected = _expand(case)
+    assert to_obsidian_markdown(text, entities) == expected
+
+
+def test_text_without_entities_is_unchanged():
+    assert to_obsidian_markdown("*не разметка*", []) == "*не разметка*"
+    assert to_obsidian_markdown(None, None) == ""
+
+
+def test_utf16_offsets_after_astral_characters():
+    # 😀 занимает две кодовые единицы UTF-16, смещение считается по ним
+    text = "😀😀 жирный"
+    entity = MessageEntity(MessageEntity.BOLD, 5, 6)
+    assert to_obsidian_markdown(text, [entity]) == "😀😀 **жирный**"
+
+
+def test_entity_order_in_input_does_not_matter():
+    text = "жирный курсив"
+    entities = [
+        MessageEntity(MessageEntity.ITALIC, 7, 6),
+        MessageEntity(MessageEntity.BOLD, 0, 13),
+    ]
+    assert to_obsidian_markdown(text, entities) == "**жирный *курсив***"
+
+
+def test_overlapping_entity_is_clipped_to_outer():
+    # Telegram не присылает частично пересекающиеся сущности, но и
+    # на таких данных результат остаётся корректной разметкой
+    entities = [
+        MessageEntity(MessageEntity.BOLD, 0, 4),
+        MessageEntity(MessageEntity.ITALIC, 2, 4),
+    ]
+    assert to_obsidian_markdown("abcdef", entities) == "**ab*cd***ef"
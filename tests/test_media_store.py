@@ -0,0 +1,73 @@
+import asyncio
+import json
+import os
+
+import media_store as media_store_module
+from media_store import MediaStore, _referenced_names
+
+
+def test_referenced_names_covers_all_link_forms(tmp_path):
+    (tmp_path / "note.md").write_text(
+        "![[wiki.gif|600]] [[doc.pdf#^block]]\n"
+        "![](attachments/photo%20one.jpg) [файл](<attachments/my file.pdf>)\n"
+        '[видео](clip.mp4 "Название") [](image.png#frag)\n',
+        encoding="utf-8",
+    )
+    (tmp_path / "board.canvas").write_text(
+        json.dumps(
+            {
+                "nodes": [
+                    {"id": "1", "type": "file", "file": "attachments/board.png"},
+                    {"id": "2", "type": "text", "text": "![[card.gif]]"},
+                ],
+                "edges": [],
+            }
+        ),
+        encoding="utf-8",
+    )
+    hidden = tmp_path / ".trash"
+    hidden.mkdir()
+    (hidden / "old.md").write_text("![[trashed.gif]]", encoding="utf-8")
+
+    assert _referenced_names(str(tmp_path)) >= {
+        "wiki.gif",
+        "doc.pdf",
+        "photo one.jpg",
+        "my file.pdf",
+        "clip.mp4",
+        "image.png",
+        "board.png",
+        "card.gif",
+    }
+    assert "trashed.gif" not in _referenced_names(str(tmp_path))
+
+
+def test_collect_garbage_keeps_markdown_and_canvas_links(tmp_path, monkeypatch):
+    vault = tmp_path / "vault"
+    attachments = vault / "attachments"
+    attachments.mkdir(parents=True)
+    files = {}
+    for name in ("linked file.png", "board.png", "orphan.png"):
+        path = attachments / name
+        path.write_bytes(name.encode())
+        files[name] = str(path)
+    (vault / "note.md").write_text(
+        "![](attachments/linked%20file.png)\n", encoding="utf-8"
+    )
+    (vault / "board.canvas").write_text(
+        json.dumps({"nodes": [{"type": "file", "file": "attachments/board.png"}]}),
+        encoding="utf-8",
+    )
+    monkeypatch.setattr(media_store_module, "OBSIDIAN_VAULT_PATH", str(vault))
+    monkeypatch.setattr(media_store_module, "GC_GRACE_SECONDS", -60)
+
+    store = MediaStore(str(tmp_path / "media.sqlite3"))
+    store.open()
+    for name, path in files.items():
+        asyncio.run(store.register(name, path))
+
+    assert store.collect_garbage()[0] == 1
+    store.close()
+    assert os.path.exists(files["linked file.png"])
+    assert os.path.exists(files["board.png"])
+    assert not os.path.exists(files["orphan.png"])
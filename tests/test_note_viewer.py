@@ -0,0 +1,80 @@
+from note_viewer import read_page, tail_start
+
+
+def _write(tmp_path, text: str) -> str:
+    path = tmp_path / "note.md"
+    path.write_bytes(text.encode("utf-8"))
+    return str(path)
+
+
+def _pages(path: str, page_bytes: int) -> list:
+    pages = []
+    start, in_fence = 0, False
+    while True:
+        page = read_page(path, start, in_fence, page_bytes)
+        pages.append(page)
+        if page.end >= page.size:
+            return pages
+        start, in_fence = page.end, page.in_fence
+
+
+def test_short_note_is_one_page(tmp_path):
+    path = _write(tmp_path, "строка\n")
+    page = read_page(path, 0)
+    assert (page.text, page.start, page.end, page.prev_start) == (
+        "строка\n",
+        0,
+        len("строка\n".encode()),
+        None,
+    )
+
+
+def test_pages_end_on_line_boundaries_and_cover_the_file(tmp_path):
+    lines = [f"строка номер {i}\n" for i in range(40)]
+    path = _write(tmp_path, "".join(lines))
+
+    pages = _pages(path, 100)
+    assert len(pages) > 1
+    assert all(page.text.endswith("\n") for page in pages)
+    assert "".join(page.text for page in pages) == "".join(lines)
+    assert pages[1].prev_start == 0
+
+
+def test_start_inside_multibyte_character_moves_to_next_one(tmp_path):
+    path = _write(tmp_path, "жж\n")
+    page = read_page(path, 1)
+    assert page.start == 2
+    assert page.text == "ж\n"
+
+
+def test_code_block_that_fits_moves_to_next_page(tmp_path):
+    text = "a\n" * 20 + "```\ncode\n```\n" + "b\n"
+    path = _write(tmp_path, text)
+
+    first = read_page(path, 0, page_bytes=45)
+    assert "```" not in first.text
+    second = read_page(path, first.end, first.in_fence, page_bytes=45)
+    assert second.text.startswith("```\ncode\n```\n")
+
+
+def test_long_code_block_is_closed_and_reopened(tmp_path):
+    text = "```\n" + "".join(f"line {i}\n" for i in range(30)) + "```\n"
+    path = _write(tmp_path, text)
+
+    pages = _pages(path, 60)
+    assert len(pages) > 2
+    assert pages[0].text.startswith("```\n") and pages[0].text.endswith("\n```")
+    for page in pages[1:-1]:
+        assert page.text.startswith("```\n") and page.text.endswith("\n```")
+    assert pages[-1].text.startswith("```\n") and not pages[-1].in_fence
+
+
+def test_tail_start_finds_last_entries(tmp_path):
+    entries = [f"\n[0{i}-01-2025 10:00]:\nзапись {i}\n" for i in range(1, 6)]
+    path = _write(tmp_path, "# Заметка\n" + "".join(entries))
+
+    with open(path, "rb") as f:
+        data = f.read()
+    start = tail_start(path, 2)
+    assert data[start:].decode() == "".join(entries[-2:]).lstrip("\n")
+    assert tail_start(path, 100) == 0
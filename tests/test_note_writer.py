@@ -0,0 +1,47 @@
+import asyncio
+import threading
+
+from journal import Journal
+from note_writer import NoteWriter
+
+
+def test_flush_writes_in_writer_thread(tmp_path):
+    note = str(tmp_path / "note.md")
+    journal = Journal(str(tmp_path / "notes.journal"))
+    writer = NoteWriter(fsync_mode="flush", journal=journal)
+    writer.open_journal()
+    threads = []
+    writer.add_listener(lambda paths: threads.append(threading.current_thread()))
+
+    async def scenario():
+        writer.append(note, "A1\n")
+        writer.append(note, "A2\n")
+        await writer.flush(note)
+
+    asyncio.run(scenario())
+    writer.close_journal()
+
+    with open(note, encoding="utf-8") as f:
+        assert f.read() == "A1\nA2\n"
+    assert threads and threads[0] is not threading.main_thread()
+    # Все записи зафиксированы, повторять при запуске нечего
+    assert Journal(journal.path).replay() == 0
+
+
+def test_cancelled_flush_still_writes(tmp_path):
+    note = str(tmp_path / "note.md")
+    writer = NoteWriter()
+
+    async def scenario():
+        writer.append(note, "A1\n")
+        task = asyncio.create_task(writer.flush(note))
+        await asyncio.sleep(0)
+        task.cancel()
+        # Пустой flush ждёт все пачки, отданные потоку записи раньше
+        await writer.flush(note)
+
+    asyncio.run(scenario())
+    writer.close_journal()
+
+    with open(note, encoding="utf-8") as f:
+        assert f.read() == "A1\n"
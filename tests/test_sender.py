@@ -0,0 +1,44 @@
+import asyncio
+import time
+
+from sender import BotRateLimiter, TokenBucket
+
+
+def test_token_bucket_allows_burst_then_limits_rate():
+    async def scenario():
+        bucket = TokenBucket(rate=20, capacity=3)
+        started = time.monotonic()
+        for _ in range(3):
+            await bucket.acquire()
+        burst = time.monotonic() - started
+        for _ in range(4):
+            await bucket.acquire()
+        return burst, time.monotonic() - started
+
+    burst, total = asyncio.run(scenario())
+    assert burst < 0.05
+    # Четыре токена сверх запаса при 20 в секунду — около 0,2 с
+    assert 0.15 <= total < 0.5
+
+
+def test_reactions_do_not_spend_chat_message_limit():
+    async def scenario():
+        limiter = BotRateLimiter()
+
+        async def callback():
+            return True
+
+        async def call(endpoint: str):
+            return await limiter.process_request(
+                callback, (), {}, endpoint, {"chat_id": 42}, None
+            )
+
+        started = time.monotonic()
+        for _ in range(3):
+            await call("setMessageReaction")
+        # Запас корзины сообщений чата не тронут реакциями
+        for _ in range(3):
+            await call("sendMessage")
+        return time.monotonic() - started
+
+    assert asyncio.run(scenario()) < 0.5
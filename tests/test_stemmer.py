@@ -0,0 +1,36 @@
+import pytest
+
+from stemmer import stem, stem_text
+
+
+# Ожидаемые основы совпадают с эталонным стеммером Snowball
+@pytest.mark.parametrize(
+    "word, expected",
+    [
+        ("заметки", "заметк"),
+        ("заметкам", "заметк"),
+        ("заметку", "заметк"),
+        ("красивейший", "красив"),
+        ("прекраснейшая", "прекрасн"),
+        ("бегавшись", "бега"),
+        ("читаешь", "чита"),
+        ("читающий", "чита"),
+        ("осторожность", "осторожн"),
+        ("сообщения", "сообщен"),
+        ("сообщений", "сообщен"),
+        ("умывшись", "ум"),
+        ("длиннейший", "длин"),
+        ("вагоны", "вагон"),
+        ("стол", "стол"),
+    ],
+)
+def test_stem_matches_snowball(word, expected):
+    assert stem(word) == expected
+
+
+def test_stem_folds_case_and_yo():
+    assert stem("Ёлки") == stem("елки")
+
+
+def test_stem_text_tokenizes_and_keeps_other_words():
+    assert stem_text("Заметки, video и 2025!") == "заметк video и 2025"
@@ -0,0 +1,33 @@
+import asyncio
+
+from transcription import TranscriptionJob, TranscriptionService
+
+
+def test_transcript_gets_its_own_header_naming_the_message(tmp_path):
+    note = tmp_path / "note.md"
+    note.write_text("\n[18-10-2026 14:05]:[Voice Message #42]\n\n", encoding="utf-8")
+    job = TranscriptionJob(
+        audio=b"",
+        note_path=str(note),
+        chat_id=1,
+        status_message_id=2,
+        message_id=42,
+        message_date="18-10-2026 14:05",
+    )
+
+    async def scenario():
+        await TranscriptionService._append_text(job, "первый")
+        await TranscriptionService._append_text(job, "второй")
+        # Между фрагментами в заметку попадает другое сообщение
+        with open(note, "a", encoding="utf-8") as f:
+            f.write("\n[18-10-2026 14:06]:текст\n\n")
+        await TranscriptionService._append_text(job, "третий")
+
+    asyncio.run(scenario())
+    header = "\n[Voice Transcript #42, 18-10-2026 14:05]: \n"
+    assert note.read_text(encoding="utf-8") == (
+        "\n[18-10-2026 14:05]:[Voice Message #42]\n\n"
+        f"{header}первый\n\nвторой\n"
+        "\n[18-10-2026 14:06]:текст\n\n"
+        f"{header}третий\n\n"
+    )
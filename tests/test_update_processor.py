@@ -0,0 +1,170 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+
+from telegram import Chat, Message, Update
+
+from update_processor import OrderedUpdateProcessor
+
+
+def _update(update_id: int, chat_id: int, media_group_id: str = None) -> Update:
+    message = Message(
+        update_id,
+        datetime.now(timezone.utc),
+        Chat(chat_id, Chat.PRIVATE),
+        text=str(update_id),
+        media_group_id=media_group_id,
+    )
+    return Update(update_id, message=message)
+
+
+def test_updates_of_one_chat_run_in_order():
+    async def scenario():
+        processor = OrderedUpdateProcessor(8, 4)
+        order = []
+
+        async def handle(name: str, delay: float):
+            await asyncio.sleep(delay)
+            order.append(name)
+
+        await asyncio.gather(
+            processor.process_update(_update(1, 1), handle("A1", 0.05)),
+            processor.process_update(_update(2, 1), handle("A2", 0.0)),
+            processor.process_update(_update(3, 2), handle("B1", 0.01)),
+            processor.process_update(_update(4, 1), handle("A3", 0.0)),
+        )
+        return order, processor._tails
+
+    order, tails = asyncio.run(scenario())
+    assert [name for name in order if name.startswith("A")] == ["A1", "A2", "A3"]
+    # Другой чат не ждёт первый
+    assert order.index("B1") < order.index("A1")
+    assert tails == {}
+
+
+def test_queued_updates_do_not_hold_global_slots():
+    async def scenario():
+        processor = OrderedUpdateProcessor(4, 4)
+        finished = {}
+        started = time.perf_counter()
+
+        async def handle(name: str):
+            await asyncio.sleep(0.1)
+            finished[name] = time.perf_counter() - started
+
+        tasks = [
+            asyncio.create_task(
+                processor.process_update(_update(i, 1), handle(f"A{i}"))
+            )
+            for i in range(10)
+        ]
+        await asyncio.sleep(0)
+        tasks.append(
+            asyncio.create_task(processor.process_update(_update(100, 2), handle("B")))
+        )
+        await asyncio.gather(*tasks)
+        return finished
+
+    finished = asyncio.run(scenario())
+    assert finished["B"] < 0.3
+    assert finished["A9"] >= 0.9
+
+
+def test_cancelled_queued_update_keeps_order():
+    async def scenario():
+        processor = OrderedUpdateProcessor(8, 4)
+        order = []
+
+        async def handle(name: str, delay: float):
+            await asyncio.sleep(delay)
+            order.append(name)
+
+        def submit(update_id: int, delay: float) -> asyncio.Task:
+            return asyncio.create_task(
+                processor.process_update(
+                    _update(update_id, 1), handle(f"A{update_id}", delay)
+                )
+            )
+
+        first = submit(1, 0.1)
+        await asyncio.sleep(0)
+        second = submit(2, 0)
+        await asyncio.sleep(0)
+        third = submit(3, 0)
+        await asyncio.sleep(0.01)
+
+        second.cancel()
+        await asyncio.gather(first, second, third, return_exceptions=True)
+        return order, second.cancelled()
+
+    order, cancelled = asyncio.run(scenario())
+    assert cancelled
+    # Третье обновление дождалось первого, а не выполнилось сразу после отмены
+    assert order == ["A1", "A3"]
+
+
+def test_run_ordered_waits_for_chat_and_heavy_limit():
+    async def scenario():
+        processor = OrderedUpdateProcessor(8, 1)
+        order = []
+
+        async def handle(name: str, delay: float):
+            await asyncio.sleep(delay)
+            order.append(name)
+
+        await asyncio.gather(
+            processor.run_ordered(1, handle("heavy", 0.05), heavy=True),
+            processor.process_update(_update(1, 1), handle("A1", 0.05)),
+            # Альбом другого чата ждёт только лимита тяжёлых задач
+            processor.run_ordered(2, handle("album", 0), heavy=True),
+            processor.run_ordered(1, handle("flush", 0)),
+        )
+        return order
+
+    order = asyncio.run(scenario())
+    assert order.index("flush") > order.index("A1") > order.index("heavy")
+    assert order.index("album") > order.index("heavy")
+
+
+def test_base_process_update_is_not_overridden():
+    # process_update в PTB помечен @final: порядок строится в do_process_update
+    assert "process_update" not in OrderedUpdateProcessor.__dict__
+    processor = OrderedUpdateProcessor(4, 2)
+    assert processor.max_running_updates == 4
+    assert processor.max_concurrent_updates >= 4
+
+
+def test_held_album_keeps_its_place_in_chat_order():
+    async def scenario():
+        processor = OrderedUpdateProcessor(8, 4)
+        order = []
+        flushes = []
+
+        async def write_album():
+            order.append("album")
+
+        async def flush_later():
+            await asyncio.sleep(0.05)
+            await processor.run_held(1, "g", write_album(), heavy=True)
+
+        async def first_item():
+            # Как AlbumCollector.add при первом элементе альбома
+            processor.hold(1, "g")
+            flushes.append(asyncio.create_task(flush_later()))
+            order.append("item1")
+
+        async def handle(name: str):
+            order.append(name)
+
+        await asyncio.gather(
+            processor.process_update(_update(1, 1, "g"), first_item()),
+            processor.process_update(_update(2, 1, "g"), handle("item2")),
+            processor.process_update(_update(3, 1), handle("text")),
+        )
+        await asyncio.gather(*flushes)
+        return order, processor._tails, processor._held
+
+    order, tails, held = asyncio.run(scenario())
+    # Второй элемент не ждёт альбом, текст после альбома ждёт его записи
+    assert order == ["item1", "item2", "album", "text"]
+    assert tails == {} and held == {}
@@ -0,0 +1,36 @@
+import asyncio
+import os
+
+from telegram import VideoNote
+
+from config import ATTACH_FOLDER, MAX_DOWNLOAD_SIZE
+from handlers.video import save_video
+from media_store import media_store
+
+
+class _NoDownload(VideoNote):
+    async def get_file(self, *args, **kwargs):
+        raise AssertionError("файл не должен скачиваться")
+
+
+def test_repeated_video_note_is_taken_from_media_store():
+    media_store.open()
+    path = os.path.join(ATTACH_FOLDER, "TG_video_known.mp4")
+    with open(path, "wb") as f:
+        f.write(b"video note")
+    asyncio.run(media_store.register("note-unique", path))
+
+    video_note = _NoDownload("file-id", "note-unique", length=240, duration=3)
+    try:
+        link = asyncio.run(save_video(video_note))
+    finally:
+        media_store.close()
+    assert "TG_video_known.mp4" in link
+
+
+def test_oversized_video_note_is_not_downloaded():
+    video_note = _NoDownload(
+        "big-file-id", "big-unique", 240, 60, file_size=MAX_DOWNLOAD_SIZE
+    )
+    link = asyncio.run(save_video(video_note))
+    assert "big-file-id" in link
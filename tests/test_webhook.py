@@ -0,0 +1,254 @@
+import asyncio
+import json
+import os
+import signal
+from types import SimpleNamespace
+
+import pytest
+
+import webhook
+from webhook import WebhookServer
+
+PATH = "/telegram"
+
+
+def _update_body(update_id: int) -> bytes:
+    return json.dumps(
+        {
+            "update_id": update_id,
+            "message": {
+                "message_id": update_id,
+                "date": 1760000000,
+                "chat": {"id": 1, "type": "private"},
+                "text": "привет",
+            },
+        }
+    ).encode()
+
+
+def _request(method: str, target: str, body: bytes = b"", **headers) -> bytes:
+    lines = [f"{method} {target} HTTP/1.1", "Host: localhost"]
+    if body:
+        lines.append(f"Content-Length: {len(body)}")
+    lines.extend(
+        f"{name.replace('_', '-')}: {value}"
+        for name, value in headers.items()
+    )
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body
+
+
+async def _read_response(reader: asyncio.StreamReader):
+    status_line = await reader.readline()
+    if not status_line:
+        return None
+    headers = {}
+    while (line := await reader.readline()) != b"\r\n":
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    body = await reader.readexactly(int(headers["content-length"]))
+    return int(status_line.split()[1]), headers, json.loads(body)
+
+
+def _serve(scenario):
+    """Запускает сервер на свободном порту и передаёт сценарию подключение к нему."""
+
+    async def run():
+        application = SimpleNamespace(update_queue=asyncio.Queue(), bot=None)
+        server = WebhookServer(application, "127.0.0.1", 0, PATH)
+        await server.start()
+        port = server._server.sockets[0].getsockname()[1]
+
+        async def connect():
+            return await asyncio.open_connection("127.0.0.1", port)
+
+        try:
+            return await scenario(server, connect, application.update_queue)
+        finally:
+            await server.stop()
+
+    return asyncio.run(run())
+
+
+async def _exchange(connect, data: bytes):
+    reader, writer = await connect()
+    writer.write(data)
+    await writer.drain()
+    response = await _read_response(reader)
+    writer.close()
+    return response
+
+
+def test_read_request_parses_line_headers_and_body():
+    async def read(data: bytes):
+        reader = asyncio.StreamReader()
+        reader.feed_data(data)
+        reader.feed_eof()
+        return await WebhookServer._read_request(reader)
+
+    body = _update_body(1)
+    method, target, headers, parsed_body = asyncio.run(
+        read(_request("POST", f"{PATH}?x=1", body, X_Custom=" value "))
+    )
+    assert (method, target, parsed_body) == ("POST", PATH, body)
+    assert headers["content-length"] == str(len(body))
+    assert headers["x-custom"] == "value"
+    # Пустое соединение — клиент закрыл его между запросами
+    assert asyncio.run(read(b"")) is None
+
+    with pytest.raises(ValueError):
+        asyncio.run(read(b"GARBAGE\r\n\r\n"))
+    with pytest.raises(ValueError):
+        too_big = f"Content-Length: {webhook.MAX_BODY_SIZE + 1}\r\n"
+        asyncio.run(read(f"POST {PATH} HTTP/1.1\r\n{too_big}\r\n".encode()))
+    with pytest.raises(ValueError):
+        headers = "".join(f"H{i}: v\r\n" for i in range(webhook.MAX_HEADERS + 1))
+        asyncio.run(read(f"GET / HTTP/1.1\r\n{headers}\r\n".encode()))
+
+
+def test_keep_alive_serves_several_updates_on_one_connection():
+    async def scenario(server, connect, queue):
+        reader, writer = await connect()
+        statuses = []
+        for update_id in (1, 2, 3):
+            writer.write(_request("POST", PATH, _update_body(update_id)))
+            await writer.drain()
+            status, headers, _ = await _read_response(reader)
+            statuses.append((status, headers["connection"]))
+
+        writer.write(_request("POST", PATH, _update_body(4), Connection="close"))
+        await writer.drain()
+        status, headers, _ = await _read_response(reader)
+        statuses.append((status, headers["connection"]))
+        # После Connection: close сервер закрывает соединение
+        closed = await reader.read() == b""
+        writer.close()
+        update_ids = [queue.get_nowait().update_id for _ in range(queue.qsize())]
+        return statuses, closed, update_ids
+
+    statuses, closed, update_ids = _serve(scenario)
+    assert statuses == [(200, "keep-alive")] * 3 + [(200, "close")]
+    assert closed
+    assert update_ids == [1, 2, 3, 4]
+
+
+def test_error_statuses():
+    async def scenario(server, connect, queue):
+        return [
+            (await _exchange(connect, data))[0]
+            for data in (
+                b"GARBAGE\r\n\r\n",
+                _request("POST", PATH, b"{not json"),
+                _request("POST", "/other", _update_body(1)),
+                _request("GET", PATH),
+                _request("GET", "/health"),
+            )
+        ] + [queue.qsize()]
+
+    assert _serve(scenario) == [400, 400, 404, 405, 200, 0]
+
+
+def test_secret_token_is_checked(monkeypatch):
+    monkeypatch.setattr(webhook, "WEBHOOK_SECRET", "s3cret")
+
+    async def scenario(server, connect, queue):
+        body = _update_body(1)
+        missing = await _exchange(connect, _request("POST", PATH, body))
+        wrong = await _exchange(
+            connect,
+            _request("POST", PATH, body, X_Telegram_Bot_Api_Secret_Token="nope"),
+        )
+        right = await _exchange(
+            connect,
+            _request("POST", PATH, body, X_Telegram_Bot_Api_Secret_Token="s3cret"),
+        )
+        return missing[0], wrong[0], right[0], queue.qsize()
+
+    assert _serve(scenario) == (403, 403, 200, 1)
+
+
+def test_drain_window_fails_health_but_accepts_updates():
+    async def scenario(server, connect, queue):
+        # Соединение открыто до остановки и закрывается вместе с сервером
+        idle_reader, idle_writer = await connect()
+        server.draining = True
+        health = await _exchange(connect, _request("GET", "/health"))
+        update = await _exchange(connect, _request("POST", PATH, _update_body(7)))
+        await server.stop()
+        closed = await idle_reader.read() == b""
+        idle_writer.close()
+        return health, update[0], queue.get_nowait().update_id, closed
+
+    (status, _, payload), update_status, update_id, closed = _serve(scenario)
+    assert (status, payload) == (503, {"status": "draining"})
+    assert (update_status, update_id) == (200, 7)
+    assert closed
+
+
+class FakeApplication:
+    """Жизненный цикл Application без обращений к Telegram."""
+
+    post_init = post_stop = post_shutdown = None
+
+    def __init__(self):
+        self.update_queue = asyncio.Queue()
+        self.bot = SimpleNamespace(
+            set_my_commands=self._record, set_webhook=self._record
+        )
+        self.running = False
+        self.events = []
+
+    async def _record(self, *args, **kwargs):
+        pass
+
+    async def initialize(self):
+        self.events.append("initialize")
+
+    async def start(self):
+        self.running = True
+
+    async def stop(self):
+        self.running = False
+        self.events.append("stop")
+
+    async def shutdown(self):
+        self.events.append("shutdown")
+
+
+def test_sigterm_drains_before_stopping(monkeypatch):
+    servers = []
+
+    class RecordingServer(WebhookServer):
+        async def start(self):
+            await super().start()
+            servers.append(self)
+
+    monkeypatch.setattr(webhook, "WebhookServer", RecordingServer)
+    monkeypatch.setattr(webhook, "WEBHOOK_LISTEN", "127.0.0.1")
+    monkeypatch.setattr(webhook, "WEBHOOK_PORT", 0)
+    monkeypatch.setattr(webhook, "WEBHOOK_DRAIN_SECONDS", 0.5)
+
+    async def scenario():
+        application = FakeApplication()
+        task = asyncio.create_task(webhook.run_webhook(application, []))
+        while not servers:
+            await asyncio.sleep(0.01)
+        port = servers[0]._server.sockets[0].getsockname()[1]
+
+        async def connect():
+            return await asyncio.open_connection("127.0.0.1", port)
+
+        os.kill(os.getpid(), signal.SIGTERM)
+        await asyncio.sleep(0.05)
+        # В окне вывода из балансировки обновления ещё принимаются
+        health = await _exchange(connect, _request("GET", "/health"))
+        update = await _exchange(connect, _request("POST", PATH, _update_body(9)))
+        events_in_window = list(application.events)
+        await task
+        with pytest.raises(ConnectionError):
+            await connect()
+        return health[0], update[0], events_in_window, application.events
+
+    health, update, events_in_window, events = asyncio.run(scenario())
+    assert (health, update) == (503, 200)
+    assert events_in_window == ["initialize"]
+    assert events == ["initialize", "stop", "shutdown"]
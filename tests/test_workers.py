@@ -0,0 +1,39 @@
+import asyncio
+import time
+
+from pool_jobs import sleep
+from workers import MediaPool
+
+
+def test_run_returns_result_from_process():
+    async def scenario():
+        pool = MediaPool(1)
+        try:
+            return await pool.run("test", sleep, 0.01)
+        finally:
+            pool.shutdown()
+
+    assert asyncio.run(scenario()) == 0.01
+
+
+def test_cancelled_running_job_keeps_slot_until_done():
+    async def scenario():
+        pool = MediaPool(1)
+        try:
+            # Прогрев: процесс пула запущен, задача стартует сразу
+            await pool.run("test", sleep, 0)
+            task = asyncio.create_task(pool.run("test", sleep, 0.5))
+            while pool._active == 0:
+                await asyncio.sleep(0.01)
+            await asyncio.sleep(0.1)
+            task.cancel()
+            await asyncio.sleep(0.05)
+            assert pool._active == 1
+            started = time.perf_counter()
+            await pool.run("test", sleep, 0)
+            return time.perf_counter() - started
+        finally:
+            pool.shutdown()
+
+    # Следующая задача дождалась окончания отменённой
+    assert asyncio.run(scenario()) >= 0.2